@@ -0,0 +1,69 @@
+"""
+Panel "Área de interés" de la app.
+
+El visor de mapa y las páginas que exportan puntos (fichas, KMZ, recolección y el
+extractor de KMZ) filtran con el mismo panel y el mismo índice espacial
+(indice_espacial.py) que --bbox/--radio/--cuadrante en procesar_lote.py.
+"""
+import streamlit as st
+
+from coordenadas import HUSO_POR_DEFECTO, wgs84_a_utm
+from indice_espacial import Rectangulo, Radio, Cuadrante
+
+TIPOS_AREA = ["Todos los puntos", "Rectángulo", "Radio", "Cuadrante UTM"]
+
+
+def panel_area(clave, lons=None, lats=None, titulo="Mostrar"):
+    """
+    Expander para elegir el área; devuelve un Rectangulo, Radio o Cuadrante, o None
+    para todos los puntos. Con `lons`/`lats` (puntos ya leídos, como en el visor) los
+    valores iniciales salen de ellos; sin puntos hay que escribirlos, y hasta que no
+    estén todos no se filtra.
+    """
+    hay_puntos = bool(lons)
+    lon_c = sum(lons) / len(lons) if hay_puntos else None
+    lat_c = sum(lats) / len(lats) if hay_puntos else None
+    with st.expander("Área de interés"):
+        tipo_area = st.radio(titulo, TIPOS_AREA, horizontal=True, key=f"{clave}_area")
+        if tipo_area == "Rectángulo":
+            c1, c2, c3, c4 = st.columns(4)
+            valores = (
+                c1.number_input("Lon. mínima", value=min(lons) if hay_puntos else None, format="%.6f", key=f"{clave}_lon_min"),
+                c2.number_input("Lat. mínima", value=min(lats) if hay_puntos else None, format="%.6f", key=f"{clave}_lat_min"),
+                c3.number_input("Lon. máxima", value=max(lons) if hay_puntos else None, format="%.6f", key=f"{clave}_lon_max"),
+                c4.number_input("Lat. máxima", value=max(lats) if hay_puntos else None, format="%.6f", key=f"{clave}_lat_max"),
+            )
+            area = Rectangulo
+        elif tipo_area == "Radio":
+            c1, c2, c3 = st.columns(3)
+            valores = (
+                c1.number_input("Longitud del centro", value=lon_c, format="%.6f", key=f"{clave}_lon"),
+                c2.number_input("Latitud del centro", value=lat_c, format="%.6f", key=f"{clave}_lat"),
+                c3.number_input("Metros", min_value=1.0, value=500.0, step=100.0, key=f"{clave}_metros"),
+            )
+            area = Radio
+        elif tipo_area == "Cuadrante UTM":
+            c1, c2, c3, c4 = st.columns(4)
+            husos = [18, 19]
+            if hay_puntos:
+                indice_huso = 0 if lon_c < -72 else 1
+            else:
+                indice_huso = husos.index(HUSO_POR_DEFECTO)
+            huso = c4.selectbox("Huso", husos, index=indice_huso, key=f"{clave}_huso")
+            este_c = norte_c = None
+            if hay_puntos:
+                estes, nortes, _ = wgs84_a_utm([lon_c], [lat_c], huso)
+                este_c, norte_c = float(estes[0]), float(nortes[0])
+            valores = (
+                c1.number_input("Este", value=este_c, step=100.0, format="%.0f", key=f"{clave}_este"),
+                c2.number_input("Norte", value=norte_c, step=100.0, format="%.0f", key=f"{clave}_norte"),
+                c3.number_input("Lado (m)", min_value=1.0, value=1000.0, step=100.0, key=f"{clave}_lado"),
+                huso,
+            )
+            area = Cuadrante
+        else:
+            return None
+        if any(v is None for v in valores):
+            st.caption("Completa los valores para filtrar; mientras tanto van todos los puntos.")
+            return None
+        return area(*valores)
@@ -0,0 +1,155 @@
+"""
+Caché en disco de los resultados de los parsers.
+
+La clave es el SHA-256 del contenido del archivo más el parser que lo leyó y su
+VERSION_PARSER (constante de cada módulo de extracción: subirla invalida lo
+guardado con la versión anterior). Así, subir el mismo anexo a otra herramienta
+que usa el mismo parser, o volver a apretar el botón, no vuelve a parsear nada.
+
+Cada entrada es un pickle en <directorio>/<2 primeros hex>/<clave>.pkl. Cuando el
+total supera el límite se borran las entradas usadas hace más tiempo. Esa mecánica
+(AlmacenDisco) la comparte el almacén de fotos de fotos.py.
+"""
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+from pathlib import Path
+
+DIRECTORIO_POR_DEFECTO = Path(os.environ.get(
+    "ARQUEOLOGIA_CACHE", Path.home() / ".cache" / "resumen-arqueologia" / "fichas"
+))
+LIMITE_MB_POR_DEFECTO = int(os.environ.get("ARQUEOLOGIA_CACHE_MB", 2048))
+
+# Marca de "no está en caché" (None es un resultado válido de algunos parsers).
+FALTA = object()
+
+
+def huella(datos):
+    """SHA-256 hexadecimal del contenido de un archivo."""
+    return hashlib.sha256(datos).hexdigest()
+
+
+def version_parser(parser):
+    modulo = sys.modules.get(parser.__module__)
+    return f"{parser.__module__}.{parser.__qualname__}:{getattr(modulo, 'VERSION_PARSER', 0)}"
+
+
+class AlmacenDisco:
+    """
+    Archivos en <directorio>/<2 primeros hex>/<clave><sufijo>. Cuando el total supera
+    el límite se borran los usados hace más tiempo (la fecha de uso es el mtime).
+    """
+    sufijo = ".bin"
+
+    def __init__(self, directorio, limite_mb):
+        self.directorio = Path(directorio)
+        self.limite_bytes = limite_mb * 1024 * 1024
+        self._tamano = None  # se calcula en la primera escritura
+
+    def _ruta(self, clave):
+        return self.directorio / clave[:2] / f"{clave}{self.sufijo}"
+
+    def _marcar_uso(self, ruta):
+        try:
+            os.utime(ruta)
+        except OSError:
+            pass
+
+    def _escribir(self, ruta, contenido):
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        # Escritura atómica: varios procesos trabajadores pueden escribir a la vez.
+        fd, tmp = tempfile.mkstemp(dir=ruta.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(contenido)
+            os.replace(tmp, ruta)
+        except OSError:
+            Path(tmp).unlink(missing_ok=True)
+            return False
+        self._sumar(len(contenido))
+        return True
+
+    def _sumar(self, n):
+        """Cuenta `n` bytes nuevos y desaloja si se pasó del límite."""
+        if self._tamano is None:
+            self._tamano = self.tamano()
+        else:
+            self._tamano += n
+        if self._tamano > self.limite_bytes:
+            self.desalojar()
+
+    def _entradas(self):
+        entradas = []
+        for ruta in self.directorio.glob(f"*/*{self.sufijo}"):
+            try:
+                info = ruta.stat()
+            except FileNotFoundError:
+                continue
+            entradas.append((info.st_mtime, info.st_size, ruta))
+        return entradas
+
+    def tamano(self):
+        return sum(t for _, t, _ in self._entradas())
+
+    def desalojar(self):
+        """Borra las entradas menos usadas hasta quedar en el 90 % del límite."""
+        entradas = sorted(self._entradas())
+        total = sum(t for _, t, _ in entradas)
+        objetivo = self.limite_bytes * 0.9
+        for _, t, ruta in entradas:
+            if total <= objetivo:
+                break
+            ruta.unlink(missing_ok=True)
+            total -= t
+        self._tamano = total
+
+    def limpiar(self):
+        for _, _, ruta in self._entradas():
+            ruta.unlink(missing_ok=True)
+        self._tamano = 0
+
+
+class CacheFichas(AlmacenDisco):
+    sufijo = ".pkl"
+
+    def __init__(self, directorio=DIRECTORIO_POR_DEFECTO, limite_mb=LIMITE_MB_POR_DEFECTO):
+        super().__init__(directorio, limite_mb)
+
+    def clave(self, parser, nombre, datos):
+        # El nombre entra en la clave porque algunos resultados lo incluyen ("Archivo Origen", mensajes).
+        texto = f"{huella(datos)}\0{version_parser(parser)}\0{nombre}"
+        return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+    def obtener(self, clave):
+        ruta = self._ruta(clave)
+        try:
+            with open(ruta, "rb") as f:
+                valor = pickle.load(f)
+        except FileNotFoundError:
+            return FALTA
+        except Exception:
+            # Entrada corrupta o de una versión incompatible: se descarta.
+            ruta.unlink(missing_ok=True)
+            return FALTA
+        self._marcar_uso(ruta)  # marca de uso para el desalojo
+        return valor
+
+    def guardar(self, clave, valor):
+        try:
+            contenido = pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return
+        self._escribir(self._ruta(clave), contenido)
+
+
+_cache = None
+
+
+def cache_por_defecto():
+    """Instancia compartida dentro del proceso (la app y cada trabajador tienen la suya)."""
+    global _cache
+    if _cache is None:
+        _cache = CacheFichas()
+    return _cache
@@ -0,0 +1,107 @@
+"""
+Servicio de coordenadas compartido por todas las herramientas.
+
+- Los Transformer de pyproj se construyen una sola vez por par de CRS y proceso
+  (caché protegida con lock; los Transformer son thread-safe desde pyproj 3.1).
+- El huso UTM se detecta desde el texto de la ficha ("Huso 19", "18S", "19 H", "18G"...)
+  o desde la longitud, y las conversiones se hacen por lotes agrupados por huso.
+
+Todos los husos son del hemisferio sur (las bandas G/H/J/K de las fichas y la "S"
+de "18S"/"19S" se refieren a Chile), es decir EPSG:327xx.
+"""
+import re
+import threading
+
+import numpy as np
+from pyproj import Transformer
+
+from tiempos import etapa, COORDENADAS
+
+EPSG_WGS84 = 4326
+HUSO_POR_DEFECTO = 18
+
+_transformers = {}
+_lock = threading.Lock()
+
+# "Huso 19", "Huso: 18 S", "HUSO 19H" ...
+_RE_HUSO_ETIQUETA = re.compile(r"huso\s*[:\-]?\s*(1[89])\s*[A-Za-z]?\b", re.IGNORECASE)
+# Celdas que son solo el huso: "18S", "19 H", "18G", "19K"
+_RE_HUSO_CELDA = re.compile(r"^\s*(1[89])\s*([SGHJK])\s*$", re.IGNORECASE)
+
+
+def epsg_utm_sur(huso):
+    return 32700 + int(huso)
+
+
+def obtener_transformer(origen, destino):
+    """Transformer (always_xy) cacheado para el par de códigos EPSG dado."""
+    clave = (int(origen), int(destino))
+    transformer = _transformers.get(clave)
+    if transformer is None:
+        with _lock:
+            transformer = _transformers.get(clave)
+            if transformer is None:
+                transformer = Transformer.from_crs(f"epsg:{clave[0]}", f"epsg:{clave[1]}", always_xy=True)
+                _transformers[clave] = transformer
+    return transformer
+
+
+def detectar_huso(texto, por_defecto=None):
+    """
+    Busca el huso UTM en un texto o valor de celda. Devuelve 18/19 o `por_defecto`
+    si no aparece.
+    """
+    if not texto:
+        return por_defecto
+    m = _RE_HUSO_ETIQUETA.search(texto)
+    if m:
+        return int(m.group(1))
+    for linea in str(texto).splitlines():
+        m = _RE_HUSO_CELDA.match(linea)
+        if m:
+            return int(m.group(1))
+    return por_defecto
+
+
+def huso_desde_lon(lon):
+    """Huso UTM que corresponde a una longitud (acepta arrays)."""
+    return (np.floor((np.asarray(lon, dtype=float) + 180) / 6) + 1).astype(int)
+
+
+@etapa(COORDENADAS)
+def utm_a_wgs84(estes, nortes, husos=HUSO_POR_DEFECTO):
+    """
+    Convierte UTM sur a (lon, lat). `husos` puede ser un número o un array por punto;
+    se hace una llamada a pyproj por huso distinto. Devuelve arrays de NumPy.
+    """
+    estes = np.asarray(estes, dtype=float)
+    nortes = np.asarray(nortes, dtype=float)
+    husos = np.broadcast_to(np.asarray(husos, dtype=int), estes.shape)
+    lons = np.full(estes.shape, np.nan)
+    lats = np.full(estes.shape, np.nan)
+    for huso in np.unique(husos):
+        sel = husos == huso
+        t = obtener_transformer(epsg_utm_sur(huso), EPSG_WGS84)
+        lons[sel], lats[sel] = t.transform(estes[sel], nortes[sel])
+    return lons, lats
+
+
+@etapa(COORDENADAS)
+def wgs84_a_utm(lons, lats, huso=None):
+    """
+    Convierte (lon, lat) a UTM sur. Con `huso=None` cada punto va a su propio huso
+    (según la longitud). Devuelve (estes, nortes, husos) como arrays de NumPy.
+    """
+    lons = np.asarray(lons, dtype=float)
+    lats = np.asarray(lats, dtype=float)
+    if huso is None:
+        husos = np.where(np.isfinite(lons), huso_desde_lon(np.nan_to_num(lons)), HUSO_POR_DEFECTO)
+    else:
+        husos = np.full(lons.shape, int(huso))
+    estes = np.full(lons.shape, np.nan)
+    nortes = np.full(lons.shape, np.nan)
+    for h in np.unique(husos):
+        sel = husos == h
+        t = obtener_transformer(EPSG_WGS84, epsg_utm_sur(h))
+        estes[sel], nortes[sel] = t.transform(lons[sel], lats[sel])
+    return estes, nortes, husos
@@ -0,0 +1,244 @@
+"""
+Corpus sintético de fichas para medir el rendimiento (rendimiento.py).
+
+Genera archivos con la misma forma que los reales, con las etiquetas y la
+disposición que esperan los parsers, y datos variados (fechas, coordenadas,
+conteos) a partir de una semilla, así que dos corridas con los mismos parámetros
+dan el mismo corpus:
+
+- map/        anexos MAP en Word con su tabla y 2 fotos por anexo;
+- map_pdf/    reportes MAP en PDF de `paginas` páginas, una ficha con foto por página;
+- fichas/     Fichas de Hallazgo en Word con coordenadas UTM y una foto;
+- recoleccion/ fichas PDF de recolección superficial, una por página;
+- excavacion/ fichas PDF de excavación con la matriz de cabecera y los 6 niveles;
+- kmz/        un KMZ con `puntos` placemarks.
+
+    python corpus_sintetico.py corpus/ --escala 50 --puntos 300000
+
+Las fotos son JPEG de cámara de `--foto` píxeles (ruido en bloques, para que pesen
+como una foto y no como un color plano).
+"""
+import argparse
+import io
+import random
+import sys
+import zipfile
+from pathlib import Path
+
+from extraccion import fitz
+
+try:
+    from docx import Document
+except ImportError:
+    Document = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+RESPONSABLES = ["Ana Pérez", "Jorge Muñoz", "Camila Rojas", "Diego Soto", "Valentina Díaz"]
+MATERIALES = ["Lítico", "Cerámica", "Óseo", "Malacológico", "Metal", "Vidrio"]
+PERIODOS = ["Tardío", "Intermedio Tardío", "Alfarero Temprano", "Arcaico", "Histórico"]
+ACTIVIDADES = [
+    "Monitoreo de excavación masiva en el frente {n}. Sin novedades.",
+    "Escarpe y nivelación del sector {n}; se revisa el material removido.",
+    "Excavación de zanja para matriz de agua potable, tramo {n}.",
+    "Charla de inducción arqueológica a la cuadrilla del frente {n}.",
+]
+CAPAS = ["Capa limo arenosa", "Relleno antrópico con escombros", "Grava compacta", "Arcilla café oscura"]
+NIVELES = ["Superficial", "0-10 cm", "10-20 cm", "20-30 cm", "30-40 cm", "40-50 cm"]
+
+# Zona de las coordenadas (UTM huso 19S, en torno a Santiago).
+ESTE_BASE, NORTE_BASE = 345000, 6295000
+
+
+def jpeg(ancho, alto, semilla, calidad=85):
+    """JPEG de `ancho` x `alto` con bloques de colores al azar."""
+    if Image is None:
+        raise RuntimeError("Falta instalar la librería 'pillow' para generar las fotos.")
+    r = random.Random(semilla)
+    img = Image.new("RGB", (ancho, alto), (r.randint(60, 200), r.randint(60, 200), r.randint(60, 200)))
+    lado = max(8, ancho // 40)
+    for _ in range(200):
+        x, y = r.randint(0, ancho - 1), r.randint(0, alto - 1)
+        img.paste((r.randint(0, 255), r.randint(0, 255), r.randint(0, 255)), (x, y, min(ancho, x + lado), min(alto, y + lado)))
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=calidad)
+    return buffer.getvalue()
+
+
+def _fecha(r, mes=None):
+    return f"{r.randint(1, 28):02d}/{mes or r.randint(1, 12):02d}/2025"
+
+
+def _fila(tabla, etiqueta, valor=""):
+    celdas = tabla.add_row().cells
+    celdas[0].text = etiqueta
+    celdas[1].text = valor
+    return celdas
+
+
+def _docx(documento):
+    buffer = io.BytesIO()
+    documento.save(buffer)
+    return buffer.getvalue()
+
+
+def anexo_map(i, r, foto):
+    """Anexo MAP diario en Word: fecha, descripciones, ausencia de hallazgos y 2 fotos."""
+    doc = Document()
+    tabla = doc.add_table(rows=0, cols=2)
+    _fila(tabla, "Fecha", _fecha(r, mes=3))
+    _fila(tabla, "Descripción de la actividad", r.choice(ACTIVIDADES).format(n=i))
+    _fila(tabla, "Descripción estratigráfica", r.choice(CAPAS))
+    _fila(tabla, "Ausencia de hallazgos", "X")
+    _fila(tabla, "Registro fotográfico")
+    celdas = _fila(tabla, "", "")
+    for k, celda in enumerate(celdas):
+        celda.paragraphs[0].add_run().add_picture(io.BytesIO(jpeg(*foto, semilla=i * 2 + k)))
+    _fila(tabla, f"Foto {i}a: vista general del frente", f"Foto {i}b: detalle del perfil")
+    return _docx(doc)
+
+
+def ficha_hallazgo(i, r, foto):
+    """Ficha de Hallazgo en Word con coordenadas UTM (con puntos de miles) y una foto."""
+    doc = Document()
+    tabla = doc.add_table(rows=0, cols=2)
+    norte = NORTE_BASE + r.randint(0, 20000)
+    este = ESTE_BASE + r.randint(0, 20000)
+    _fila(tabla, "ID Sitio", f"HLU-{i:03d}")
+    _fila(tabla, "Fecha", _fecha(r))
+    _fila(tabla, "Responsable", r.choice(RESPONSABLES))
+    _fila(tabla, "Categoría", r.choice(["SA", "HA"]))
+    _fila(tabla, "Coord. Central Norte", f"{norte:,}".replace(",", ".") + f",{r.randint(0, 999):03d}")
+    _fila(tabla, "Coord. Central Este", f"{este:,}".replace(",", ".") + f",{r.randint(0, 999):03d}")
+    _fila(tabla, "Huso", "19 H")
+    _fila(tabla, "Descripción", f"Fragmento de {r.choice(MATERIALES).lower()} en superficie.")
+    _fila(tabla, "Prehispánico", "X")
+    _fila(tabla, "Periodo específico", r.choice(PERIODOS))
+    celdas = _fila(tabla, "", "")
+    celdas[0].paragraphs[0].add_run().add_picture(io.BytesIO(jpeg(*foto, semilla=10_000 + i)))
+    _fila(tabla, "Fotografía detalle", "")
+    return _docx(doc)
+
+
+def _pdf_lineas(paginas):
+    doc = fitz.open()
+    for lineas in paginas:
+        pagina = doc.new_page()
+        y = 40
+        for linea in lineas:
+            pagina.insert_text((40, y), linea, fontsize=9)
+            y += 11
+    return doc.tobytes(garbage=3, deflate=True)
+
+
+def ficha_recoleccion(i, r, paginas):
+    """PDF con una ficha de recolección superficial por página."""
+    fichas = []
+    for k in range(paginas):
+        fichas.append([
+            "Ficha de Recolección Superficial", "Responsable", r.choice(RESPONSABLES), "Sitio", f"S-{i}-{k}",
+            "Cuadrante", f"C{r.randint(1, 40)}", "Dimensión", "1x1 m", "Fecha", _fecha(r),
+            "Material", "Superficie", r.choice(MATERIALES), f"{r.randint(1, 25)} m2",
+            f"UTM Norte: {NORTE_BASE + r.randint(0, 20000)}", f"UTM Este: {ESTE_BASE + r.randint(0, 20000)}",
+            "Huso 19",  # las coordenadas base son del huso 19; sin esto el parser usa el 18
+            f"HLU_HP_{i:03d}{k}",
+        ])
+    return _pdf_lineas(fichas)
+
+
+def ficha_excavacion(i, r):
+    """PDF de excavación: cabecera en matriz, tabla de materiales por nivel y observaciones."""
+    lineas = [
+        "Sitio", "Unidad", "C. Norte", "C. Este", "Dimensión", "Fecha", "Responsable",
+        f"HLU-{i}", f"HLU-HP-{i}", str(NORTE_BASE + r.randint(0, 20000)), str(ESTE_BASE + r.randint(0, 20000)),
+        "1x1 m", _fecha(r), r.choice(RESPONSABLES),
+    ]
+    for nivel in NIVELES:
+        lineas += [nivel, r.choice(["Capa A", "Capa B"])] + [str(r.randint(0, 9)) for _ in range(7)]
+    lineas += [f"Observación nivel superficial: {r.choice(['sin material', 'lascas dispersas'])}",
+               f"Observación nivel 0-10 : {r.choice(['poco material', 'raíces'])}"]
+    return _pdf_lineas([lineas[:60], lineas[60:]])
+
+
+def reporte_map_pdf(i, r, paginas, foto):
+    """
+    Reporte MAP en PDF con una ficha por página (identificación, descripción, capa y
+    registro fotográfico con su foto); el logo y un ícono se repiten en todas.
+    """
+    doc = fitz.open()
+    logo = jpeg(400, 200, semilla=1)
+    icono = jpeg(64, 64, semilla=2)
+    for k in range(paginas):
+        pagina = doc.new_page()
+        pagina.insert_image(fitz.Rect(450, 20, 560, 70), stream=logo)
+        y = 90
+        for texto in ["Ficha de Monitoreo Arqueológico", "I. IDENTIFICACIÓN", f"Fecha: {_fecha(r, mes=4)}",
+                      "V. DESCRIPCIONES", r.choice(ACTIVIDADES).format(n=f"{i}-{k}"),
+                      "VI. CARACTERÍSTICAS DE LA CAPA", "Presencia de Hallazgos No", "VIII. REGISTRO FOTOGRÁFICO"]:
+            pagina.insert_text((40, y), texto, fontsize=9)
+            y += 28
+        pagina.insert_image(fitz.Rect(500, 400, 530, 430), stream=icono)
+        pagina.insert_image(fitz.Rect(40, 330, 300, 525), stream=jpeg(*foto, semilla=20_000 + i * paginas + k))
+        pagina.insert_text((40, 545), f"Foto {k + 1}: vista general del frente", fontsize=9)
+    return doc.tobytes(garbage=3, deflate=True)
+
+
+def kmz(puntos, r):
+    """KMZ con `puntos` placemarks dispersos en unos 20 km."""
+    lon0, lat0 = -70.65, -33.45
+    placemarks = "".join(
+        f"<Placemark><name>P{k}</name><Point><coordinates>"
+        f"{lon0 + r.uniform(-0.1, 0.1):.6f},{lat0 + r.uniform(-0.1, 0.1):.6f},{r.randint(500, 700)}"
+        "</coordinates></Point></Placemark>"
+        for k in range(puntos)
+    )
+    kml = ('<?xml version="1.0" encoding="UTF-8"?><kml xmlns="http://www.opengis.net/kml/2.2">'
+           f"<Document>{placemarks}</Document></kml>")
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("doc.kml", kml)
+    return buffer.getvalue()
+
+
+def generar(salida, escala=10, puntos=10_000, paginas=4, foto=(1600, 1200), semilla=0):
+    """Escribe el corpus en `salida` y devuelve {carpeta: cantidad de archivos}."""
+    if Document is None or fitz is None or Image is None:
+        raise RuntimeError("El corpus sintético necesita python-docx, pymupdf y pillow.")
+    salida = Path(salida)
+    r = random.Random(semilla)
+    archivos = {
+        "map": [(f"anexo_{i:04d}.docx", lambda i=i: anexo_map(i, r, foto)) for i in range(escala)],
+        "map_pdf": [(f"reporte_{i:04d}.pdf", lambda i=i: reporte_map_pdf(i, r, paginas, foto)) for i in range(escala)],
+        "fichas": [(f"ficha_{i:04d}.docx", lambda i=i: ficha_hallazgo(i, r, foto)) for i in range(escala)],
+        "recoleccion": [(f"recoleccion_{i:04d}.pdf", lambda i=i: ficha_recoleccion(i, r, paginas)) for i in range(escala)],
+        "excavacion": [(f"excavacion_{i:04d}.pdf", lambda i=i: ficha_excavacion(i, r)) for i in range(escala)],
+        "kmz": [("puntos.kmz", lambda: kmz(puntos, r))],
+    }
+    for carpeta, lista in archivos.items():
+        (salida / carpeta).mkdir(parents=True, exist_ok=True)
+        for nombre, crear in lista:
+            (salida / carpeta / nombre).write_bytes(crear())
+    return {carpeta: len(lista) for carpeta, lista in archivos.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera un corpus sintético de fichas para rendimiento.py.")
+    parser.add_argument("salida", help="Carpeta donde se escribe el corpus.")
+    parser.add_argument("--escala", type=int, default=10, help="Archivos por tipo de ficha (por defecto 10).")
+    parser.add_argument("--puntos", type=int, default=10_000, help="Placemarks del KMZ (por defecto 10000).")
+    parser.add_argument("--paginas", type=int, default=4,
+                        help="Páginas de cada reporte MAP y de cada PDF de recolección (por defecto 4).")
+    parser.add_argument("--foto", default="1600x1200", help="Tamaño de las fotos en píxeles (por defecto 1600x1200).")
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla de los datos al azar.")
+    args = parser.parse_args(argv)
+    foto = tuple(int(v) for v in args.foto.lower().split("x"))
+    cantidades = generar(args.salida, args.escala, args.puntos, args.paginas, foto, args.semilla)
+    print(", ".join(f"{carpeta}: {n}" for carpeta, n in cantidades.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
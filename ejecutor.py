@@ -0,0 +1,196 @@
+"""
+Ejecutor compartido para procesar lotes de archivos en varios procesos.
+
+Todas las herramientas (app y procesar_lote.py) pasan por `procesar_archivos`:
+reparte los archivos entre procesos trabajadores que ya tienen importados
+python-docx, PyMuPDF y pyproj, informa el avance a medida que terminan y
+devuelve los resultados en el mismo orden de entrada. Cada archivo se mide por
+etapa (tiempos.py) en el proceso que lo lee, y sus tiempos vuelven con el resultado.
+"""
+import os
+import sys
+import threading
+import multiprocessing as mp
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from cache_fichas import cache_por_defecto, FALTA
+from fotos import fotos_en
+from tiempos import Medicion, etapa, registrar, LECTURA, CACHE
+from perfilado import perfilando
+
+# Módulos que cada trabajador importa al arrancar para no pagar el costo en el primer archivo.
+MODULOS_PRECARGA = ["coordenadas", "extraccion", "recoleccion", "excavacion", "kml", "cache_fichas", "fotos", "lector_docx", "pagina_pdf", "plantillas_pdf"]
+
+# Se puede fijar con la variable de entorno ARQUEOLOGIA_WORKERS.
+WORKERS_POR_DEFECTO = int(os.environ.get("ARQUEOLOGIA_WORKERS", 0)) or max(1, min(4, (os.cpu_count() or 1) - 1))
+
+# tiempos: lista de tiempos.Tiempo de ese archivo (None si no se midió, p. ej. los del proyecto).
+ResultadoArchivo = namedtuple("ResultadoArchivo", ["nombre", "valor", "error", "tiempos"], defaults=(None,))
+
+# Un pool por cantidad de trabajadores, reutilizado entre reruns de Streamlit.
+_pools = {}
+_candado_pools = threading.Lock()
+
+
+def _calentar(rutas_busqueda):
+    for ruta in rutas_busqueda:
+        if ruta not in sys.path:
+            sys.path.append(ruta)
+    for nombre in MODULOS_PRECARGA:
+        __import__(nombre)
+
+
+def _contexto():
+    if "forkserver" in mp.get_all_start_methods():
+        ctx = mp.get_context("forkserver")
+        ctx.set_forkserver_preload(MODULOS_PRECARGA)
+        return ctx
+    return mp.get_context("spawn")
+
+
+def obtener_pool(workers):
+    # Las sesiones de la app y los trabajos en segundo plano lo piden desde distintos hilos.
+    with _candado_pools:
+        pool = _pools.get(workers)
+        if pool is None:
+            directorio = os.path.dirname(os.path.abspath(__file__))
+            pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=_contexto(),
+                initializer=_calentar, initargs=([directorio],),
+            )
+            _pools[workers] = pool
+        return pool
+
+
+def cerrar_pools():
+    for pool in _pools.values():
+        pool.shutdown(wait=False, cancel_futures=True)
+    _pools.clear()
+
+
+def _ejecutar(parser, nombre, datos, usar_cache=True):
+    """Corre en el trabajador. `datos` son los bytes del archivo o una ruta a leer."""
+    medicion = Medicion()
+    token = medicion.activar(nombre)
+    try:
+        # La caché va anidada: su tiempo se descuenta del de la lectura.
+        with etapa(LECTURA):
+            resultado = _leer(parser, nombre, datos, usar_cache)
+    finally:
+        medicion.desactivar(token)
+    return resultado._replace(tiempos=medicion.tiempos())
+
+
+def _leer(parser, nombre, datos, usar_cache):
+    # Aquí y no arriba: la app importa ejecutor (y proyecto) al arrancar y extraccion
+    # (pymupdf, docx, pandas) recién hace falta cuando se lee algo.
+    from extraccion import ErrorLectura
+    if isinstance(datos, Path):
+        datos = datos.read_bytes()
+    if usar_cache:
+        with etapa(CACHE):
+            cache = cache_por_defecto()
+            clave = cache.clave(parser, nombre, datos)
+            valor = cache.obtener(clave)
+        # Si el almacén de fotos ya desalojó alguna foto del resultado, se vuelve a parsear.
+        if valor is not FALTA and all(f.disponible() for f in fotos_en(valor)):
+            return ResultadoArchivo(nombre, valor, None)
+    try:
+        valor = parser(datos, nombre)
+    except ErrorLectura as e:
+        return ResultadoArchivo(nombre, None, str(e))
+    if usar_cache:
+        with etapa(CACHE):
+            cache.guardar(clave, valor)
+    return ResultadoArchivo(nombre, valor, None)
+
+
+def procesar_archivos(parser, archivos, workers=1, progreso=None, usar_cache=True, proyecto=None, parcial=None):
+    """
+    Aplica `parser(bytes, nombre)` a cada archivo y devuelve una lista de
+    ResultadoArchivo en el orden de `archivos`.
+
+    - archivos: lista de (nombre, datos), con datos en bytes o como Path.
+    - workers: procesos a usar; con 1 se procesa en el proceso actual.
+    - progreso: callback(hechos, total) llamado cada vez que termina un archivo. Si
+      levanta una excepción (p. ej. un trabajo cancelado), los archivos que todavía
+      no empezaron no se procesan.
+    - parcial: callback(ResultadoArchivo) con cada archivo apenas termina, antes de progreso.
+      Los tiempos de cada archivo se suman a la tiempos.Medicion activa, si hay una.
+    - usar_cache: consultar/guardar el resultado en la caché en disco (cache_fichas). Con un
+      perfilado.Perfil en curso en este hilo no se usa.
+    - proyecto: un proyecto.Proyecto abierto. Solo se parsean los archivos que no
+      estaban o cambiaron, y se devuelven los resultados de todos los archivos del
+      proyecto para este parser (no en el orden de `archivos`, sino por nombre).
+
+    `parser` debe ser una función de nivel de módulo (se envía por pickle).
+    Los ErrorLectura quedan en `.error`; cualquier otra excepción se propaga.
+    """
+    if perfilando():
+        # Con la respuesta de la caché el perfil no mostraría la lectura.
+        usar_cache = False
+    if proyecto is not None:
+        return proyecto.ingresar(
+            parser, archivos,
+            lambda pendientes: procesar_archivos(parser, pendientes, workers, progreso, usar_cache, parcial=parcial),
+        )
+
+    archivos = list(archivos)
+    total = len(archivos)
+    resultados = [None] * total
+
+    if workers <= 1 or total <= 1:
+        for i, (nombre, datos) in enumerate(archivos):
+            resultados[i] = _ejecutar(parser, nombre, datos, usar_cache)
+            registrar(resultados[i].tiempos)
+            if parcial:
+                parcial(resultados[i])
+            if progreso:
+                progreso(i + 1, total)
+        return resultados
+
+    pool = obtener_pool(workers)
+    futuros = {}
+    try:
+        for i, (nombre, datos) in enumerate(archivos):
+            futuros[pool.submit(_ejecutar, parser, nombre, datos, usar_cache)] = i
+        for hechos, futuro in enumerate(as_completed(futuros), 1):
+            resultados[futuros[futuro]] = futuro.result()
+            registrar(resultados[futuros[futuro]].tiempos)
+            if parcial:
+                parcial(resultados[futuros[futuro]])
+            if progreso:
+                progreso(hechos, total)
+    except BrokenProcessPool:
+        # Un trabajador murió (p. ej. un PDF que revienta PyMuPDF); el pool ya no sirve.
+        # Otra sesión puede haber creado ya uno nuevo para `workers`: solo se saca este.
+        with _candado_pools:
+            if _pools.get(workers) is pool:
+                del _pools[workers]
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    except BaseException:
+        # El pool es compartido: que no siga con los archivos de un lote abandonado.
+        for futuro in futuros:
+            futuro.cancel()
+        raise
+    return resultados
+
+
+def aplanar(resultados):
+    """
+    Junta los valores de los ResultadoArchivo (listas se extienden, dicts se agregan)
+    y devuelve (valores, errores).
+    """
+    valores, errores = [], []
+    for r in resultados:
+        if r.error:
+            errores.append(r.error)
+        elif isinstance(r.valor, list):
+            valores.extend(r.valor)
+        elif r.valor:
+            valores.append(r.valor)
+    return valores, errores
@@ -0,0 +1,229 @@
+"""
+Escritura de planillas .xlsx en streaming.
+
+Como escritor_kml: las filas se escriben de a una directo a la hoja dentro del zip,
+con cadenas en línea (sin tabla de cadenas compartidas), así que la memoria no
+depende de la cantidad de filas. pandas + openpyxl armaban todo el libro en memoria
+(un objeto por celda), lo que con los 300k puntos de un KMZ era lento y pesado.
+
+Además permite un encabezado de dos filas con grupos combinados (la planilla de
+excavación por niveles), celdas numéricas con formato por columna y anchos de columna.
+"""
+import io
+import math
+import re
+import zipfile
+from collections import namedtuple
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy as np
+import pandas as pd
+
+from tiempos import etapa, EXPORTACION
+
+# `formato`: None deja la columna como viene (números como número, texto como texto);
+# un formato de Excel ("0", "0.00", "General"...) además convierte a número los textos
+# que son números. `ancho` en caracteres; None lo calcula del título.
+Columna = namedtuple("Columna", ["titulo", "formato", "ancho"], defaults=(None, None))
+
+# Excel no admite más que esto por celda, ni estos caracteres de control en el XML.
+LARGO_MAXIMO_CELDA = 32767
+_RE_ILEGALES = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_RE_NUMERO = re.compile(r"-?\d+(\.\d+)?")
+_RE_HOJA = re.compile(r"[\[\]:*?/\\]")
+
+# Formatos que Excel trae de fábrica (no hay que declararlos en styles.xml).
+_FORMATOS_INTERNOS = {"General": 0, "0": 1, "0.00": 2, "#,##0": 3, "#,##0.00": 4}
+
+_FILAS_POR_ESCRITURA = 1000
+
+_NS = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+_NS_R = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+_XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+_CONTENT_TYPES = _XML + (
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_RELS = _XML + (
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK_RELS = _XML + (
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# Estilos fijos de cellXfs: 0 normal, 1 título de columna, 2 título de grupo.
+_XF_TITULO, _XF_GRUPO = 1, 2
+
+
+def letra_columna(n):
+    """Letra de Excel de la columna n (0 -> A, 26 -> AA)."""
+    letras = ""
+    n += 1
+    while n:
+        n, resto = divmod(n - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _texto(valor):
+    texto = _RE_ILEGALES.sub("", str(valor))[:LARGO_MAXIMO_CELDA]
+    return escape(texto)
+
+
+def _celda(ref, valor, xf, convertir):
+    """XML de una celda, o "" si va vacía."""
+    if valor is None:
+        return ""
+    if isinstance(valor, (bool, np.bool_)):
+        return f'<c r="{ref}" t="b"{xf}><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, np.integer)):
+        return f'<c r="{ref}"{xf}><v>{int(valor)}</v></c>'
+    if isinstance(valor, (float, np.floating)):
+        if not math.isfinite(valor):
+            return ""
+        return f'<c r="{ref}"{xf}><v>{float(valor)!r}</v></c>'
+    if isinstance(valor, str):
+        if not valor:
+            return ""
+        if convertir and _RE_NUMERO.fullmatch(valor):
+            numero = repr(float(valor)) if "." in valor else int(valor)
+            return f'<c r="{ref}"{xf}><v>{numero}</v></c>'
+    # pd.NA, pd.NaT y NaT de numpy (columnas Int64, fechas...) van vacías, como en to_excel.
+    # Se pregunta recién aquí: los None y NaN ya salieron arriba y las celdas comunes no pagan pd.isna.
+    if pd.api.types.is_scalar(valor) and pd.isna(valor):
+        return ""
+    return f'<c r="{ref}" t="inlineStr"{xf}><is><t xml:space="preserve">{_texto(valor)}</t></is></c>'
+
+
+def _estilos(formatos):
+    """styles.xml y {formato: índice de cellXfs} para los formatos de columna."""
+    propios = {}
+    xfs = {}
+    for formato in formatos:
+        if formato in xfs:
+            continue
+        num_fmt = _FORMATOS_INTERNOS.get(formato)
+        if num_fmt is None:
+            num_fmt = propios.setdefault(formato, 164 + len(propios))
+        xfs[formato] = (3 + len(xfs), num_fmt)
+
+    num_fmts = "".join(f'<numFmt numFmtId="{i}" formatCode={quoteattr(f)}/>' for f, i in propios.items())
+    cell_xfs = (
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1" applyAlignment="1">'
+        '<alignment horizontal="center"/></xf>'
+        + "".join(f'<xf numFmtId="{n}" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+                  for _, n in xfs.values())
+    )
+    xml = _XML + (
+        f'<styleSheet {_NS}>'
+        + (f'<numFmts count="{len(propios)}">{num_fmts}</numFmts>' if propios else "")
+        + '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+          '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+          '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+          '<fill><patternFill patternType="gray125"/></fill></fills>'
+          '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+          '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        + f'<cellXfs count="{3 + len(xfs)}">{cell_xfs}</cellXfs>'
+        + '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    )
+    return xml, {f: i for f, (i, _) in xfs.items()}
+
+
+def _encabezado_hoja(columnas, filas_fijas):
+    anchos = "".join(
+        f'<col min="{i}" max="{i}" width="{c.ancho or min(60, max(10, len(str(c.titulo)) + 2))}" customWidth="1"/>'
+        for i, c in enumerate(columnas, 1)
+    )
+    vista = '<sheetView workbookViewId="0"/>'
+    if filas_fijas:
+        vista = (f'<sheetView workbookViewId="0"><pane ySplit="{filas_fijas}" topLeftCell="A{filas_fijas + 1}" '
+                 'activePane="bottomLeft" state="frozen"/></sheetView>')
+    return (_XML + f'<worksheet {_NS} {_NS_R}><sheetViews>{vista}</sheetViews>'
+            f'<sheetFormatPr defaultRowHeight="15"/><cols>{anchos}</cols><sheetData>')
+
+
+def _escribir_hoja(salida, columnas, xfs, filas, grupos, encabezado):
+    """Escribe el XML de la hoja en `salida` fila por fila y devuelve cuántas filas escribió."""
+    letras = [letra_columna(i) for i in range(len(columnas))]
+    estilos = [f' s="{xfs[c.formato]}"' if c.formato else "" for c in columnas]
+    convertir = [c.formato is not None for c in columnas]
+
+    filas_fijas = (1 if encabezado else 0) + (1 if grupos and encabezado else 0)
+    salida.write(_encabezado_hoja(columnas, filas_fijas).encode("utf-8"))
+
+    n = 0
+    combinadas = []
+    if encabezado and grupos:
+        n += 1
+        celdas, inicio = [], 0
+        for titulo, ancho in grupos:
+            if titulo:
+                celdas.append(_celda(f"{letras[inicio]}{n}", titulo, f' s="{_XF_GRUPO}"', False))
+                if ancho > 1:
+                    combinadas.append(f"{letras[inicio]}{n}:{letras[inicio + ancho - 1]}{n}")
+            inicio += ancho
+        salida.write(f'<row r="{n}">{"".join(celdas)}</row>'.encode("utf-8"))
+    if encabezado:
+        n += 1
+        celdas = "".join(_celda(f"{letras[i]}{n}", c.titulo, f' s="{_XF_TITULO}"', False)
+                         for i, c in enumerate(columnas))
+        salida.write(f'<row r="{n}">{celdas}</row>'.encode("utf-8"))
+
+    bloque = []
+    for fila in filas:
+        n += 1
+        celdas = "".join(_celda(f"{letras[i]}{n}", v, estilos[i], convertir[i]) for i, v in enumerate(fila))
+        bloque.append(f'<row r="{n}">{celdas}</row>')
+        if len(bloque) >= _FILAS_POR_ESCRITURA:
+            salida.write("".join(bloque).encode("utf-8"))
+            bloque = []
+    salida.write("".join(bloque).encode("utf-8"))
+
+    salida.write(b"</sheetData>")
+    if combinadas:
+        refs = "".join(f'<mergeCell ref="{r}"/>' for r in combinadas)
+        salida.write(f'<mergeCells count="{len(combinadas)}">{refs}</mergeCells>'.encode("utf-8"))
+    salida.write(b"</worksheet>")
+    return n
+
+
+@etapa(EXPORTACION)
+def crear_xlsx(columnas, filas, hoja="Hoja1", grupos=None, encabezado=True, destino=None):
+    """
+    Arma un .xlsx de una hoja con `columnas` (lista de Columna) y `filas` (cualquier
+    iterable de secuencias con un valor por columna; se consume una sola vez).
+    `grupos` es una lista de (título, cantidad de columnas) que agrega sobre los
+    títulos una fila con cada grupo combinado; un título vacío deja las celdas sueltas.
+    Con `destino` (ruta o archivo binario abierto) se escribe ahí y no se devuelve
+    nada; si no, devuelve los bytes.
+    """
+    estilos, xfs = _estilos([c.formato for c in columnas if c.formato])
+    hoja = _RE_HOJA.sub("", hoja)[:31] or "Hoja1"
+    workbook = _XML + (
+        f'<workbook {_NS} {_NS_R}><sheets>'
+        f'<sheet name={quoteattr(hoja)} sheetId="1" r:id="rId1"/></sheets></workbook>'
+    )
+    buffer = io.BytesIO() if destino is None else None
+    with zipfile.ZipFile(buffer or destino, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _RELS)
+        zf.writestr("xl/workbook.xml", workbook)
+        zf.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        zf.writestr("xl/styles.xml", estilos)
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as salida:
+            _escribir_hoja(salida, columnas, xfs, filas, grupos, encabezado)
+    return buffer.getvalue() if buffer is not None else None
@@ -0,0 +1,65 @@
+"""
+Escritura de KML/KMZ en streaming.
+
+Los Placemark se escriben de a uno directo a la entrada doc.kml del zip (o a
+cualquier archivo abierto), con nombre y descripción escapados para XML. La
+memoria no depende de la cantidad de puntos y el costo es lineal.
+"""
+import io
+import zipfile
+from xml.sax.saxutils import escape
+
+from tiempos import etapa, EXPORTACION
+
+ENCABEZADO_KML = """<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2">
+  <Document>
+    <name>{nombre}</name>"""
+PIE_KML = """
+  </Document>
+</kml>"""
+PLACEMARK_KML = """
+    <Placemark>
+      <name>{nombre}</name>
+      <description>{desc}</description>
+      <Point>
+        <coordinates>{lon},{lat},0</coordinates>
+      </Point>
+    </Placemark>"""
+
+
+def escribir_kml(salida, puntos, nombre_documento="Hallazgos Arqueológicos"):
+    """
+    Escribe el documento KML en `salida` (archivo de texto abierto).
+    `puntos` es cualquier iterable de dicts con nombre, desc, lat y lon.
+    Devuelve la cantidad de Placemark escritos.
+    """
+    salida.write(ENCABEZADO_KML.format(nombre=escape(nombre_documento)))
+    n = 0
+    for p in puntos:
+        salida.write(PLACEMARK_KML.format(
+            nombre=escape(str(p['nombre'])), desc=escape(str(p['desc'])), lon=p['lon'], lat=p['lat']
+        ))
+        n += 1
+    salida.write(PIE_KML)
+    return n
+
+
+def crear_kml_texto(puntos):
+    salida = io.StringIO()
+    escribir_kml(salida, puntos)
+    return salida.getvalue()
+
+
+@etapa(EXPORTACION)
+def crear_kmz(puntos, destino=None):
+    """
+    Empaqueta los puntos como KMZ. Con `destino` (ruta o archivo binario abierto)
+    se escribe ahí y no se devuelve nada; si no, devuelve los bytes del KMZ.
+    """
+    buffer = io.BytesIO() if destino is None else None
+    with zipfile.ZipFile(buffer or destino, "w", zipfile.ZIP_DEFLATED) as zf:
+        with zf.open("doc.kml", "w") as entrada:
+            with io.TextIOWrapper(entrada, encoding="utf-8", newline="") as texto:
+                escribir_kml(texto, puntos)
+    return buffer.getvalue() if buffer is not None else None
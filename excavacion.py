@@ -0,0 +1,124 @@
+"""
+Extracción de Fichas de Excavación (PDF) y armado de la planilla horizontal
+por niveles, sin dependencia de Streamlit. La interfaz vive en modulo_excavacion.py.
+"""
+from extraccion import ErrorLectura
+from escritor_excel import Columna, crear_xlsx
+from plantillas_pdf import Plantilla, Matriz, Tabla, Observacion, Respaldo, compilar
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+# Subir al cambiar lo que devuelven los parsers de este módulo (invalida cache_fichas).
+VERSION_PARSER = 2
+
+CAMPOS_CABECERA = ["Sitio", "Unidad", "C. Norte", "C. Este", "Dimensión", "Fecha", "Responsable"]
+COLUMNAS_NIVEL = ["Capa", "Litico", "Osteofauna", "Malacologico", "Vidrio", "Metal", "Ceramica", "Otros"]
+SUFIJOS_NIVEL = ["_Sup", "_I", "_II", "_III", "_IV", "_V"]
+
+ETIQUETAS_DESCARTAR = [
+    "sitio", "responsable", "cuadrante", "dimensión", "dimension", "fecha", "material", "superficie",
+    "coordenadas", "identificación", "procedencia y material cultural",
+]
+
+PLANTILLA_EXCAVACION = compilar(Plantilla(
+    # Diccionario base con sufijos únicos
+    campos=(
+        CAMPOS_CABECERA
+        + [f"{c}{s}" for s in SUFIJOS_NIVEL for c in COLUMNAS_NIVEL]
+        + [f"Obs{s}" for s in SUFIJOS_NIVEL]
+    ),
+    # 1. Cabecera en matriz: las 7 etiquetas seguidas y después los 7 valores (la
+    # primera aparición de cada etiqueta, que es la tabla superior)
+    matriz=Matriz(
+        campos=[
+            ("Sitio", ["sitio"]), ("Unidad", ["unidad"]), ("C. Norte", ["c. norte"]), ("C. Este", ["c. este"]),
+            ("Dimensión", ["dimensión", "dimension"]), ("Fecha", ["fecha"]), ("Responsable", ["responsable"]),
+        ],
+        desde="Sitio", ancla="Responsable", distancia=6, desplazamiento=7,
+    ),
+    # 2. Tabla de materiales: una fila por nivel
+    tabla=Tabla(
+        filas=list(zip(["superficial", "0-10", "10-20", "20-30", "30-40", "40-50"], SUFIJOS_NIVEL)),
+        columnas=COLUMNAS_NIVEL,
+        excluir=["observaci", "registro", "foto"],
+        minimo_numeros=3, largo_primera=15,
+    ),
+    # 3. Observaciones reales por nivel
+    observacion=Observacion(
+        disparador="observaci", campo="Obs",
+        filas=[
+            (["superficial"], "_Sup"),
+            (["0-10", " i ", " 1 "], "_I"),
+            (["10-20", " ii ", " 2 "], "_II"),
+            (["20-30", " iii ", " 3 "], "_III"),
+            (["30-40", " iv ", " 4 "], "_IV"),
+            (["40-50", " v ", " 5 "], "_V"),
+        ],
+        excluir_siguiente=["registro", "observaci"],
+    ),
+    # Respaldos Regex individuales por seguridad
+    respaldos=[
+        Respaldo("Sitio", r"(HLU-\d+|Sitio\s*([A-Za-z0-9\-]+))", quitar="Sitio"),
+        Respaldo("Unidad", r"(HLU-HP-\d+|Unidad\s*([A-Za-z0-9\-]+))", quitar="Unidad"),
+        Respaldo("C. Norte", r"C\. Norte\s*\n+(\d+)"),
+        Respaldo("C. Este", r"C\. Este\s*\n+(\d+)"),
+        Respaldo("Dimensión", r"(\d+\s*[mM]\s*[xX]\s*\d+\s*[mM])"),
+        Respaldo("Fecha", r"(\d{2}[-/]\d{2}[-/]\d{4})"),
+        # SEGURO DIRECTO: si falló la matriz, el texto inmediatamente continuo a la fecha
+        Respaldo("Responsable", r"(\d{2}[-/]\d{2}[-/]\d{4})\s*\n+([A-Za-zÁéíóúÁÉÍÓÚñÑ\s]+)(?:\n|$)",
+                 grupo=2, rechazar=["nivel", "capa"]),
+    ],
+    descartar=ETIQUETAS_DESCARTAR,
+))
+
+
+def extraer_datos_excavacion(pdf_bytes, nombre_archivo):
+    if fitz is None:
+        raise ErrorLectura("Falta instalar la librería 'pymupdf'.")
+    try:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    except Exception as e:
+        raise ErrorLectura(f"Error abriendo PDF {nombre_archivo}: {e}")
+
+    texto_completo = ""
+    for pagina in doc:
+        texto_completo += pagina.get_text("text") + "\n"
+
+    lineas = [l.strip() for l in texto_completo.split('\n') if l.strip()]
+    return PLANTILLA_EXCAVACION.extraer(lineas, texto_completo)
+
+# ESTRUCTURA DE ENCABEZADO MULTINIVEL EXACTA: cada nivel combinado sobre sus 8 columnas
+NIVELES_EXCEL = ["Superficial", "I (0-10 cm)", "II (10-20 cm)", "III (20-30 cm)", "IV (30-40 cm)", "V (40-50 cm)"]
+
+GRUPOS_EXCAVACION = (
+    [("", len(CAMPOS_CABECERA))]
+    + [(nivel, len(COLUMNAS_NIVEL)) for nivel in NIVELES_EXCEL]
+    + [("", len(SUFIJOS_NIVEL))]
+)
+
+TITULOS_EXCAVACION = [
+    "Sitio", "Unidad", "C. Norte", "C. Este", "Dimensión", "Fecha", "Responsable"
+] + ["Capa", "Litico", "Osteofauna", "Malacológico", "Vidrio", "Metal", "Cerámica", "Otros"] * 6 + [
+    "Observacion nivel Superficial:", "Observacion nivel I (0-10 cm):", "Observacion nivel II (10-20 cm):",
+    "Observacion nivel III (20-30 cm):", "Observacion nivel IV (30-40 cm):", "Observacion nivel V (40-50 cm):"
+]
+
+# Coordenadas y conteos de material van como número; la capa y el resto, como texto.
+_FORMATOS = {"C. Norte": "General", "C. Este": "General"}
+_FORMATOS.update({f"{c}{s}": "0" for s in SUFIJOS_NIVEL for c in COLUMNAS_NIVEL if c != "Capa"})
+
+COLUMNAS_EXCEL_EXCAVACION = [
+    Columna(titulo, _FORMATOS.get(campo))
+    for titulo, campo in zip(TITULOS_EXCAVACION, PLANTILLA_EXCAVACION.plantilla.campos)
+]
+
+def excel_excavacion(fichas, destino=None):
+    """
+    .xlsx de la planilla horizontal (una fila por ficha) con el encabezado de dos
+    filas. Devuelve los bytes, o lo escribe en `destino` si se da.
+    """
+    campos = PLANTILLA_EXCAVACION.plantilla.campos
+    filas = ([ficha.get(c, "") for c in campos] for ficha in fichas)
+    return crear_xlsx(COLUMNAS_EXCEL_EXCAVACION, filas, "Hoja1", grupos=GRUPOS_EXCAVACION, destino=destino)
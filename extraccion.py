@@ -0,0 +1,675 @@
+"""
+Lógica de extracción y generación de documentos sin dependencia de Streamlit.
+
+Este módulo contiene los parsers de las herramientas de main.py para que puedan
+usarse desde la interfaz web, desde la línea de comandos (procesar_lote.py) o
+importarse directamente desde otros scripts.
+"""
+import io
+import re
+from collections import namedtuple
+from docx import Document
+from docx.shared import Inches, Pt, Cm
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.enum.table import WD_TABLE_ALIGNMENT
+from docx.enum.section import WD_ORIENT
+import pandas as pd
+from fotos import reducir_fotos, diferir
+from lector_docx import DocumentoDocx, celdas_unicas, celda_abajo
+from pagina_pdf import PaginaPDF
+from escritor_excel import Columna, crear_xlsx
+from tiempos import etapa, IMAGENES, EXPORTACION
+from coordenadas import (
+    HUSO_POR_DEFECTO, EPSG_WGS84, epsg_utm_sur, obtener_transformer, detectar_huso, utm_a_wgs84,
+)
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+
+# Subir al cambiar lo que devuelven los parsers de este módulo (invalida cache_fichas).
+VERSION_PARSER = 8
+
+class ErrorLectura(Exception):
+    """Un archivo no se pudo abrir o leer. El mensaje ya viene listo para mostrar."""
+
+
+# ==========================================
+# 1. FUNCIONES AUXILIARES
+# ==========================================
+
+def limpiar_coordenada(texto):
+    texto_limpio = texto.replace(".", "").replace(" ", "").strip()
+    texto_limpio = texto_limpio.replace(",", ".")
+    try:
+        return float(texto_limpio)
+    except:
+        return None
+
+# ==========================================
+# 2. LÓGICA: GENERADOR WORD (MAP - DESDE WORD)
+# ==========================================
+
+def procesar_archivo_v12(archivo_bytes, nombre_archivo):
+    try:
+        doc = DocumentoDocx(archivo_bytes)
+    except Exception as e:
+        raise ErrorLectura(f"Error leyendo {nombre_archivo}: {e}")
+
+    fichas_extraidas = []
+    fecha_persistente = "Sin Fecha"
+
+    for tabla in doc.tablas:
+        datos_ficha = {
+            "fecha_propia": None, "actividad": "", "hallazgos": "", "items_foto": [] 
+        }
+        rids_procesados = set()
+        en_seccion_fotos = False
+        
+        for r_idx, fila in enumerate(tabla):
+            texto_fila = " ".join([c.texto for c in fila]).strip()
+            celdas_fila = celdas_unicas(fila)
+            
+            if "Fecha" in texto_fila:
+                for celda in fila:
+                    t = celda.texto
+                    if "Fecha" not in t and len(t) > 5:
+                        datos_ficha["fecha_propia"] = t
+                        fecha_persistente = t
+                        break
+            
+            if "Descripción de la actividad" in texto_fila:
+                mejor_texto = ""
+                for _, celda in celdas_fila:
+                    t = celda.texto
+                    if "Descripción" in t or "Actividad" in t: continue
+                    if len(t) > len(mejor_texto):
+                        mejor_texto = t
+                if mejor_texto:
+                    datos_ficha["actividad"] = mejor_texto
+
+            if "Ausencia" in texto_fila and any(c.texto.upper() == "X" for c in fila):
+                datos_ficha["hallazgos"] = "Ausencia de hallazgos arqueológicos no previstos."
+            if "Presencia" in texto_fila and any(c.texto.upper() == "X" for c in fila):
+                datos_ficha["hallazgos"] = "PRESENCIA de hallazgos arqueológicos."
+
+            if "Registro fotográfico" in texto_fila:
+                en_seccion_fotos = True
+                continue 
+
+            if en_seccion_fotos:
+                for c_idx, celda in celdas_fila:
+                    lista_imgs_ids = doc.imagenes(celda)
+                    if lista_imgs_ids:
+                        texto_leyenda = celda.texto
+                        if not texto_leyenda:
+                            texto_leyenda = celda_abajo(tabla, r_idx, c_idx)
+                        
+                        for rId, blob in lista_imgs_ids:
+                            if rId in rids_procesados: continue
+                            rids_procesados.add(rId)
+                            datos_ficha["items_foto"].append({
+                                "blob": diferir(blob), "leyenda": texto_leyenda
+                            })
+
+        fecha_final = datos_ficha["fecha_propia"] if datos_ficha["fecha_propia"] else fecha_persistente
+        
+        if datos_ficha["actividad"] or datos_ficha["items_foto"]:
+            texto_central = datos_ficha["actividad"]
+            if datos_ficha["hallazgos"]:
+                texto_central += f"\n\n[Hallazgos: {datos_ficha['hallazgos']}]"
+            
+            fichas_extraidas.append({
+                "fecha": fecha_final, "texto_central": texto_central, "fotos": datos_ficha["items_foto"]
+            })
+
+    return fichas_extraidas
+
+@etapa(EXPORTACION)
+def generar_word_con_formato(datos, ajuste_fotos=None):
+    """
+    Tabla resumen MAP en Word. Las fotos se reducen a 8x6 cm con `ajuste_fotos`
+    (fotos.AjusteFotos; por defecto fotos.AJUSTE_POR_DEFECTO).
+    """
+    doc = Document()
+    titulo = doc.add_heading('Tabla Resumen Monitoreo Arqueológico', 0)
+    titulo.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    
+    tabla = doc.add_table(rows=1, cols=3)
+    tabla.style = 'Table Grid'
+    tabla.autofit = False
+    tabla.alignment = WD_TABLE_ALIGNMENT.CENTER 
+
+    headers = tabla.rows[0].cells
+    titulos = ["Fecha", "Actividades realizadas durante el MAP", "Imagen de la actividad"]
+    
+    for i, texto in enumerate(titulos):
+        parrafo = headers[i].paragraphs[0]
+        run = parrafo.add_run(texto)
+        run.font.name = 'Franklin Gothic Book'
+        run.font.size = Pt(9)
+        run.bold = True
+        parrafo.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    for c in tabla.columns[0].cells: c.width = Cm(2.5) 
+    for c in tabla.columns[1].cells: c.width = Cm(7.5) 
+    for c in tabla.columns[2].cells: c.width = Cm(8.5) 
+
+    fotos_reducidas = reducir_fotos(
+        (foto_obj["blob"] for item in datos for foto_obj in item["fotos"]), 8, 6, ajuste_fotos
+    )
+
+    for item in datos:
+        row = tabla.add_row().cells
+        p_fecha = row[0].paragraphs[0]
+        p_fecha.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        r_fecha = p_fecha.add_run(str(item["fecha"]))
+        r_fecha.font.name = 'Franklin Gothic Book'
+        r_fecha.font.size = Pt(9)
+
+        p_act = row[1].paragraphs[0]
+        p_act.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+        r_act = p_act.add_run(str(item["texto_central"]))
+        r_act.font.name = 'Franklin Gothic Book'
+        r_act.font.size = Pt(9)
+        
+        celda_img = row[2]
+        p_img = celda_img.paragraphs[0]
+        p_img.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        
+        if not item["fotos"]:
+            r_sin = p_img.add_run("[Sin fotos]")
+            r_sin.font.name = 'Franklin Gothic Book'
+            r_sin.font.size = Pt(9)
+        else:
+            for i, foto_obj in enumerate(item["fotos"]):
+                # Incluye la espera por la reducción, que corre en otros hilos.
+                with etapa(IMAGENES):
+                    blob = next(fotos_reducidas)
+                    try:
+                        run = p_img.add_run()
+                        if blob:
+                            run.add_picture(io.BytesIO(blob), width=Cm(8), height=Cm(6))
+                        else:
+                            # Se desalojó del almacén después de leer el archivo: que se note en el Word.
+                            run.text = "[Foto no disponible]"
+                            run.font.name = 'Franklin Gothic Book'
+                            run.font.size = Pt(9)
+                        if foto_obj["leyenda"]:
+                            r_leyenda = p_img.add_run(f"\n{foto_obj['leyenda']}")
+                            r_leyenda.font.name = 'Franklin Gothic Book'
+                            r_leyenda.font.size = Pt(9)
+                            r_leyenda.italic = True
+                        if i < len(item["fotos"]) - 1:
+                            p_img.add_run("\n\n")
+                    except:
+                        continue
+    
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+# ==========================================
+# 2.1 LÓGICA NUEVA: GENERADOR WORD MAP (DESDE PDF) - V8 FINAL (Con Hallazgos)
+# ==========================================
+
+def procesar_pdf_a_word_map(pdf_bytes, nombre_archivo):
+    """
+    Extrae Fecha, Actividad y Fotos de reportes en PDF usando PyMuPDF (fitz).
+    - Captura actividad entre Sección IV y VI (Estado Persistente).
+    - Detecta "Presencia de Hallazgos" y agrega texto resumen "Se identificaron..." o "No se identificaron...".
+    - Filtra fotos (Logo Header, íconos y fotos repetidas en varias páginas).
+    """
+    if fitz is None:
+        raise ErrorLectura("Falta instalar la librería 'pymupdf'.")
+    try:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    except Exception as e:
+        raise ErrorLectura(f"Error abriendo PDF {nombre_archivo}: {e}")
+
+    fichas = []
+    ficha_actual = {
+        "fecha": None,
+        "texto_central": "",
+        "fotos": []
+    }
+    
+    # --- VARIABLES DE ESTADO Y CONFIGURACIÓN ---
+    capturando_descripcion = False
+    
+    # Textos basura a limpiar de la descripción
+    blacklist_clean = [
+        "V. DESCRIPCIONES", "Descripción de la Actividad", 
+        "Huso", "18 G", "19 H", "Datum", "WGS84",
+        "Coordenadas", "Vértice", "Este", "Norte", "Altitud"
+    ]
+
+    # Cada imagen del PDF (xref) se extrae una sola vez en todo el documento.
+    xrefs_extraidas = set()
+
+    for pagina in doc:
+        # 1. TEXTO Y BLOQUES (ordenados visualmente) EN UNA SOLA EXTRACCIÓN
+        layout = PaginaPDF(pagina)
+        bloques = layout.bloques
+        texto_plano_pagina = layout.texto
+
+        # DETECTAR NUEVA FICHA (Reset)
+        if layout.contiene("I. IDENTIFICACIÓN", "Ficha de Monitoreo Arqueológico"):
+            if ficha_actual["fecha"] or ficha_actual["texto_central"] or ficha_actual["fotos"]:
+                fichas.append(ficha_actual)
+            ficha_actual = { "fecha": None, "texto_central": "", "fotos": [] }
+            capturando_descripcion = False
+
+        # 2. EXTRAER FECHA
+        if not ficha_actual["fecha"]:
+            match_fecha = re.search(r"(\d{2}/\d{2}/\d{4})", texto_plano_pagina)
+            if match_fecha:
+                ficha_actual["fecha"] = match_fecha.group(1)
+
+        # 3. EXTRAER ACTIVIDAD (Lógica de Estado Persistente)
+        for i, b in enumerate(bloques):
+            txt = b.texto
+            
+            # --- LÓGICA DE CAPTURA DE TEXTO (V a VI) ---
+            # A. Inicio
+            if "V. DESCRIPCIONES" in txt or "Descripción de la Actividad" in txt:
+                capturando_descripcion = True
+                continue 
+
+            # B. Fin
+            if "VI. CARACTERÍSTICAS" in txt or "CARACTERÍSTICAS DE LA CAPA" in txt:
+                capturando_descripcion = False
+            
+            # C. Captura
+            if capturando_descripcion:
+                if len(txt) < 3: continue # Ignorar basura pequeña
+                
+                # Chequeo anti-título
+                es_titulo = False
+                for bad in blacklist_clean:
+                    if bad in txt:
+                        es_titulo = True
+                        break
+                
+                if not es_titulo:
+                    if ficha_actual["texto_central"]:
+                         ficha_actual["texto_central"] += "\n" + txt
+                    else:
+                         ficha_actual["texto_central"] = txt
+
+            # --- LÓGICA NUEVA: DETECCIÓN DE HALLAZGOS (VII) ---
+            # Buscamos la etiqueta "Presencia de Hallazgos"
+            if "Presencia de Hallazgos" in txt:
+                texto_resultado = ""
+                
+                # Opción 1: El Sí/No está en el mismo bloque (ej. "Presencia de Hallazgos No")
+                if re.search(r"Presencia de Hallazgos\s*No", txt, re.IGNORECASE):
+                    texto_resultado = "No se identificaron hallazgos"
+                elif re.search(r"Presencia de Hallazgos\s*(Sí|Si)", txt, re.IGNORECASE):
+                    texto_resultado = "Se identificaron hallazgos"
+                
+                # Opción 2: El Sí/No está en el bloque siguiente (celda visualmente contigua)
+                elif i + 1 < len(bloques):
+                    txt_next = bloques[i+1].texto
+                    if "No" == txt_next or "No" in txt_next[:3]:
+                        texto_resultado = "No se identificaron hallazgos"
+                    elif "Sí" in txt_next or "Si" in txt_next or "Sí" == txt_next:
+                        texto_resultado = "Se identificaron hallazgos"
+                
+                # Agregar el resultado al texto central (evitando duplicados en la misma ficha)
+                if texto_resultado:
+                    if texto_resultado not in ficha_actual["texto_central"]:
+                        ficha_actual["texto_central"] += "\n\n" + texto_resultado
+
+        # 4. EXTRAER FOTOS
+        sin_fotos = layout.contiene("No se registraron fotografías", "No se registraron fotografias") or \
+                    "No se registraron fotografias" in texto_plano_pagina.lower()
+
+        if not sin_fotos:
+            i_titulo_VIII = layout.buscar("VIII. REGISTRO FOTOGRÁFICO")
+            tiene_titulo_VIII = i_titulo_VIII is not None
+            y_titulo_VIII = bloques[i_titulo_VIII].y1 if tiene_titulo_VIII else 0
+
+            for img in layout.imagenes():
+                xref, ancho, alto = img[0], img[2], img[3]
+
+                # FILTROS (primero los que no necesitan decodificar nada)
+                if ancho < 150 or alto < 150: continue # Iconos (tamaño según get_images)
+                if xref in xrefs_extraidas: continue # Misma foto en otra página: ya está
+                bbox = layout.bbox_imagen(img)
+                if bbox.y0 < 150: continue # Logo Header
+                if tiene_titulo_VIII and bbox.y0 < y_titulo_VIII: continue # Antes del título
+
+                with etapa(IMAGENES):
+                    image_bytes = doc.extract_image(xref)["image"]
+                xrefs_extraidas.add(xref)
+                leyenda_encontrada = ""
+                for j in layout.cerca_de(bbox.y0, bbox.y1, 70):
+                    b_text = bloques[j].texto
+                    if len(b_text) > 5 and "REGISTRO FOTOGRÁFICO" not in b_text:
+                        leyenda_encontrada = b_text
+                        break
+                
+                ficha_actual["fotos"].append({
+                    "blob": diferir(image_bytes),
+                    "leyenda": leyenda_encontrada
+                })
+
+    if ficha_actual["fecha"] or ficha_actual["texto_central"] or ficha_actual["fotos"]:
+        fichas.append(ficha_actual)
+
+    return fichas
+
+# ==========================================
+# 3. LÓGICA: GENERADOR EXCEL (DESDE WORD)
+# ==========================================
+
+def procesar_word_a_excel(archivo_bytes, nombre_archivo):
+    try:
+        doc = DocumentoDocx(archivo_bytes)
+    except Exception as e:
+        raise ErrorLectura(f"Error leyendo {nombre_archivo}: {e}")
+
+    registros = []
+    
+    for tabla in doc.tablas:
+        dato = {
+            "Fecha": "",
+            "Descripción de la actividad": "",
+            "Descripción estratigráfica": ""
+        }
+        encontrado = False 
+        
+        for fila in tabla:
+            for i, celda in enumerate(fila):
+                texto_celda = celda.texto
+                
+                if "Fecha" in texto_celda and len(texto_celda) < 20:
+                    if i + 1 < len(fila):
+                        dato["Fecha"] = fila[i+1].texto
+                        encontrado = True
+                
+                if "Descripción de la actividad" in texto_celda:
+                    if i + 1 < len(fila):
+                        dato["Descripción de la actividad"] = fila[i+1].texto
+                        encontrado = True
+
+                if "Descripción estratigráfica" in texto_celda:
+                    if i + 1 < len(fila):
+                        dato["Descripción estratigráfica"] = fila[i+1].texto
+                        encontrado = True
+
+        if encontrado:
+            if dato["Fecha"] or dato["Descripción de la actividad"] or dato["Descripción estratigráfica"]:
+                registros.append(dato)
+                
+    return registros
+
+# ==========================================
+# 4. LÓGICA: GENERADOR FICHAS MAESTRO (DESDE WORD)
+# ==========================================
+
+class FichaHallazgo(namedtuple("FichaHallazgo", [
+    "id_sitio", "norte", "este", "huso", "categoria", "descripcion", "fecha",
+    "responsable", "cronologia", "foto", "lat", "lon",
+])):
+    """
+    Una Ficha de Hallazgo leída de un DOCX. Alimenta las cuatro salidas (Excel, Word,
+    KMZ y mapa) sin volver a leer el archivo. `norte`/`este` son el texto de la ficha;
+    `lat`/`lon` quedan en None si las coordenadas no se pudieron interpretar.
+    """
+    __slots__ = ()
+
+    def como_fila(self):
+        """Dict con las columnas del Excel / Word de fichas (y la foto en "foto_blob")."""
+        return {
+            "ID Sitio": self.id_sitio, "Coord. Norte": self.norte, "Coord. Este": self.este,
+            "Categoría": self.categoria, "Descripción": self.descripcion, "Fecha": self.fecha,
+            "Responsable": self.responsable, "Cronología": self.cronologia, "foto_blob": self.foto,
+        }
+
+    def como_punto(self):
+        """Dict de punto para KMZ y mapa (nombre, desc, lat, lon, foto)."""
+        return {"nombre": self.id_sitio, "desc": self.categoria, "lat": self.lat, "lon": self.lon, "foto": self.foto}
+
+
+def leer_fichas_hallazgo(archivo_bytes, nombre_archivo):
+    """
+    Lee todas las Fichas de Hallazgo de un DOCX en una sola pasada y devuelve una
+    lista de FichaHallazgo. Las coordenadas UTM se convierten a WGS84 en el huso que
+    indica la ficha (celda "Huso"), o 18S si no lo indica; todas las del archivo en
+    un solo lote.
+    """
+    try:
+        doc = DocumentoDocx(archivo_bytes)
+    except Exception as e:
+        raise ErrorLectura(f"Error leyendo {nombre_archivo}: {e}")
+
+    fichas = []
+    
+    for tabla in doc.tablas:
+        info = {
+            "ID Sitio": "", "Coord. Norte": "", "Coord. Este": "", 
+            "Categoría": "", "Descripción": "", "Fecha": "", 
+            "Responsable": "", "Cronología": "", "foto_blob": None
+        }
+        huso = HUSO_POR_DEFECTO
+        es_ficha = False
+        crono_checks = [] 
+        crono_extra = [] 
+
+        for r_idx, fila in enumerate(tabla):
+            for c_idx, celda in enumerate(fila):
+                txt = celda.texto
+                
+                if "ID Sitio" in txt and c_idx + 1 < len(fila):
+                    val = fila[c_idx+1].texto
+                    if val:
+                        info["ID Sitio"] = val
+                        es_ficha = True
+                
+                if "Fecha" in txt and c_idx + 1 < len(fila):
+                    info["Fecha"] = fila[c_idx+1].texto
+                        
+                if "Responsable" in txt and c_idx + 1 < len(fila):
+                    info["Responsable"] = fila[c_idx+1].texto
+
+                if "Categoría" in txt and c_idx + 1 < len(fila):
+                    info["Categoría"] = fila[c_idx+1].texto
+
+                if "Coord. Central Norte" in txt and c_idx + 1 < len(fila):
+                    info["Coord. Norte"] = fila[c_idx+1].texto
+                if "Coord. Central Este" in txt and c_idx + 1 < len(fila):
+                    info["Coord. Este"] = fila[c_idx+1].texto
+
+                if "Huso" in txt:
+                    vecino = fila[c_idx+1].texto if c_idx + 1 < len(fila) else ""
+                    huso = detectar_huso(f"{txt} {vecino}", huso)
+
+                # Descripción
+                if txt == "Descripción": 
+                    if c_idx + 1 < len(fila):
+                        vecino = fila[c_idx+1].texto
+                        if "CRONOLOGÍA" not in vecino:
+                            info["Descripción"] = vecino
+                
+                # Cronología
+                opciones = ["Prehispánico", "Subactual", "Incierto", "Histórico"]
+                for op in opciones:
+                    if op in txt:
+                        if c_idx + 1 < len(fila):
+                            val_vecino = fila[c_idx+1].texto.upper()
+                            if "X" in val_vecino:
+                                crono_checks.append(op)
+                
+                if "Periodo específico" in txt:
+                    if c_idx + 1 < len(fila):
+                        val = fila[c_idx+1].texto
+                        val = val.replace("Periodo específico:", "").replace("Periodo específico", "").strip()
+                        if val and len(val) > 1 and "X" not in val.upper():
+                            crono_extra.append(f"Periodo específico: {val}")
+
+                # Foto
+                if "Fotografía detalle" in txt:
+                    if r_idx > 0 and c_idx < len(tabla[r_idx - 1]):
+                        imgs = doc.imagenes(tabla[r_idx - 1][c_idx])
+                        if imgs:
+                            info["foto_blob"] = diferir(imgs[0][1])
+
+        full_crono = crono_checks + crono_extra
+        if full_crono:
+            info["Cronología"] = ", ".join(list(set(full_crono)))
+
+        if es_ficha and info["ID Sitio"]:
+            fichas.append(FichaHallazgo(
+                id_sitio=info["ID Sitio"], norte=info["Coord. Norte"], este=info["Coord. Este"], huso=huso,
+                categoria=info["Categoría"], descripcion=info["Descripción"], fecha=info["Fecha"],
+                responsable=info["Responsable"], cronologia=info["Cronología"], foto=info["foto_blob"],
+                lat=None, lon=None,
+            ))
+
+    # Coordenadas: todas las de este archivo en un solo lote
+    con_coordenadas = []
+    estes, nortes, husos = [], [], []
+    for i, f in enumerate(fichas):
+        n = limpiar_coordenada(f.norte) if f.norte else None
+        e = limpiar_coordenada(f.este) if f.este else None
+        if n and e:
+            con_coordenadas.append(i)
+            estes.append(e)
+            nortes.append(n)
+            husos.append(f.huso)
+    if con_coordenadas:
+        lons, lats = utm_a_wgs84(estes, nortes, husos)
+        for i, lon, lat in zip(con_coordenadas, lons.tolist(), lats.tolist()):
+            fichas[i] = fichas[i]._replace(lat=lat, lon=lon)
+
+    return fichas
+
+
+def procesar_maestro_desde_word(archivo_bytes, nombre_archivo):
+    """Filas del Excel / Word de fichas (dicts), a partir de leer_fichas_hallazgo."""
+    return [f.como_fila() for f in leer_fichas_hallazgo(archivo_bytes, nombre_archivo)]
+
+@etapa(EXPORTACION)
+def crear_doc_tabla_horizontal(datos, ajuste_fotos=None):
+    """Tabla horizontal de Fichas de Hallazgo en Word, con la foto reducida a 4,5 cm de ancho."""
+    doc = Document()
+    
+    section = doc.sections[0]
+    new_width, new_height = section.page_height, section.page_width
+    section.orientation = WD_ORIENT.LANDSCAPE
+    section.page_width = new_width
+    section.page_height = new_height
+    section.left_margin = Cm(1.0)
+    section.right_margin = Cm(1.0)
+
+    doc.add_heading("Fichas de Hallazgos (Resumen)", 0)
+    tabla = doc.add_table(rows=1, cols=9)
+    tabla.style = 'Table Grid'
+    
+    titulos = ["ID Sitio", "Coord. Norte", "Coord. Este", "Cat. (SA/HA)", "Descripción", "Fecha", "Responsable", "Cronología", "Foto"]
+    headers = tabla.rows[0].cells
+    for i, t in enumerate(titulos):
+        headers[i].text = t
+        headers[i].paragraphs[0].runs[0].bold = True
+
+    fotos_reducidas = reducir_fotos(
+        (item["foto_blob"] for item in datos if item.get("foto_blob")), 4.5, None, ajuste_fotos
+    )
+
+    for item in datos:
+        row = tabla.add_row().cells
+        row[0].text = str(item.get("ID Sitio", ""))
+        row[1].text = str(item.get("Coord. Norte", ""))
+        row[2].text = str(item.get("Coord. Este", ""))
+        row[3].text = str(item.get("Categoría", ""))
+        row[4].text = str(item.get("Descripción", ""))
+        row[5].text = str(item.get("Fecha", ""))
+        row[6].text = str(item.get("Responsable", ""))
+        row[7].text = str(item.get("Cronología", ""))
+        
+        if item.get("foto_blob"):
+            # Incluye la espera por la reducción, que corre en otros hilos.
+            with etapa(IMAGENES):
+                blob = next(fotos_reducidas)
+                p = row[8].paragraphs[0]
+                p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                try:
+                    if blob:
+                        run = p.add_run()
+                        run.add_picture(io.BytesIO(blob), width=Cm(4.5)) 
+                    else:
+                        p.add_run("[Foto no disponible]")
+                except:
+                    p.add_run("[Err]")
+        else:
+            row[8].text = "[Sin Foto]"
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+# ==========================================
+# 5. LÓGICA: GENERADOR KMZ & MAPA INTERACTIVO
+# ==========================================
+
+def puntos_de_fichas(fichas):
+    """Puntos para KMZ/mapa de las FichaHallazgo con coordenadas válidas."""
+    return [f.como_punto() for f in fichas if f.lat is not None]
+
+
+def extraer_puntos_docx(archivo_bytes, nombre_archivo):
+    """Extrae coords y FOTOS de las Fichas de Hallazgo de un DOCX (ver leer_fichas_hallazgo)."""
+    return puntos_de_fichas(leer_fichas_hallazgo(archivo_bytes, nombre_archivo))
+
+def obtener_puntos_geograficos_con_foto(archivos, workers=1, progreso=None, proyecto=None):
+    """
+    Extrae coords y FOTOS para el mapa interactivo.
+    `archivos` es una lista de objetos con `.name` y `.read()` (UploadedFile o archivo abierto).
+    Con `proyecto`, devuelve los puntos de todas las fichas del proyecto.
+    """
+    from ejecutor import procesar_archivos, aplanar
+    try:
+        obtener_transformer(epsg_utm_sur(HUSO_POR_DEFECTO), EPSG_WGS84)
+    except:
+        return None
+
+    # Mismo parser que el Generador de Fichas: si ya se leyeron, salen de la caché.
+    resultados = procesar_archivos(leer_fichas_hallazgo, [(a.name, a.read()) for a in archivos], workers, progreso,
+                                   proyecto=proyecto)
+    fichas, _ = aplanar(resultados)
+    return puntos_de_fichas(fichas)
+
+# ==========================================
+# 6. SALIDAS (EXCEL)
+# ==========================================
+
+COLUMNAS_HALLAZGOS = ["ID Sitio", "Coord. Norte", "Coord. Este", "Categoría", "Descripción", "Fecha", "Responsable", "Cronología"]
+
+def ordenar_por_fecha(fichas):
+    """Ordena las fichas MAP por fecha; las que no tienen fecha quedan al final."""
+    fichas.sort(key=lambda x: x['fecha'] if x['fecha'] else "ZZZ")
+    return fichas
+
+def tabla_hallazgos(fichas):
+    """DataFrame de las Fichas de Hallazgo sin la foto y con las columnas en orden."""
+    df = pd.DataFrame(fichas)
+    df_excel = df.drop(columns=["foto_blob"], errors='ignore')
+    cols = [c for c in COLUMNAS_HALLAZGOS if c in df_excel.columns]
+    return df_excel[cols]
+
+def dataframe_a_excel(df, hoja, header=True, formatos=None, destino=None):
+    """
+    Serializa un DataFrame a un .xlsx en streaming (escritor_excel) y devuelve los
+    bytes, o lo escribe en `destino` si se da. `formatos` es {columna: formato de
+    Excel} para las columnas numéricas.
+    """
+    formatos = formatos or {}
+    columnas = [Columna(str(c), formatos.get(c)) for c in df.columns]
+    filas = df.itertuples(index=False, name=None)
+    return crear_xlsx(columnas, filas, hoja, encabezado=header, destino=destino)
@@ -0,0 +1,293 @@
+"""
+Reducción de fotos antes de insertarlas en los informes Word.
+
+Las fotos de los anexos suelen venir como JPEG de cámara (10-12 MP) y en el Word
+se muestran a 8x6 cm o 4,5 cm de ancho. Antes de insertarlas se reducen al tamaño
+de impresión (cm a la resolución elegida) y se recomprimen como JPEG, en varios
+hilos (Pillow libera el GIL al decodificar, escalar y comprimir).
+
+Los parsers no devuelven los bytes de cada foto sino una FotoDiferida: la foto se
+guarda una vez en un almacén en disco (por contenido, como la caché de fichas) y
+los bytes se leen recién cuando el informe la inserta. Así un lote de cientos de
+anexos no acumula todas las fotos en memoria, ni en los resultados ni en la caché.
+
+El visor de mapa no incrusta las fotos en la página: publica una miniatura y la
+foto completa como archivos estáticos de Streamlit (AlmacenMapa) y los popups solo
+llevan sus URL.
+
+Pillow es opcional: sin él, las fotos se insertan tal como vienen.
+"""
+import hashlib
+import io
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from cache_fichas import AlmacenDisco, huella
+from tiempos import etapa, IMAGENES
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+# dpi=0 significa insertar las fotos originales sin tocar.
+AjusteFotos = namedtuple("AjusteFotos", ["dpi", "calidad"])
+
+AJUSTE_POR_DEFECTO = AjusteFotos(
+    dpi=int(os.environ.get("ARQUEOLOGIA_FOTOS_DPI", 200)),
+    calidad=int(os.environ.get("ARQUEOLOGIA_FOTOS_CALIDAD", 80)),
+)
+HILOS_POR_DEFECTO = min(8, os.cpu_count() or 1)
+
+DIRECTORIO_FOTOS = Path(os.environ.get(
+    "ARQUEOLOGIA_FOTOS", Path.home() / ".cache" / "resumen-arqueologia" / "fotos"
+))
+LIMITE_MB_FOTOS = int(os.environ.get("ARQUEOLOGIA_FOTOS_MB", 8192))
+LIMITE_MB_MAPA = int(os.environ.get("ARQUEOLOGIA_MAPA_MB", 512))
+
+LADO_MINIATURA = 320
+
+
+class FotoDiferida(namedtuple("FotoDiferida", ["ruta", "tamano"])):
+    """Foto guardada en el almacén; se pasa por pickle entre procesos y a la caché."""
+    __slots__ = ()
+
+    def leer(self):
+        return Path(self.ruta).read_bytes()
+
+    def disponible(self):
+        return os.path.exists(self.ruta)
+
+    @property
+    def clave(self):
+        """SHA-256 del contenido (es el nombre del archivo en el almacén)."""
+        return Path(self.ruta).stem
+
+
+class AlmacenFotos(AlmacenDisco):
+    sufijo = ".foto"
+
+    def __init__(self, directorio=DIRECTORIO_FOTOS, limite_mb=LIMITE_MB_FOTOS):
+        super().__init__(directorio, limite_mb)
+
+    def guardar(self, blob):
+        """Guarda la foto (si no estaba) y devuelve su FotoDiferida."""
+        ruta = self._ruta(huella(blob))
+        if ruta.exists():
+            self._marcar_uso(ruta)
+        elif not self._escribir(ruta, blob):
+            raise OSError(f"No se pudo guardar la foto en {ruta.parent}")
+        return FotoDiferida(str(ruta), len(blob))
+
+
+_almacen = None
+
+
+def almacen_por_defecto():
+    global _almacen
+    if _almacen is None:
+        _almacen = AlmacenFotos()
+    return _almacen
+
+
+@etapa(IMAGENES)
+def diferir(blob):
+    """Lo que guardan los parsers en lugar de los bytes de la foto."""
+    return almacen_por_defecto().guardar(blob)
+
+
+def leer_foto(foto):
+    """Bytes de una foto, sea FotoDiferida o bytes sueltos (resultados viejos o de otros scripts)."""
+    return foto.leer() if isinstance(foto, FotoDiferida) else foto
+
+
+def fotos_en(valor):
+    """Recorre un resultado de parser (listas y dicts anidados) y entrega sus FotoDiferida."""
+    if isinstance(valor, FotoDiferida):
+        yield valor
+    elif isinstance(valor, dict):
+        for v in valor.values():
+            yield from fotos_en(v)
+    elif isinstance(valor, (list, tuple)):
+        for v in valor:
+            yield from fotos_en(v)
+
+
+def pixeles(cm, dpi):
+    return max(1, round(cm / 2.54 * dpi))
+
+
+def reducir_foto(foto, ancho_cm, alto_cm=None, ajuste=None):
+    """
+    Devuelve los bytes de la foto reducida para mostrarse a `ancho_cm` x `alto_cm`
+    (alto opcional) con la resolución y calidad de `ajuste`. Si no se puede abrir, o
+    si el resultado no es más liviano que el original, devuelve el original; si la
+    foto ya no está en el almacén, b"" (los Word ponen "[Foto no disponible]").
+    """
+    ajuste = ajuste or AJUSTE_POR_DEFECTO
+    try:
+        blob = leer_foto(foto)
+    except OSError:
+        return b""
+    if Image is None or not ajuste.dpi or not blob:
+        return blob
+    ancho_px = pixeles(ancho_cm, ajuste.dpi)
+    alto_px = pixeles(alto_cm, ajuste.dpi) if alto_cm else None
+    try:
+        with Image.open(io.BytesIO(blob)) as img:
+            # En JPEG decodifica directo a una escala reducida (mucho más rápido en fotos grandes).
+            img.draft("RGB", (ancho_px, alto_px or ancho_px))
+            img = ImageOps.exif_transpose(img)
+            # Escala que cubre el recuadro en ambos sentidos sin deformar la foto.
+            escala = ancho_px / img.width
+            if alto_px:
+                escala = max(escala, alto_px / img.height)
+            if escala < 1:
+                img = img.resize((max(1, round(img.width * escala)), max(1, round(img.height * escala))),
+                                 Image.LANCZOS, reducing_gap=3.0)
+            salida = io.BytesIO()
+            tiene_alfa = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+            if tiene_alfa:
+                img.save(salida, "PNG", optimize=True)
+            else:
+                img.convert("RGB").save(salida, "JPEG", quality=ajuste.calidad, optimize=True, progressive=True)
+    except Exception:
+        return blob
+    reducida = salida.getvalue()
+    return reducida if len(reducida) < len(blob) else blob
+
+
+def _en_paralelo(funcion, elementos, hilos):
+    """map ordenado en un pool de hilos; el pool se cierra solo al terminar las tareas."""
+    elementos = list(elementos)
+    if hilos <= 1 or len(elementos) <= 1:
+        return (funcion(e) for e in elementos)
+    executor = ThreadPoolExecutor(max_workers=hilos)
+    resultados = executor.map(funcion, elementos)
+    executor.shutdown(wait=False)
+    return resultados
+
+
+def reducir_fotos(fotos, ancho_cm, alto_cm=None, ajuste=None, hilos=HILOS_POR_DEFECTO):
+    """
+    Aplica reducir_foto a cada foto en paralelo; devuelve un iterador de bytes en el
+    mismo orden. Cada foto se lee del disco recién dentro de su hilo.
+    """
+    ajuste = ajuste or AJUSTE_POR_DEFECTO
+    if Image is None or not ajuste.dpi:
+        hilos = 1
+    return _en_paralelo(lambda f: reducir_foto(f, ancho_cm, alto_cm, ajuste), fotos, hilos)
+
+
+# ==========================================
+# Miniaturas para el visor de mapa
+# ==========================================
+
+def miniatura(foto, lado=LADO_MINIATURA, calidad=75):
+    """JPEG con el lado mayor en `lado` px, o None si no hay Pillow o la foto no se abre."""
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(leer_foto(foto))) as img:
+            img.draft("RGB", (lado, lado))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((lado, lado), Image.LANCZOS, reducing_gap=3.0)
+            salida = io.BytesIO()
+            img.convert("RGB").save(salida, "JPEG", quality=calidad, optimize=True)
+    except Exception:
+        return None
+    return salida.getvalue()
+
+
+def _extension_web(blob):
+    """Extensión con la que el navegador muestra la foto tal cual, o None si hay que convertirla."""
+    if blob[:3] == b"\xff\xd8\xff":
+        return ".jpg"
+    if blob[:8] == b"\x89PNG\r\n\x1a\n":
+        return ".png"
+    if blob[:4] == b"GIF8":
+        return ".gif"
+    return None
+
+
+class AlmacenMapa(AlmacenDisco):
+    """
+    Carpeta servida como estáticos por Streamlit (static/ junto a main.py) con una
+    miniatura y la foto completa por cada foto del mapa, nombradas por contenido, así
+    que las ya publicadas no se vuelven a generar.
+    """
+    sufijo = ""
+
+    def __init__(self, directorio, limite_mb=LIMITE_MB_MAPA):
+        super().__init__(directorio, limite_mb)
+
+    def _relativa(self, ruta):
+        return ruta.relative_to(self.directorio).as_posix()
+
+    def _buscar(self, clave, extensiones):
+        for ext in extensiones:
+            ruta = self._ruta(clave + ext)
+            if ruta.exists():
+                self._marcar_uso(ruta)
+                return ruta
+        return None
+
+    def publicar(self, foto):
+        """(miniatura, foto completa) como rutas relativas al almacén, o None si la foto no se puede leer."""
+        clave = foto.clave if isinstance(foto, FotoDiferida) else huella(foto)
+        mini = self._buscar(clave + "_m", [".jpg"])
+        completa = self._buscar(clave, [".jpg", ".png", ".gif"])
+        if mini and completa:
+            return self._relativa(mini), self._relativa(completa)
+
+        try:
+            blob = leer_foto(foto)
+        except OSError:
+            return None
+        if mini is None:
+            contenido = miniatura(blob)
+            if contenido is None:
+                return None
+            mini = self._ruta(clave + "_m.jpg")
+            self._escribir(mini, contenido)
+        if completa is None:
+            ext = _extension_web(blob)
+            convertida = ext is None
+            if convertida:
+                # TIFF, BMP, JPEG 2000...: se convierte a JPEG para el navegador.
+                blob, ext = miniatura(blob, lado=4096, calidad=90), ".jpg"
+            completa = self._ruta(clave + ext)
+            if convertida or not self._enlazar(foto, completa):
+                self._escribir(completa, blob)
+        return self._relativa(mini), self._relativa(completa)
+
+    def _enlazar(self, foto, ruta):
+        """Hard link desde el almacén de fotos (no ocupa disco de nuevo). False si no se puede."""
+        if not isinstance(foto, FotoDiferida):
+            return False
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(foto.ruta, ruta)
+        except FileExistsError:
+            return True
+        except OSError:
+            return False
+        self._sumar(foto.tamano)
+        return True
+
+
+def huella_puntos(puntos):
+    """SHA-256 de un conjunto de puntos del mapa (nombre, desc, lat, lon y contenido de la foto)."""
+    h = hashlib.sha256()
+    for p in puntos:
+        foto = p.get('foto')
+        clave = foto.clave if isinstance(foto, FotoDiferida) else (huella(foto) if foto else "")
+        h.update(f"{p['nombre']}\0{p['desc']}\0{p['lat']!r}\0{p['lon']!r}\0{clave}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def publicar_fotos(fotos, almacen, hilos=HILOS_POR_DEFECTO):
+    """AlmacenMapa.publicar para cada foto (None si no tiene), en paralelo y en orden."""
+    return list(_en_paralelo(lambda f: almacen.publicar(f) if f else None, fotos, hilos))
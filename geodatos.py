@@ -0,0 +1,156 @@
+"""
+Exportación binaria de puntos con índice espacial para QGIS.
+
+- FlatGeobuf (.fgb): se escribe con GDAL (pyogrio) con SPATIAL_INDEX=YES, que
+  agrega el R-tree Hilbert empaquetado; QGIS lee solo lo que cae en la vista.
+- GeoParquet (.parquet): se escribe con pyarrow, geometría WKB, ordenado por curva
+  de Hilbert y en row groups chicos con columna "bbox" (covering de GeoParquet 1.1),
+  de modo que las estadísticas de cada row group sirven de índice espacial.
+
+Ambas librerías son opcionales: sin ellas, las funciones levantan ImportError y la
+interfaz solo ofrece KMZ/GeoJSON.
+"""
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from indice_espacial import indice_hilbert
+from tiempos import etapa, EXPORTACION
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+try:
+    import pyogrio.raw
+except ImportError:
+    pyogrio = None
+
+FILAS_POR_GRUPO = 8192
+
+
+def hay_flatgeobuf():
+    return pyogrio is not None
+
+
+def hay_geoparquet():
+    return pa is not None
+
+
+def features_desde_fichas(fichas):
+    """
+    Pasa las FichaHallazgo con coordenadas a features GeoJSON, con los atributos de
+    la ficha (los mismos nombres de campo que la capa de recolección donde coinciden).
+    """
+    return [
+        {
+            "type": "Feature",
+            "properties": {
+                "ID_Hallazgo": f.id_sitio, "Sitio": f.id_sitio, "Categoría": f.categoria,
+                "Descripción": f.descripcion, "Fecha": f.fecha, "Responsable": f.responsable,
+                "Cronología": f.cronologia, "UTM Norte": f.norte, "UTM Este": f.este, "Huso": f.huso,
+            },
+            "geometry": {"type": "Point", "coordinates": [f.lon, f.lat]},
+        }
+        for f in fichas if f.lat is not None
+    ]
+
+
+def _columnas(features):
+    """(lon, lat, {campo: lista de str}) a partir de features GeoJSON de puntos."""
+    campos = list(features[0]["properties"]) if features else []
+    lon = np.array([f["geometry"]["coordinates"][0] for f in features], dtype=float)
+    lat = np.array([f["geometry"]["coordinates"][1] for f in features], dtype=float)
+    datos = {c: [str(f["properties"].get(c, "") or "") for f in features] for c in campos}
+    return lon, lat, datos
+
+
+def _wkb_puntos(lon, lat):
+    """WKB little-endian de cada punto, armado en un solo buffer (21 bytes por punto)."""
+    registros = np.empty(len(lon), dtype=[("orden", "u1"), ("tipo", "<u4"), ("x", "<f8"), ("y", "<f8")])
+    registros["orden"] = 1
+    registros["tipo"] = 1
+    registros["x"] = lon
+    registros["y"] = lat
+    return registros.tobytes()
+
+
+@etapa(EXPORTACION)
+def crear_geoparquet(features, destino=None):
+    """
+    Escribe los puntos como GeoParquet 1.1 (CRS84). Con `destino` (ruta) escribe ahí;
+    si no, devuelve los bytes.
+    """
+    if pa is None:
+        raise ImportError("Falta instalar la librería 'pyarrow'.")
+    lon, lat, datos = _columnas(features)
+    if len(lon):
+        orden = np.argsort(indice_hilbert(lon, lat), kind="stable")
+        lon, lat = lon[orden], lat[orden]
+        datos = {c: [v[i] for i in orden] for c, v in datos.items()}
+
+    n = len(lon)
+    geometria = pa.FixedSizeBinaryArray.from_buffers(
+        pa.binary(21), n, [None, pa.py_buffer(_wkb_puntos(lon, lat))]
+    ).cast(pa.binary())
+    bbox = pa.StructArray.from_arrays(
+        [pa.array(lon), pa.array(lat), pa.array(lon), pa.array(lat)],
+        names=["xmin", "ymin", "xmax", "ymax"],
+    )
+    tabla = pa.table({**{c: pa.array(v, pa.string()) for c, v in datos.items()},
+                      "geometry": geometria, "bbox": bbox})
+
+    geo = {
+        "version": "1.1.0",
+        "primary_column": "geometry",
+        "columns": {
+            "geometry": {
+                "encoding": "WKB",
+                "geometry_types": ["Point"],
+                "bbox": [float(lon.min()), float(lat.min()), float(lon.max()), float(lat.max())] if n else [],
+                "covering": {"bbox": {k: ["bbox", k] for k in ("xmin", "ymin", "xmax", "ymax")}},
+            }
+        },
+    }
+    tabla = tabla.replace_schema_metadata({b"geo": json.dumps(geo).encode("utf-8")})
+
+    salida = pa.BufferOutputStream() if destino is None else destino
+    pq.write_table(tabla, salida, row_group_size=FILAS_POR_GRUPO, compression="zstd")
+    return salida.getvalue().to_pybytes() if destino is None else None
+
+
+@etapa(EXPORTACION)
+def crear_flatgeobuf(features, destino=None, capa="hallazgos"):
+    """
+    Escribe los puntos como FlatGeobuf (EPSG:4326) con índice espacial. Con `destino`
+    (ruta) escribe ahí; si no, devuelve los bytes.
+    """
+    if pyogrio is None:
+        raise ImportError("Falta instalar la librería 'pyogrio'.")
+    lon, lat, datos = _columnas(features)
+    wkb = _wkb_puntos(lon, lat)
+    geometria = np.array([wkb[i:i + 21] for i in range(0, len(wkb), 21)], dtype=object)
+    campos = list(datos)
+    valores = [np.array(datos[c], dtype=object) for c in campos]
+
+    ruta = destino
+    if destino is None:
+        fd, ruta = tempfile.mkstemp(suffix=".fgb")
+        os.close(fd)
+        os.unlink(ruta)  # GDAL crea el archivo
+    try:
+        pyogrio.raw.write(
+            str(ruta), geometria, valores, campos, layer=capa, driver="FlatGeobuf",
+            geometry_type="Point", crs="EPSG:4326", encoding="UTF-8",
+            layer_options={"SPATIAL_INDEX": "YES"},
+        )
+        if destino is None:
+            with open(ruta, "rb") as f:
+                return f.read()
+    finally:
+        if destino is None and os.path.exists(ruta):
+            os.unlink(ruta)
@@ -0,0 +1,152 @@
+"""
+Índice espacial de puntos en memoria (R-tree Hilbert empaquetado, con NumPy).
+
+El visor de mapa y las exportaciones trabajaban siempre con todos los puntos del lote
+o del proyecto. IndicePuntos ordena los puntos por curva de Hilbert y los agrupa de a
+`capacidad` en nodos con su rectángulo envolvente, nivel por nivel hasta la raíz (el
+mismo esquema que el índice de FlatGeobuf). Una consulta baja por los niveles
+descartando los nodos que no tocan el área, con operaciones vectorizadas, así que
+filtrar cientos de miles de puntos a un área de interés toma milisegundos.
+
+Consultas (todas devuelven los índices de los puntos en el orden original):
+
+- en_rectangulo: lon/lat mínimos y máximos;
+- en_radio: a menos de tantos metros de un punto (distancia sobre la esfera);
+- en_cuadrante: dentro del cuadrado UTM de `lado` metros (grilla alineada a múltiplos
+  de `lado`) que contiene una coordenada, en el huso indicado.
+
+Las áreas se pasan también como Rectangulo, Radio o Cuadrante a consultar()/filtrar().
+"""
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from coordenadas import HUSO_POR_DEFECTO, utm_a_wgs84, wgs84_a_utm
+
+CAPACIDAD_NODO = 16
+RADIO_TIERRA = 6371008.8  # metros (radio medio)
+
+Rectangulo = namedtuple("Rectangulo", ["lon_min", "lat_min", "lon_max", "lat_max"])
+Radio = namedtuple("Radio", ["lon", "lat", "metros"])
+Cuadrante = namedtuple("Cuadrante", ["este", "norte", "lado", "huso"], defaults=(HUSO_POR_DEFECTO,))
+
+
+def indice_hilbert(lon, lat, bbox=None, n=1 << 16):
+    """Posición de cada punto sobre una curva de Hilbert de n x n celdas dentro de `bbox`."""
+    xmin, ymin, xmax, ymax = bbox or (lon.min(), lat.min(), lon.max(), lat.max())
+    ancho = (xmax - xmin) or 1.0
+    alto = (ymax - ymin) or 1.0
+    x = np.clip(((lon - xmin) / ancho * (n - 1)).astype(np.int64), 0, n - 1)
+    y = np.clip(((lat - ymin) / alto * (n - 1)).astype(np.int64), 0, n - 1)
+    d = np.zeros(len(x), dtype=np.int64)
+    s = n // 2
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx.astype(np.int64)) ^ ry.astype(np.int64))
+        # rotación del cuadrante
+        voltear = ~ry & rx
+        x = np.where(voltear, n - 1 - x, x)
+        y = np.where(voltear, n - 1 - y, y)
+        x, y = np.where(~ry, y, x), np.where(~ry, x, y)
+        s //= 2
+    return d
+
+
+def cuadrante(este, norte, lado):
+    """(este_min, norte_min, este_max, norte_max) del cuadrado de la grilla que contiene el punto."""
+    e0 = math.floor(este / lado) * lado
+    n0 = math.floor(norte / lado) * lado
+    return e0, n0, e0 + lado, n0 + lado
+
+
+class IndicePuntos:
+    """R-tree estático sobre (lon, lat). Los puntos sin coordenadas (NaN o None) no entran."""
+
+    def __init__(self, lons, lats, capacidad=CAPACIDAD_NODO):
+        lons = np.asarray(lons, dtype=float)
+        lats = np.asarray(lats, dtype=float)
+        validos = np.flatnonzero(np.isfinite(lons) & np.isfinite(lats))
+        x, y = lons[validos], lats[validos]
+        orden = np.argsort(indice_hilbert(x, y), kind="stable") if len(x) else validos
+        self.capacidad = capacidad
+        self._ids = validos[orden]
+        self._x = x[orden]
+        self._y = y[orden]
+
+        # Rectángulos de cada nivel, de las hojas (grupos de puntos) hacia la raíz.
+        self._niveles = []
+        xmin = xmax = self._x
+        ymin = ymax = self._y
+        while len(xmin) > 1 or not self._niveles:
+            inicios = np.arange(0, len(xmin), capacidad)
+            if not len(inicios):
+                break
+            xmin, ymin = np.minimum.reduceat(xmin, inicios), np.minimum.reduceat(ymin, inicios)
+            xmax, ymax = np.maximum.reduceat(xmax, inicios), np.maximum.reduceat(ymax, inicios)
+            self._niveles.append((xmin, ymin, xmax, ymax))
+        self._niveles.reverse()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _buscar(self, x0, y0, x1, y1):
+        """Posiciones (en orden de Hilbert) de los puntos dentro del rectángulo."""
+        if not len(self._ids):
+            return np.empty(0, dtype=np.int64)
+        hijos = np.arange(self.capacidad)
+        candidatos = np.arange(len(self._niveles[0][0]))
+        for i, (xmin, ymin, xmax, ymax) in enumerate(self._niveles):
+            c = candidatos
+            c = c[(xmin[c] <= x1) & (xmax[c] >= x0) & (ymin[c] <= y1) & (ymax[c] >= y0)]
+            debajo = len(self._niveles[i + 1][0]) if i + 1 < len(self._niveles) else len(self._ids)
+            candidatos = (c[:, None] * self.capacidad + hijos).ravel()
+            candidatos = candidatos[candidatos < debajo]
+        c = candidatos
+        return c[(self._x[c] >= x0) & (self._x[c] <= x1) & (self._y[c] >= y0) & (self._y[c] <= y1)]
+
+    def _originales(self, posiciones):
+        return np.sort(self._ids[posiciones])
+
+    def en_rectangulo(self, lon_min, lat_min, lon_max, lat_max):
+        return self._originales(self._buscar(lon_min, lat_min, lon_max, lat_max))
+
+    def en_radio(self, lon, lat, metros):
+        # Primero el rectángulo que contiene al círculo, después la distancia exacta.
+        dlat = math.degrees(metros / RADIO_TIERRA)
+        coseno = math.cos(math.radians(lat))
+        dlon = 180.0 if coseno < 1e-9 else min(180.0, dlat / coseno)
+        c = self._buscar(lon - dlon, lat - dlat, lon + dlon, lat + dlat)
+        x, y = np.radians(self._x[c]), np.radians(self._y[c])
+        lon0, lat0 = math.radians(lon), math.radians(lat)
+        a = np.sin((y - lat0) / 2) ** 2 + math.cos(lat0) * np.cos(y) * np.sin((x - lon0) / 2) ** 2
+        distancia = 2 * RADIO_TIERRA * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+        return self._originales(c[distancia <= metros])
+
+    def en_cuadrante(self, este, norte, lado, huso=HUSO_POR_DEFECTO):
+        e0, n0, e1, n1 = cuadrante(este, norte, lado)
+        lons, lats = utm_a_wgs84([e0, e1, e0, e1], [n0, n0, n1, n1], huso)
+        # Los bordes del cuadrado UTM son casi rectos en lon/lat; el margen cubre la diferencia.
+        margen_x = (lons.max() - lons.min()) * 0.01
+        margen_y = (lats.max() - lats.min()) * 0.01
+        c = self._buscar(lons.min() - margen_x, lats.min() - margen_y, lons.max() + margen_x, lats.max() + margen_y)
+        estes, nortes, _ = wgs84_a_utm(self._x[c], self._y[c], huso)
+        return self._originales(c[(estes >= e0) & (estes < e1) & (nortes >= n0) & (nortes < n1)])
+
+    def consultar(self, area):
+        """Índices de los puntos dentro de un Rectangulo, Radio o Cuadrante."""
+        if isinstance(area, Rectangulo):
+            return self.en_rectangulo(*area)
+        if isinstance(area, Radio):
+            return self.en_radio(*area)
+        if isinstance(area, Cuadrante):
+            return self.en_cuadrante(*area)
+        raise TypeError(f"Área no soportada: {area!r}")
+
+
+def filtrar(elementos, lons, lats, area):
+    """Los elementos (en su orden) cuyo (lon, lat) cae en `area`; sin área, todos."""
+    if area is None:
+        return list(elementos)
+    return [elementos[i] for i in IndicePuntos(lons, lats).consultar(area)]
@@ -0,0 +1,205 @@
+"""
+Lectura de archivos KML/KMZ y conversión de sus puntos a UTM Huso 19S,
+sin dependencia de Streamlit. La interfaz vive en extractor_kmz.py.
+"""
+import zipfile
+import io
+import xml.etree.ElementTree as ET
+import re
+import numpy as np
+import pandas as pd
+from coordenadas import wgs84_a_utm
+from extraccion import ErrorLectura
+
+# Subir al cambiar lo que devuelven los parsers de este módulo (invalida cache_fichas).
+VERSION_PARSER = 3
+
+# Ordenamos las columnas incluyendo los nuevos datos UTM Huso 19
+COLUMNAS_KMZ = [
+    "Archivo Origen",
+    "Nombre del Punto",
+    "UTM Este (X) - Huso 19",
+    "UTM Norte (Y) - Huso 19",
+    "Latitud (Y)",
+    "Longitud (X)",
+    "Altura (Z)"
+]
+
+# Formato de Excel de las columnas numéricas (las coordenadas geográficas vienen como
+# texto del KML y se escriben como número, sin redondear).
+FORMATOS_KMZ = {
+    "UTM Este (X) - Huso 19": "0.00",
+    "UTM Norte (Y) - Huso 19": "0.00",
+    "Latitud (Y)": "General",
+    "Longitud (X)": "General",
+    "Altura (Z)": "General",
+}
+
+# CONFIGURACIÓN: WGS84 (Lat/Lon) -> UTM Huso 19S / EPSG:32719 (Huso 19K), como dicen las columnas
+HUSO_KMZ = 19
+
+# Placemarks que se convierten juntos en el modo streaming (acota la memoria por lote).
+TAMANO_LOTE = 50_000
+
+def _filas_kml(placemarks):
+    """
+    Arma las filas de salida de una lista de (nombre, texto_coordenadas).
+    La conversión a UTM y el redondeo se hacen en una sola llamada vectorizada;
+    las coordenadas que no son números quedan marcadas por máscara y sin UTM.
+    """
+    nombres, lons, lats, alts = [], [], [], []
+    for nombre_txt, coords_texto in placemarks:
+        partes = [p.strip() for p in coords_texto.strip().split(',')]
+        nombres.append(nombre_txt)
+        lons.append(partes[0] if len(partes) > 0 else "")
+        lats.append(partes[1] if len(partes) > 1 else "")
+        alts.append(partes[2] if len(partes) > 2 else "0")
+
+    lon = pd.to_numeric(pd.Series(lons, dtype=object), errors='coerce').to_numpy(dtype=float)
+    lat = pd.to_numeric(pd.Series(lats, dtype=object), errors='coerce').to_numpy(dtype=float)
+    validos = np.isfinite(lon) & np.isfinite(lat)
+
+    # Transformación matemática a metros (UTM Huso 19), solo de los puntos válidos
+    este = np.full(len(nombres), np.nan)
+    norte = np.full(len(nombres), np.nan)
+    if validos.any():
+        este[validos], norte[validos], _ = wgs84_a_utm(lon[validos], lat[validos], huso=HUSO_KMZ)
+
+    # Redondeamos a 2 decimales para el Excel
+    este = np.round(este, 2)
+    norte = np.round(norte, 2)
+    con_utm = (np.isfinite(este) & np.isfinite(norte)).tolist()
+
+    return [
+        {
+            "Nombre del Punto": nombre_txt,
+            "Latitud (Y)": lat_str,
+            "Longitud (X)": lon_str,
+            "UTM Este (X) - Huso 19": e if ok else "",
+            "UTM Norte (Y) - Huso 19": n if ok else "",
+            "Altura (Z)": alt
+        }
+        for nombre_txt, lat_str, lon_str, e, n, ok, alt
+        in zip(nombres, lats, lons, este.tolist(), norte.tolist(), con_utm, alts)
+    ]
+
+def extraer_datos_kml(kml_content):
+    """
+    Lee el código XML de un archivo KML, extrae los puntos
+    y convierte sus coordenadas geográficas a UTM Huso 19S (19K).
+    """
+    xml_string = kml_content.decode('utf-8', errors='ignore')
+    xml_string = re.sub(r'\sxmlns="[^"]+"', '', xml_string, count=1)
+
+    try:
+        root = ET.fromstring(xml_string)
+    except Exception:
+        return []
+
+    placemarks = []
+
+    for placemark in root.findall('.//Placemark'):
+        nombre = placemark.find('name')
+        nombre_txt = nombre.text if nombre is not None else "Sin nombre"
+
+        punto = placemark.find('.//Point/coordinates')
+        if punto is not None and punto.text:
+            placemarks.append((nombre_txt, punto.text))
+
+    return _filas_kml(placemarks)
+
+def iterar_placemarks(flujo):
+    """
+    Lee un KML desde un archivo abierto (p. ej. el miembro de un KMZ) con iterparse
+    y genera (nombre, texto_coordenadas) por cada Placemark con punto.
+
+    Cada Placemark se libera apenas se consume, así que la memoria no crece con el
+    tamaño del archivo. Acepta el namespace de KML 2.2, otro cualquiera o ninguno.
+    """
+    locales = {}  # tag con namespace -> nombre local, para no cortar el string en cada evento
+
+    def local(tag):
+        nombre = locales.get(tag)
+        if nombre is None:
+            nombre = locales[tag] = tag.rsplit('}', 1)[-1]
+        return nombre
+
+    ancestros = []
+    for evento, elem in ET.iterparse(flujo, events=("start", "end")):
+        if evento == "start":
+            ancestros.append(elem)
+            continue
+        ancestros.pop()
+        if local(elem.tag) != "Placemark":
+            continue
+
+        # Equivalente a find('name') y find('.//Point/coordinates'), sin ElementPath.
+        nombre_txt = "Sin nombre"
+        for hijo in elem:
+            if local(hijo.tag) == "name":
+                nombre_txt = hijo.text
+                break
+        coords_texto = None
+        for sub in elem.iter():
+            if local(sub.tag) == "Point":
+                coords = next((c for c in sub if local(c.tag) == "coordinates"), None)
+                if coords is not None:
+                    coords_texto = coords.text
+                    break
+
+        elem.clear()
+        if ancestros:
+            ancestros[-1].remove(elem)
+
+        if coords_texto:
+            yield nombre_txt, coords_texto
+
+def iterar_datos_kml(flujo):
+    """
+    Versión en streaming de extraer_datos_kml: genera las filas de a una, pero
+    convierte las coordenadas por lotes de TAMANO_LOTE placemarks.
+    """
+    lote = []
+    for placemark in iterar_placemarks(flujo):
+        lote.append(placemark)
+        if len(lote) >= TAMANO_LOTE:
+            yield from _filas_kml(lote)
+            lote = []
+    if lote:
+        yield from _filas_kml(lote)
+
+def extraer_puntos_archivo(contenido, nombre_archivo):
+    """
+    Lee un .kml o .kmz (según la extensión) y devuelve sus puntos con la
+    columna "Archivo Origen". Un KMZ ilegible levanta ErrorLectura.
+
+    El KML se recorre en streaming directo desde el miembro del zip; si el XML
+    está mal formado se reintenta con extraer_datos_kml, que es más tolerante.
+    """
+    if nombre_archivo.lower().endswith('.kmz'):
+        try:
+            with zipfile.ZipFile(io.BytesIO(contenido)) as z:
+                kml_filename = next((name for name in z.namelist() if name.lower().endswith('.kml')), None)
+                if not kml_filename:
+                    return []
+                try:
+                    with z.open(kml_filename) as flujo:
+                        puntos = list(iterar_datos_kml(flujo))
+                except ET.ParseError:
+                    puntos = extraer_datos_kml(z.read(kml_filename))
+        except Exception as e:
+            raise ErrorLectura(f"No se pudo leer el archivo {nombre_archivo}: {e}")
+    else:
+        try:
+            puntos = list(iterar_datos_kml(io.BytesIO(contenido)))
+        except ET.ParseError:
+            puntos = extraer_datos_kml(contenido)
+
+    for p in puntos: p["Archivo Origen"] = nombre_archivo
+    return puntos
+
+def coordenadas_puntos(puntos):
+    """(lons, lats) de las filas de extraer_puntos_archivo, con NaN donde no son números."""
+    lon = pd.to_numeric(pd.Series([p.get("Longitud (X)", "") for p in puntos], dtype=object), errors='coerce')
+    lat = pd.to_numeric(pd.Series([p.get("Latitud (Y)", "") for p in puntos], dtype=object), errors='coerce')
+    return lon.to_numpy(dtype=float), lat.to_numpy(dtype=float)
@@ -0,0 +1,210 @@
+"""
+Lectura rápida de las tablas de un DOCX, directo sobre el XML.
+
+Los parsers de Word solo necesitan el texto de cada celda y las fotos que contiene.
+python-docx arma objetos proxy nuevos en cada acceso a `tabla.rows`, `fila.cells` y
+`celda.text`, y recalcula las celdas combinadas cada vez; con anexos de decenas de
+tablas eso era casi todo el tiempo de lectura. Aquí cada `w:tbl/w:tr/w:tc` se
+recorre una sola vez y queda una grilla de CeldaDocx con las combinaciones ya
+resueltas, igual que `fila.cells` de python-docx:
+
+- una celda con gridSpan se repite en cada columna que abarca;
+- una celda con vMerge="continue" es la misma CeldaDocx que la de arriba.
+
+Las fotos se leen del ZIP recién cuando un parser las pide, con un mapa rId -> parte
+de imagen que se arma una vez por documento.
+"""
+import io
+import posixpath
+import zipfile
+from collections import namedtuple
+
+from lxml import etree
+
+from tiempos import etapa, IMAGENES
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_BODY, _W_TBL, _W_TR, _W_TC = W + "body", W + "tbl", W + "tr", W + "tc"
+_W_P, _W_R, _W_HYPERLINK = W + "p", W + "r", W + "hyperlink"
+_W_T, _W_TAB, _W_PTAB, _W_BR, _W_CR, _W_NOBREAKHYPHEN = (
+    W + "t", W + "tab", W + "ptab", W + "br", W + "cr", W + "noBreakHyphen"
+)
+_W_TCPR, _W_TRPR, _W_GRIDSPAN, _W_VMERGE, _W_GRIDBEFORE = (
+    W + "tcPr", W + "trPr", W + "gridSpan", W + "vMerge", W + "gridBefore"
+)
+_W_VAL, _W_TYPE = W + "val", W + "type"
+_A_BLIP = "{http://schemas.openxmlformats.org/drawingml/2006/main}blip"
+_R_EMBED = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed"
+_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"
+_CT = "{http://schemas.openxmlformats.org/package/2006/content-types}"
+
+_TIPO_DOCUMENTO = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+_CT_DOCUMENTO = "application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"
+
+# Mismas opciones que el parser de python-docx.
+_PARSER = etree.XMLParser(remove_blank_text=True, resolve_entities=False)
+
+# `texto` ya viene sin espacios al borde (todos los parsers usaban celda.text.strip()).
+# `rids` son los r:embed de las imágenes de la celda, en orden.
+CeldaDocx = namedtuple("CeldaDocx", ["texto", "rids"])
+
+
+def _texto_run(r, partes):
+    for e in r:
+        tag = e.tag
+        if tag == _W_T:
+            partes.append(e.text or "")
+        elif tag == _W_TAB or tag == _W_PTAB:
+            partes.append("\t")
+        elif tag == _W_BR:
+            if e.get(_W_TYPE, "textWrapping") == "textWrapping":
+                partes.append("\n")
+        elif tag == _W_CR:
+            partes.append("\n")
+        elif tag == _W_NOBREAKHYPHEN:
+            partes.append("-")
+
+
+def _texto_celda(tc):
+    """Equivale a _Cell.text de python-docx: párrafos directos de la celda unidos por saltos."""
+    parrafos = []
+    for p in tc.iterchildren(_W_P):
+        partes = []
+        for hijo in p:
+            if hijo.tag == _W_R:
+                _texto_run(hijo, partes)
+            elif hijo.tag == _W_HYPERLINK:
+                for r in hijo.iterchildren(_W_R):
+                    _texto_run(r, partes)
+        parrafos.append("".join(partes))
+    return "\n".join(parrafos)
+
+
+def _entero(elemento, hijo, defecto):
+    nodo = elemento.find(hijo) if elemento is not None else None
+    if nodo is None:
+        return defecto
+    try:
+        return int(nodo.get(_W_VAL))
+    except (TypeError, ValueError):
+        return defecto
+
+
+def _leer_tabla(tbl):
+    """Lista de filas; cada fila es una tupla de CeldaDocx (una por columna de la grilla ocupada)."""
+    filas = []
+    arriba = {}  # columna de inicio en la fila anterior -> (celda, columnas que abarca)
+    for tr in tbl.iterchildren(_W_TR):
+        fila = []
+        actual = {}
+        columna = _entero(tr.find(_W_TRPR), _W_GRIDBEFORE, 0)
+        for tc in tr.iterchildren(_W_TC):
+            tcpr = tc.find(_W_TCPR)
+            span = _entero(tcpr, _W_GRIDSPAN, 1)
+            vmerge = tcpr.find(_W_VMERGE) if tcpr is not None else None
+            if vmerge is not None and vmerge.get(_W_VAL, "continue") == "continue" and columna in arriba:
+                # Continuación de una combinación vertical: es la celda de arriba.
+                celda, repeticiones = arriba[columna]
+            else:
+                rids = tuple(r for r in (b.get(_R_EMBED) for b in tc.iter(_A_BLIP)) if r)
+                celda, repeticiones = CeldaDocx(_texto_celda(tc).strip(), rids), span
+            actual[columna] = (celda, repeticiones)
+            fila.extend([celda] * repeticiones)
+            columna += span
+        filas.append(tuple(fila))
+        arriba = actual
+    return filas
+
+
+def _parte_relativa(origen, destino):
+    if destino.startswith("/"):
+        return destino[1:]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(origen), destino))
+
+
+def _relaciones(paquete, parte):
+    """{rId: (tipo, parte destino)} de una parte del paquete (sin las externas)."""
+    ruta = posixpath.join(posixpath.dirname(parte), "_rels", posixpath.basename(parte) + ".rels")
+    try:
+        raiz = etree.fromstring(paquete.read(ruta), _PARSER)
+    except KeyError:
+        return {}
+    return {
+        rel.get("Id"): (rel.get("Type"), _parte_relativa(parte, rel.get("Target", "")))
+        for rel in raiz.iter(_REL) if rel.get("TargetMode") != "External"
+    }
+
+
+def _tipos_contenido(paquete):
+    raiz = etree.fromstring(paquete.read("[Content_Types].xml"), _PARSER)
+    por_extension = {e.get("Extension", "").lower(): e.get("ContentType", "") for e in raiz.iter(_CT + "Default")}
+    por_parte = {e.get("PartName", "").lstrip("/").lower(): e.get("ContentType", "") for e in raiz.iter(_CT + "Override")}
+
+    def tipo(parte):
+        if parte.lower() in por_parte:
+            return por_parte[parte.lower()]
+        return por_extension.get(posixpath.splitext(parte)[1][1:].lower(), "")
+    return tipo
+
+
+class DocumentoDocx:
+    """
+    Tablas del cuerpo de un DOCX (las mismas que `doc.tables`) como listas de filas
+    de CeldaDocx, y acceso a sus imágenes por rId.
+    """
+
+    def __init__(self, archivo_bytes):
+        self._paquete = zipfile.ZipFile(io.BytesIO(archivo_bytes))
+        tipo = _tipos_contenido(self._paquete)
+        principal = next(
+            (destino for t, destino in _relaciones(self._paquete, "").values() if t == _TIPO_DOCUMENTO),
+            "word/document.xml",
+        )
+        if tipo(principal) != _CT_DOCUMENTO:
+            raise ValueError(f"no es un documento de Word, el tipo de contenido es '{tipo(principal)}'")
+
+        raiz = etree.fromstring(self._paquete.read(principal), _PARSER)
+        cuerpo = raiz.find(_W_BODY)
+        self.tablas = [_leer_tabla(tbl) for tbl in cuerpo.iterchildren(_W_TBL)] if cuerpo is not None else []
+        self._imagenes = {
+            rid: destino for rid, (_, destino) in _relaciones(self._paquete, principal).items()
+            if "image" in tipo(destino)
+        }
+
+    def imagen(self, rid):
+        """Bytes de la imagen con ese rId, o None si no hay (o no es una imagen)."""
+        parte = self._imagenes.get(rid)
+        if parte is None:
+            return None
+        try:
+            with etapa(IMAGENES):
+                return self._paquete.read(parte)
+        except KeyError:
+            return None
+
+    def imagenes(self, celda):
+        """[(rId, bytes)] de las imágenes de una celda, en orden."""
+        resultado = []
+        for rid in celda.rids:
+            blob = self.imagen(rid)
+            if blob is not None:
+                resultado.append((rid, blob))
+        return resultado
+
+
+def celda_abajo(tabla, fila_idx, col_idx):
+    """Texto de la celda debajo de (fila_idx, col_idx), o "" si no hay."""
+    if fila_idx + 1 < len(tabla) and col_idx < len(tabla[fila_idx + 1]):
+        return tabla[fila_idx + 1][col_idx].texto
+    return ""
+
+
+def celdas_unicas(fila):
+    """[(columna, celda)] con cada celda de la fila una sola vez (las combinadas se repiten)."""
+    vistas = set()
+    resultado = []
+    for c_idx, celda in enumerate(fila):
+        if id(celda) not in vistas:
+            vistas.add(id(celda))
+            resultado.append((c_idx, celda))
+    return resultado
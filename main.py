@@ -1,857 +1,247 @@
+import os
+import time
+INICIO = time.perf_counter()  # para medir cuánto tarda el script en tener lista la página
 import streamlit as st
-from docx import Document
-from docx.shared import Inches, Pt, Cm
-from docx.oxml.ns import qn
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.enum.table import WD_TABLE_ALIGNMENT
-from docx.enum.section import WD_ORIENT
-import io
-import pandas as pd
-import zipfile
-import re
-import base64 
-from pyproj import Transformer
-import extractor_kmz
-from datetime import datetime
-import locale
-import modulo_recoleccion
-import modulo_excavacion
-
-# --- IMPORTACIÓN NUEVA PARA PDF ---
-try:
-    import fitz  # PyMuPDF
-except ImportError:
-    st.error("⚠️ Falta instalar la librería 'pymupdf'. Agregala a requirements.txt")
-
-# --- IMPORTACIONES PARA MAPA ---
-try:
-    import folium
-    from streamlit_folium import st_folium
-except ImportError:
-    pass
+from pathlib import Path
 
 # --- CONFIGURACIÓN GLOBAL ---
 st.set_page_config(page_title="Arqueología - Suite Word", layout="wide")
 
-# ==========================================
-# 1. FUNCIONES AUXILIARES
-# ==========================================
-
-def obtener_imagenes_con_id(elemento_xml, doc_relacionado):
-    """Extrae imágenes incrustadas en una celda/párrafo de Word."""
-    resultados = [] 
-    blips = elemento_xml.xpath('.//a:blip')
-    for blip in blips:
-        try:
-            embed_code = blip.get(qn('r:embed'))
-            if embed_code:
-                part = doc_relacionado.part.related_parts[embed_code]
-                if 'image' in part.content_type:
-                    resultados.append((embed_code, part.blob))
-        except:
-            continue
-    return resultados
-
-def obtener_texto_celda_abajo(tabla, fila_idx, col_idx):
-    try:
-        if fila_idx + 1 < len(tabla.rows):
-            fila_siguiente = tabla.rows[fila_idx + 1]
-            if col_idx < len(fila_siguiente.cells):
-                return fila_siguiente.cells[col_idx].text.strip()
-    except:
-        pass
-    return ""
-
-def limpiar_coordenada(texto):
-    texto_limpio = texto.replace(".", "").replace(" ", "").strip()
-    texto_limpio = texto_limpio.replace(",", ".")
-    try:
-        return float(texto_limpio)
-    except:
-        return None
-
-# ==========================================
-# 2. LÓGICA: GENERADOR WORD (MAP - DESDE WORD)
-# ==========================================
-
-def procesar_archivo_v12(archivo_bytes, nombre_archivo):
-    try:
-        doc = Document(io.BytesIO(archivo_bytes))
-    except Exception as e:
-        st.error(f"Error leyendo {nombre_archivo}: {e}")
-        return []
-
-    fichas_extraidas = []
-    fecha_persistente = "Sin Fecha"
-
-    for tabla in doc.tables:
-        datos_ficha = {
-            "fecha_propia": None, "actividad": "", "hallazgos": "", "items_foto": [] 
-        }
-        rids_procesados = set()
-        celdas_procesadas = set()
-        en_seccion_fotos = False
-        
-        for r_idx, fila in enumerate(tabla.rows):
-            texto_fila = " ".join([c.text.strip() for c in fila.cells]).strip()
-            
-            if "Fecha" in texto_fila:
-                for celda in fila.cells:
-                    t = celda.text.strip()
-                    if "Fecha" not in t and len(t) > 5:
-                        datos_ficha["fecha_propia"] = t
-                        fecha_persistente = t
-                        break
-            
-            if "Descripción de la actividad" in texto_fila:
-                mejor_texto = ""
-                celdas_fila_vistas = set()
-                for celda in fila.cells:
-                    if celda in celdas_fila_vistas: continue
-                    celdas_fila_vistas.add(celda)
-                    t = celda.text.strip()
-                    if "Descripción" in t or "Actividad" in t: continue
-                    if len(t) > len(mejor_texto):
-                        mejor_texto = t
-                if mejor_texto:
-                    datos_ficha["actividad"] = mejor_texto
-
-            if "Ausencia" in texto_fila and any(c.text.strip().upper() == "X" for c in fila.cells):
-                datos_ficha["hallazgos"] = "Ausencia de hallazgos arqueológicos no previstos."
-            if "Presencia" in texto_fila and any(c.text.strip().upper() == "X" for c in fila.cells):
-                datos_ficha["hallazgos"] = "PRESENCIA de hallazgos arqueológicos."
-
-            if "Registro fotográfico" in texto_fila:
-                en_seccion_fotos = True
-                continue 
-
-            if en_seccion_fotos:
-                for c_idx, celda in enumerate(fila.cells):
-                    if celda in celdas_procesadas: continue
-                    celdas_procesadas.add(celda)
-
-                    lista_imgs_ids = obtener_imagenes_con_id(celda._element, doc)
-                    if lista_imgs_ids:
-                        texto_leyenda = celda.text.strip()
-                        if not texto_leyenda:
-                            texto_leyenda = obtener_texto_celda_abajo(tabla, r_idx, c_idx)
-                        
-                        for rId, blob in lista_imgs_ids:
-                            if rId in rids_procesados: continue
-                            rids_procesados.add(rId)
-                            datos_ficha["items_foto"].append({
-                                "blob": blob, "leyenda": texto_leyenda
-                            })
-                celdas_procesadas.clear() 
-
-        fecha_final = datos_ficha["fecha_propia"] if datos_ficha["fecha_propia"] else fecha_persistente
-        
-        if datos_ficha["actividad"] or datos_ficha["items_foto"]:
-            texto_central = datos_ficha["actividad"]
-            if datos_ficha["hallazgos"]:
-                texto_central += f"\n\n[Hallazgos: {datos_ficha['hallazgos']}]"
-            
-            fichas_extraidas.append({
-                "fecha": fecha_final, "texto_central": texto_central, "fotos": datos_ficha["items_foto"]
-            })
-
-    return fichas_extraidas
-
-def generar_word_con_formato(datos):
-    doc = Document()
-    titulo = doc.add_heading('Tabla Resumen Monitoreo Arqueológico', 0)
-    titulo.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    
-    tabla = doc.add_table(rows=1, cols=3)
-    tabla.style = 'Table Grid'
-    tabla.autofit = False
-    tabla.alignment = WD_TABLE_ALIGNMENT.CENTER 
-
-    headers = tabla.rows[0].cells
-    titulos = ["Fecha", "Actividades realizadas durante el MAP", "Imagen de la actividad"]
-    
-    for i, texto in enumerate(titulos):
-        parrafo = headers[i].paragraphs[0]
-        run = parrafo.add_run(texto)
-        run.font.name = 'Franklin Gothic Book'
-        run.font.size = Pt(9)
-        run.bold = True
-        parrafo.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-    for c in tabla.columns[0].cells: c.width = Cm(2.5) 
-    for c in tabla.columns[1].cells: c.width = Cm(7.5) 
-    for c in tabla.columns[2].cells: c.width = Cm(8.5) 
-
-    for item in datos:
-        row = tabla.add_row().cells
-        p_fecha = row[0].paragraphs[0]
-        p_fecha.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        r_fecha = p_fecha.add_run(str(item["fecha"]))
-        r_fecha.font.name = 'Franklin Gothic Book'
-        r_fecha.font.size = Pt(9)
-
-        p_act = row[1].paragraphs[0]
-        p_act.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-        r_act = p_act.add_run(str(item["texto_central"]))
-        r_act.font.name = 'Franklin Gothic Book'
-        r_act.font.size = Pt(9)
-        
-        celda_img = row[2]
-        p_img = celda_img.paragraphs[0]
-        p_img.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        if not item["fotos"]:
-            r_sin = p_img.add_run("[Sin fotos]")
-            r_sin.font.name = 'Franklin Gothic Book'
-            r_sin.font.size = Pt(9)
-        else:
-            for i, foto_obj in enumerate(item["fotos"]):
-                try:
-                    run = p_img.add_run()
-                    run.add_picture(io.BytesIO(foto_obj["blob"]), width=Cm(8), height=Cm(6))
-                    if foto_obj["leyenda"]:
-                        r_leyenda = p_img.add_run(f"\n{foto_obj['leyenda']}")
-                        r_leyenda.font.name = 'Franklin Gothic Book'
-                        r_leyenda.font.size = Pt(9)
-                        r_leyenda.italic = True
-                    if i < len(item["fotos"]) - 1:
-                        p_img.add_run("\n\n")
-                except:
-                    continue
-    
-    buffer = io.BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)
-    return buffer
-
-# ==========================================
-# 2.1 LÓGICA NUEVA: GENERADOR WORD MAP (DESDE PDF) - V8 FINAL (Con Hallazgos)
-# ==========================================
-
-def procesar_pdf_a_word_map(pdf_bytes, nombre_archivo):
-    """
-    Extrae Fecha, Actividad y Fotos de reportes en PDF usando PyMuPDF (fitz).
-    - Captura actividad entre Sección IV y VI (Estado Persistente).
-    - Detecta "Presencia de Hallazgos" y agrega texto resumen "Se identificaron..." o "No se identificaron...".
-    - Filtra fotos (Logo Header y Fotos vacías).
-    """
-    try:
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    except Exception as e:
-        st.error(f"Error abriendo PDF {nombre_archivo}: {e}")
-        return []
-
-    fichas = []
-    ficha_actual = {
-        "fecha": None,
-        "texto_central": "",
-        "fotos": []
-    }
-    
-    # --- VARIABLES DE ESTADO Y CONFIGURACIÓN ---
-    capturando_descripcion = False
-    
-    # Textos basura a limpiar de la descripción
-    blacklist_clean = [
-        "V. DESCRIPCIONES", "Descripción de la Actividad", 
-        "Huso", "18 G", "19 H", "Datum", "WGS84",
-        "Coordenadas", "Vértice", "Este", "Norte", "Altitud"
-    ]
-
-    for pagina_idx, pagina in enumerate(doc):
-        # 1. ORDENAR BLOQUES VISUALMENTE
-        bloques = pagina.get_text("blocks")
-        bloques.sort(key=lambda b: (b[1], b[0])) 
-        
-        texto_plano_pagina = pagina.get_text("text")
-
-        # DETECTAR NUEVA FICHA (Reset)
-        if "I. IDENTIFICACIÓN" in texto_plano_pagina or "Ficha de Monitoreo Arqueológico" in texto_plano_pagina:
-            if ficha_actual["fecha"] or ficha_actual["texto_central"] or ficha_actual["fotos"]:
-                fichas.append(ficha_actual)
-            ficha_actual = { "fecha": None, "texto_central": "", "fotos": [] }
-            capturando_descripcion = False
-
-        # 2. EXTRAER FECHA
-        if not ficha_actual["fecha"]:
-            match_fecha = re.search(r"(\d{2}/\d{2}/\d{4})", texto_plano_pagina)
-            if match_fecha:
-                ficha_actual["fecha"] = match_fecha.group(1)
-
-        # 3. EXTRAER ACTIVIDAD (Lógica de Estado Persistente)
-        for i, b in enumerate(bloques):
-            txt = b[4].strip()
-            
-            # --- LÓGICA DE CAPTURA DE TEXTO (V a VI) ---
-            # A. Inicio
-            if "V. DESCRIPCIONES" in txt or "Descripción de la Actividad" in txt:
-                capturando_descripcion = True
-                continue 
-
-            # B. Fin
-            if "VI. CARACTERÍSTICAS" in txt or "CARACTERÍSTICAS DE LA CAPA" in txt:
-                capturando_descripcion = False
-            
-            # C. Captura
-            if capturando_descripcion:
-                if len(txt) < 3: continue # Ignorar basura pequeña
-                
-                # Chequeo anti-título
-                es_titulo = False
-                for bad in blacklist_clean:
-                    if bad in txt:
-                        es_titulo = True
-                        break
-                
-                if not es_titulo:
-                    if ficha_actual["texto_central"]:
-                         ficha_actual["texto_central"] += "\n" + txt
-                    else:
-                         ficha_actual["texto_central"] = txt
-
-            # --- LÓGICA NUEVA: DETECCIÓN DE HALLAZGOS (VII) ---
-            # Buscamos la etiqueta "Presencia de Hallazgos"
-            if "Presencia de Hallazgos" in txt:
-                texto_resultado = ""
-                
-                # Opción 1: El Sí/No está en el mismo bloque (ej. "Presencia de Hallazgos No")
-                if re.search(r"Presencia de Hallazgos\s*No", txt, re.IGNORECASE):
-                    texto_resultado = "No se identificaron hallazgos"
-                elif re.search(r"Presencia de Hallazgos\s*(Sí|Si)", txt, re.IGNORECASE):
-                    texto_resultado = "Se identificaron hallazgos"
-                
-                # Opción 2: El Sí/No está en el bloque siguiente (celda visualmente contigua)
-                elif i + 1 < len(bloques):
-                    txt_next = bloques[i+1][4].strip()
-                    if "No" == txt_next or "No" in txt_next[:3]:
-                        texto_resultado = "No se identificaron hallazgos"
-                    elif "Sí" in txt_next or "Si" in txt_next or "Sí" == txt_next:
-                        texto_resultado = "Se identificaron hallazgos"
-                
-                # Agregar el resultado al texto central (evitando duplicados en la misma ficha)
-                if texto_resultado:
-                    if texto_resultado not in ficha_actual["texto_central"]:
-                        ficha_actual["texto_central"] += "\n\n" + texto_resultado
-
-        # 4. EXTRAER FOTOS
-        sin_fotos = "No se registraron fotografías" in texto_plano_pagina or \
-                    "No se registraron fotografias" in texto_plano_pagina or \
-                    "No se registraron fotografias" in texto_plano_pagina.lower()
-
-        if not sin_fotos:
-            y_titulo_VIII = 0
-            tiene_titulo_VIII = False
-            
-            for b in bloques:
-                if "VIII. REGISTRO FOTOGRÁFICO" in b[4]:
-                    y_titulo_VIII = b[3]
-                    tiene_titulo_VIII = True
-                    break
-
-            if len(pagina.get_images()) > 0:
-                lista_imagenes = pagina.get_images(full=True)
-                for img in lista_imagenes:
-                    bbox = pagina.get_image_bbox(img)
-                    
-                    # FILTROS
-                    if bbox.y0 < 150: continue # Logo Header
-                    if tiene_titulo_VIII and bbox.y0 < y_titulo_VIII: continue # Antes del título
-                    base_image = doc.extract_image(img[0])
-                    if base_image["width"] < 150 or base_image["height"] < 150: continue # Iconos
-                    
-                    image_bytes = base_image["image"]
-                    leyenda_encontrada = ""
-                    for b in bloques:
-                        b_rect = fitz.Rect(b[:4])
-                        b_text = b[4].strip()
-                        dist = min(abs(b_rect.y0 - bbox.y1), abs(bbox.y0 - b_rect.y1))
-                        if dist < 70 and len(b_text) > 5 and "REGISTRO FOTOGRÁFICO" not in b_text:
-                            leyenda_encontrada = b_text
-                            break
-                    
-                    ficha_actual["fotos"].append({
-                        "blob": image_bytes,
-                        "leyenda": leyenda_encontrada
-                    })
-
-    if ficha_actual["fecha"] or ficha_actual["texto_central"] or ficha_actual["fotos"]:
-        fichas.append(ficha_actual)
-
-    return fichas
-
-# ==========================================
-# 3. LÓGICA: GENERADOR EXCEL (DESDE WORD)
-# ==========================================
-
-def procesar_word_a_excel(archivo_bytes, nombre_archivo):
-    try:
-        doc = Document(io.BytesIO(archivo_bytes))
-    except Exception as e:
-        st.error(f"Error leyendo {nombre_archivo}: {e}")
-        return []
-
-    registros = []
-    
-    for tabla in doc.tables:
-        dato = {
-            "Fecha": "",
-            "Descripción de la actividad": "",
-            "Descripción estratigráfica": ""
-        }
-        encontrado = False 
-        
-        for fila in tabla.rows:
-            for i, celda in enumerate(fila.cells):
-                texto_celda = celda.text.strip()
-                
-                if "Fecha" in texto_celda and len(texto_celda) < 20:
-                    if i + 1 < len(fila.cells):
-                        dato["Fecha"] = fila.cells[i+1].text.strip()
-                        encontrado = True
-                
-                if "Descripción de la actividad" in texto_celda:
-                    if i + 1 < len(fila.cells):
-                        dato["Descripción de la actividad"] = fila.cells[i+1].text.strip()
-                        encontrado = True
-
-                if "Descripción estratigráfica" in texto_celda:
-                    if i + 1 < len(fila.cells):
-                        dato["Descripción estratigráfica"] = fila.cells[i+1].text.strip()
-                        encontrado = True
-
-        if encontrado:
-            if dato["Fecha"] or dato["Descripción de la actividad"] or dato["Descripción estratigráfica"]:
-                registros.append(dato)
-                
-    return registros
-
-# ==========================================
-# 4. LÓGICA: GENERADOR FICHAS MAESTRO (DESDE WORD)
-# ==========================================
-
-def procesar_maestro_desde_word(archivo_bytes, nombre_archivo):
-    try:
-        doc = Document(io.BytesIO(archivo_bytes))
-    except Exception as e:
-        st.error(f"Error leyendo {nombre_archivo}: {e}")
-        return []
-
-    fichas = []
-    
-    for tabla in doc.tables:
-        info = {
-            "ID Sitio": "", "Coord. Norte": "", "Coord. Este": "", 
-            "Categoría": "", "Descripción": "", "Fecha": "", 
-            "Responsable": "", "Cronología": "", "foto_blob": None
-        }
-        es_ficha = False
-        crono_checks = [] 
-        crono_extra = [] 
-
-        for r_idx, fila in enumerate(tabla.rows):
-            for c_idx, celda in enumerate(fila.cells):
-                txt = celda.text.strip()
-                
-                if "ID Sitio" in txt and c_idx + 1 < len(fila.cells):
-                    val = fila.cells[c_idx+1].text.strip()
-                    if val:
-                        info["ID Sitio"] = val
-                        es_ficha = True
-                
-                if "Fecha" in txt and c_idx + 1 < len(fila.cells):
-                    info["Fecha"] = fila.cells[c_idx+1].text.strip()
-                        
-                if "Responsable" in txt and c_idx + 1 < len(fila.cells):
-                    info["Responsable"] = fila.cells[c_idx+1].text.strip()
-
-                if "Categoría" in txt and c_idx + 1 < len(fila.cells):
-                    info["Categoría"] = fila.cells[c_idx+1].text.strip()
-
-                if "Coord. Central Norte" in txt and c_idx + 1 < len(fila.cells):
-                    info["Coord. Norte"] = fila.cells[c_idx+1].text.strip()
-                if "Coord. Central Este" in txt and c_idx + 1 < len(fila.cells):
-                    info["Coord. Este"] = fila.cells[c_idx+1].text.strip()
-
-                # Descripción
-                if txt == "Descripción": 
-                    if c_idx + 1 < len(fila.cells):
-                        vecino = fila.cells[c_idx+1].text.strip()
-                        if "CRONOLOGÍA" not in vecino:
-                            info["Descripción"] = vecino
-                
-                # Cronología
-                opciones = ["Prehispánico", "Subactual", "Incierto", "Histórico"]
-                for op in opciones:
-                    if op in txt:
-                        if c_idx + 1 < len(fila.cells):
-                            val_vecino = fila.cells[c_idx+1].text.strip().upper()
-                            if "X" in val_vecino:
-                                crono_checks.append(op)
-                
-                if "Periodo específico" in txt:
-                    if c_idx + 1 < len(fila.cells):
-                        val = fila.cells[c_idx+1].text.strip()
-                        val = val.replace("Periodo específico:", "").replace("Periodo específico", "").strip()
-                        if val and len(val) > 1 and "X" not in val.upper():
-                            crono_extra.append(f"Periodo específico: {val}")
-
-                # Foto
-                if "Fotografía detalle" in txt:
-                    if r_idx > 0:
-                        celda_arriba = tabla.rows[r_idx - 1].cells[c_idx]
-                        imgs = obtener_imagenes_con_id(celda_arriba._element, doc)
-                        if imgs:
-                            info["foto_blob"] = imgs[0][1]
-
-        full_crono = crono_checks + crono_extra
-        if full_crono:
-            info["Cronología"] = ", ".join(list(set(full_crono)))
-
-        if es_ficha and info["ID Sitio"]:
-            fichas.append(info)
-
-    return fichas
-
-def crear_doc_tabla_horizontal(datos):
-    doc = Document()
-    
-    section = doc.sections[0]
-    new_width, new_height = section.page_height, section.page_width
-    section.orientation = WD_ORIENT.LANDSCAPE
-    section.page_width = new_width
-    section.page_height = new_height
-    section.left_margin = Cm(1.0)
-    section.right_margin = Cm(1.0)
-
-    doc.add_heading("Fichas de Hallazgos (Resumen)", 0)
-    tabla = doc.add_table(rows=1, cols=9)
-    tabla.style = 'Table Grid'
-    
-    titulos = ["ID Sitio", "Coord. Norte", "Coord. Este", "Cat. (SA/HA)", "Descripción", "Fecha", "Responsable", "Cronología", "Foto"]
-    headers = tabla.rows[0].cells
-    for i, t in enumerate(titulos):
-        headers[i].text = t
-        headers[i].paragraphs[0].runs[0].bold = True
-
-    for item in datos:
-        row = tabla.add_row().cells
-        row[0].text = str(item.get("ID Sitio", ""))
-        row[1].text = str(item.get("Coord. Norte", ""))
-        row[2].text = str(item.get("Coord. Este", ""))
-        row[3].text = str(item.get("Categoría", ""))
-        row[4].text = str(item.get("Descripción", ""))
-        row[5].text = str(item.get("Fecha", ""))
-        row[6].text = str(item.get("Responsable", ""))
-        row[7].text = str(item.get("Cronología", ""))
-        
-        if item.get("foto_blob"):
-            p = row[8].paragraphs[0]
-            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            try:
-                run = p.add_run()
-                run.add_picture(io.BytesIO(item["foto_blob"]), width=Cm(4.5)) 
-            except:
-                p.add_run("[Err]")
-        else:
-            row[8].text = "[Sin Foto]"
-
-    buffer = io.BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)
-    return buffer
-
-# ==========================================
-# 5. LÓGICA: GENERADOR KMZ & MAPA INTERACTIVO
-# ==========================================
-
-def crear_kml_texto(puntos):
-    kml_header = """<?xml version="1.0" encoding="UTF-8"?>
-<kml xmlns="http://www.opengis.net/kml/2.2">
-  <Document>
-    <name>Hallazgos Arqueológicos</name>"""
-    kml_footer = """
-  </Document>
-</kml>"""
-    kml_body = ""
-    for p in puntos:
-        kml_body += f"""
-    <Placemark>
-      <name>{p['nombre']}</name>
-      <description>{p['desc']}</description>
-      <Point>
-        <coordinates>{p['lon']},{p['lat']},0</coordinates>
-      </Point>
-    </Placemark>"""
-    return kml_header + kml_body + kml_footer
-
-def obtener_puntos_geograficos_con_foto(archivos):
-    """
-    Extrae coords y FOTOS para el mapa interactivo.
-    """
-    try:
-        transformer = Transformer.from_crs("epsg:32718", "epsg:4326", always_xy=True)
-    except:
-        return None
-
-    puntos_acumulados = []
-    
-    for a in archivos:
-        try:
-            doc = Document(io.BytesIO(a.read()))
-            for tabla in doc.tables:
-                id_sitio, norte, este, desc = "", "", "", ""
-                foto_bytes = None
-                
-                for r_idx, fila in enumerate(tabla.rows):
-                    for idx, celda in enumerate(fila.cells):
-                        txt = celda.text.strip()
-                        
-                        # Datos
-                        if "ID Sitio" in txt and idx+1 < len(fila.cells): id_sitio = fila.cells[idx+1].text.strip()
-                        if "Coord. Central Norte" in txt and idx+1 < len(fila.cells): norte = fila.cells[idx+1].text.strip()
-                        if "Coord. Central Este" in txt and idx+1 < len(fila.cells): este = fila.cells[idx+1].text.strip()
-                        if "Categoría" in txt and idx+1 < len(fila.cells): desc = fila.cells[idx+1].text.strip()
-                        
-                        # Foto (para el mapa)
-                        if "Fotografía detalle" in txt and r_idx > 0:
-                            celda_arriba = tabla.rows[r_idx - 1].cells[idx]
-                            imgs = obtener_imagenes_con_id(celda_arriba._element, doc)
-                            if imgs:
-                                foto_bytes = imgs[0][1]
-                
-                if id_sitio and norte and este:
-                    n = limpiar_coordenada(norte)
-                    e = limpiar_coordenada(este)
-                    if n and e:
-                        lon, lat = transformer.transform(e, n)
-                        puntos_acumulados.append({
-                            "nombre": id_sitio, 
-                            "desc": desc, 
-                            "lat": lat, 
-                            "lon": lon,
-                            "foto": foto_bytes
-                        })
-        except:
-            continue
-            
-    return puntos_acumulados
+# Solo lo que usa el menú: cada herramienta importa lo suyo al abrirse (paginas.py).
+from ejecutor import WORKERS_POR_DEFECTO
+from fotos import AjusteFotos, AJUSTE_POR_DEFECTO
+from proyecto import Proyecto, PROYECTO_POR_DEFECTO
+from trabajos import ColaTrabajos, TERMINADO, CANCELADO
+from tiempos import Medicion, emitir, emitir_arranque, NOMBRES_ETAPAS
+from perfilado import Perfil, PerfilOcupado
+from paginas import PAGINAS, POR_TITULO, cargar
+
+@st.cache_resource
+def abrir_proyecto(ruta):
+    return Proyecto(ruta)
+
+# Una cola por proceso, compartida entre sesiones: un trabajo sigue corriendo (y se
+# puede volver a abrir) aunque se recargue la página.
+@st.cache_resource
+def cola_trabajos():
+    return ColaTrabajos()
 
 # ==========================================
 #          MENÚ LATERAL
 # ==========================================
 
 st.sidebar.title("Arqueología App")
-opcion = st.sidebar.radio("Herramientas:", [
-    "Generador Word (MAP)", 
-    "Generador Word MAP (Desde PDF)", 
-    "Generador Excel (Desde Word)",
-    "Generador Excel y GIS (Recolección Superficial)", # <--- Cambia solo esta línea
-    "Generador Excel (Fichas de Excavación)",
-    "Generador Fichas (Desde Word)",
-    "Generador KMZ (Georreferenciación)",
-    "Visor de Mapa Interactivo",
-    "Extractor KMZ/KML a Excel"
-])
-
-# 1. Generador Word (MAP - Desde Word)
-if opcion == "Generador Word (MAP)":
-    st.title("Generador Word MAP (Desde DOCX)")
-    st.markdown("Crea la tabla resumen mensual a partir de los anexos diarios en Word.")
-    st.info("Configuración: Franklin Gothic Book 9 | Fotos 8x6 cm | Centrado")
-    archivos = st.file_uploader("Subir Anexos Word (.docx)", accept_multiple_files=True, key="word_up")
-    if archivos and st.button("Generar Informe Word"):
-        todas = []
-        bar = st.progress(0)
-        for i, a in enumerate(archivos):
-            fichas = procesar_archivo_v12(a.read(), a.name)
-            todas.extend(fichas)
-            bar.progress((i+1)/len(archivos))
-        if todas:
-            todas.sort(key=lambda x: x['fecha'] if x['fecha'] else "ZZZ")
-            doc_out = generar_word_con_formato(todas)
-            st.success("✅ Informe Word generado.")
-            st.download_button("Descargar Word", doc_out, "Resumen_MAP.docx")
-        else: st.error("No se encontraron datos.")
-
-# 1.1 Generador Word MAP (Desde PDF) - V8
-elif opcion == "Generador Word MAP (Desde PDF)":
-    st.title("Generador Word MAP (Desde PDF)")
-    st.markdown("Crea la tabla resumen mensual extrayendo datos de reportes en PDF.")
-    st.warning("Requiere librería 'pymupdf' instalada.")
-    
-    archivos = st.file_uploader("Subir Reportes PDF (.pdf)", accept_multiple_files=True, key="pdf_up")
-    
-    if archivos and st.button("Procesar PDFs y Generar Word"):
-        todas_fichas = []
-        bar = st.progress(0)
-        
-        for i, a in enumerate(archivos):
-            fichas = procesar_pdf_a_word_map(a.read(), a.name)
-            todas_fichas.extend(fichas)
-            bar.progress((i+1)/len(archivos))
-            
-        if todas_fichas:
-            # Ordenar por fecha si es posible
-            todas_fichas.sort(key=lambda x: x['fecha'] if x['fecha'] else "ZZZ")
-            
-            # Reutilizamos la función de formato que ya existe
-            doc_out = generar_word_con_formato(todas_fichas)
-            
-            st.success(f"✅ Se procesaron {len(todas_fichas)} fichas desde PDF.")
-            st.download_button("Descargar Word Resumen", doc_out, "Resumen_MAP_Desde_PDF.docx")
-        else:
-            st.error("No se pudieron extraer datos válidos de los PDFs.")
-
-# 2. Generador Excel (Desde Word)
-elif opcion == "Generador Excel (Desde Word)":
-    st.title("Generador Excel (Desde Word)")
-    st.markdown("Extrae: Fecha, Descripción de actividad y estratigráfica (celda vecina).")
-    archivos = st.file_uploader("Subir Anexos Word (.docx)", accept_multiple_files=True, key="word_excel_up")
-    if archivos and st.button("Generar Excel"):
-        todos_registros = []
-        bar = st.progress(0)
-        for i, a in enumerate(archivos):
-            regs = procesar_word_a_excel(a.read(), a.name)
-            todos_registros.extend(regs)
-            bar.progress((i+1)/len(archivos))
-        if todos_registros:
-            df = pd.DataFrame(todos_registros)
-            st.success(f"✅ Se extrajeron {len(df)} filas.")
-            st.dataframe(df)
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name="Resumen")
-            st.download_button("⬇️ Descargar Excel", buffer.getvalue(), "Resumen_Word_Excel.xlsx")
-        else: st.error("No se encontraron datos.")
-
-# --- AGREGA ESTE BLOQUE AQUÍ ---
-elif opcion == "Generador Excel y GIS (Recolección Superficial)":
-    modulo_recoleccion.ejecutar_interfaz()
-# -------------------------------
-# --- NUEVO MÓDULO EXCAVACIÓN ---
-elif opcion == "Generador Excel (Fichas de Excavación)":
-    modulo_excavacion.ejecutar_interfaz()
-# -------------------------------
-# 3. Generador Fichas (Desde Word)
-elif opcion == "Generador Fichas (Desde Word)":
-    st.title("Generador de Fichas (Desde DOCX)")
-    st.markdown("Extrae datos y fotos desde las Fichas de Hallazgo originales en Word.")
-    archivos = st.file_uploader("Subir Fichas de Hallazgo (.docx)", accept_multiple_files=True, key="maestro_up")
-    if archivos and st.button("Procesar Archivos"):
-        todos_datos = []
-        bar = st.progress(0)
-        for i, a in enumerate(archivos):
-            datos = procesar_maestro_desde_word(a.read(), a.name)
-            todos_datos.extend(datos)
-            bar.progress((i+1)/len(archivos))
-        if todos_datos:
-            st.success(f"✅ Se procesaron {len(todos_datos)} fichas.")
-            df = pd.DataFrame(todos_datos)
-            df_excel = df.drop(columns=["foto_blob"], errors='ignore')
-            orden = ["ID Sitio", "Coord. Norte", "Coord. Este", "Categoría", "Descripción", "Fecha", "Responsable", "Cronología"]
-            cols = [c for c in orden if c in df_excel.columns]
-            df_excel = df_excel[cols]
-            buf_excel = io.BytesIO()
-            with pd.ExcelWriter(buf_excel, engine='openpyxl') as writer:
-                df_excel.to_excel(writer, index=False, sheet_name="Hallazgos")
-            buf_word = crear_doc_tabla_horizontal(todos_datos)
-            col1, col2 = st.columns(2)
-            col1.download_button("⬇️ Descargar Excel", buf_excel.getvalue(), "Base_Datos_Hallazgos.xlsx")
-            col2.download_button("⬇️ Descargar Fichas Word", buf_word.getvalue(), "Fichas_Con_Fotos.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
-            st.dataframe(df_excel)
-        else: st.error("No se encontraron fichas válidas.")
-
-# 4. Generador KMZ
-elif opcion == "Generador KMZ (Georreferenciación)":
-    st.title("Generador KMZ (Google Earth)")
-    st.markdown("Crea un archivo KMZ a partir de las coordenadas (UTM 18S) en los documentos Word.")
-    archivos = st.file_uploader("Subir Fichas de Hallazgo (.docx)", accept_multiple_files=True, key="kmz_up")
-    if archivos and st.button("Generar KMZ"):
-        try:
-            puntos = obtener_puntos_geograficos_con_foto(archivos)
-            if puntos:
-                kmz_final_buffer = io.BytesIO()
-                with zipfile.ZipFile(kmz_final_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-                    kml_content = crear_kml_texto(puntos)
-                    zf.writestr("doc.kml", kml_content)
-                kmz_final_buffer.seek(0)
-                st.success(f"✅ Se generaron {len(puntos)} puntos.")
-                st.download_button("⬇️ Descargar KMZ", kmz_final_buffer.getvalue(), "Hallazgos_Georreferenciados.kmz")
-            else: st.error("No se encontraron coordenadas válidas.")
-        except ImportError: st.error("Falta librería 'pyproj'.")
-
-# 5. Visor Mapa Interactivo
-elif opcion == "Visor de Mapa Interactivo":
-    st.title("Visor de Mapa Interactivo")
-    st.markdown("Visualiza los hallazgos en Google Satélite con fotos.")
-    
-    try:
-        import folium
-        from streamlit_folium import st_folium
-    except ImportError:
-        st.error("⚠️ Faltan las librerías 'folium' y 'streamlit-folium'.")
-        st.stop()
-
-    archivos = st.file_uploader("Subir Fichas de Hallazgo (.docx)", accept_multiple_files=True, key="mapa_up")
-    
-    if 'map_points' not in st.session_state:
-        st.session_state.map_points = None
+opcion = st.sidebar.radio("Herramientas:", [p.titulo for p in PAGINAS])
+pagina = POR_TITULO[opcion]
+workers = st.sidebar.number_input(
+    "Procesos en paralelo", min_value=1, max_value=os.cpu_count() or 1,
+    value=min(WORKERS_POR_DEFECTO, os.cpu_count() or 1),
+    help="Cantidad de archivos que se procesan a la vez."
+)
+with st.sidebar.expander("Fotos de los informes Word"):
+    fotos_originales = st.checkbox("Insertar fotos originales (sin reducir)", value=False)
+    ajuste_fotos = AjusteFotos(
+        dpi=0 if fotos_originales else st.number_input("Resolución (DPI)", min_value=72, max_value=600, value=AJUSTE_POR_DEFECTO.dpi, step=25),
+        calidad=st.slider("Calidad JPEG", min_value=30, max_value=95, value=AJUSTE_POR_DEFECTO.calidad),
+    )
+with st.sidebar.expander("Proyecto"):
+    ruta_proyecto = st.text_input(
+        "Base del proyecto (.sqlite)", value=PROYECTO_POR_DEFECTO,
+        help="Guarda lo leído: solo se procesan los archivos nuevos o cambiados y las salidas incluyen "
+             "todo lo ingresado antes. Vacío: cada corrida parte de cero."
+    )
+    proyecto = abrir_proyecto(ruta_proyecto) if ruta_proyecto else None
+    if proyecto:
+        en_proyecto = {f"{a.nombre} ({a.parser.rsplit('.', 1)[-1]})": a for a in proyecto.archivos()}
+        st.caption(f"{len(en_proyecto)} archivos ingresados.")
+        if proyecto.ultimo_ingreso:
+            st.caption(f"Último lote: {proyecto.ultimo_ingreso.texto()}.")
+        a_quitar = st.multiselect("Quitar archivos del proyecto", sorted(en_proyecto))
+        if a_quitar and st.button("Quitar"):
+            for etiqueta in a_quitar:
+                proyecto.quitar(en_proyecto[etiqueta].parser, en_proyecto[etiqueta].nombre)
+            st.rerun()
+segundo_plano = st.sidebar.checkbox(
+    "Procesar en segundo plano",
+    help="El lote corre aparte: se puede seguir usando la app, recargar la página o cancelarlo, "
+         "y las descargas quedan en la lista de trabajos."
+)
+
+perfilar = st.sidebar.checkbox(
+    "Perfilar la corrida (cProfile)",
+    help="Mide cada función de la herramienta para diagnosticar un archivo lento: muestra las que más "
+         "tardan y deja descargar el perfil (.prof, para snakeviz). Va en un solo proceso y más lento."
+)
+if perfilar:
+    workers = 1  # cProfile mide solo el proceso (y el hilo) de la app
+
+def abrir_trabajo(id_trabajo):
+    st.query_params["trabajo"] = id_trabajo
+
+def cerrar_trabajo():
+    st.query_params.pop("trabajo", None)
+
+trabajos_recientes = cola_trabajos().listar()[:10]
+if trabajos_recientes:
+    with st.sidebar.expander("Trabajos"):
+        for t in trabajos_recientes:
+            st.button(f"{t.titulo} · {t.estado}", key=f"abrir_{t.id}", help=f"{t.id} ({t.creado})",
+                      on_click=abrir_trabajo, args=(t.id,), use_container_width=True)
+
+def enviar_trabajo(herramienta, archivos, **opciones):
+    """Copia los archivos subidos a un trabajo nuevo, lo pone en cola y abre su panel (no vuelve)."""
+    from procesar_lote import HERRAMIENTAS, CON_FOTOS, lote_en_trabajo
+    cola = cola_trabajos()
+    trabajo = cola.crear(herramienta, HERRAMIENTAS[herramienta][2])
+    for a in archivos or []:
+        (trabajo.entrada / Path(a.name).name).write_bytes(a.getvalue())
+    if herramienta in CON_FOTOS:
+        opciones["ajuste_fotos"] = ajuste_fotos
+    cola.enviar(trabajo, lote_en_trabajo, herramienta, workers, proyecto=proyecto, perfilar=perfilar, **opciones)
+    abrir_trabajo(trabajo.id)
+    st.rerun()
+
+def mostrar_tiempos(medicion):
+    """Desglose plegado de los tiempos por etapa y por archivo de una corrida."""
+    import pandas as pd
+    etapas = medicion.por_etapa()
+    suma = sum(t.segundos for t in etapas.values())
+    total = medicion.segundos or suma
+    with st.expander(f"⏱️ Tiempos por etapa ({total:.2f} s)"):
+        st.dataframe(pd.DataFrame(
+            [(NOMBRES_ETAPAS[e], t.cuenta, t.segundos, t.segundos / suma if suma else 0.0) for e, t in etapas.items()],
+            columns=["Etapa", "Veces", "Segundos", "Proporción"],
+        ), hide_index=True, column_config={
+            "Segundos": st.column_config.NumberColumn(format="%.3f"),
+            "Proporción": st.column_config.ProgressColumn(min_value=0.0, max_value=1.0, format="percent"),
+        })
+        por_archivo = medicion.por_archivo()
+        if por_archivo:
+            df = pd.DataFrame([
+                {"Archivo": archivo, **{NOMBRES_ETAPAS[e]: t.segundos for e, t in tiempos.items()},
+                 "Total": sum(t.segundos for t in tiempos.values())}
+                for archivo, tiempos in por_archivo.items()
+            ]).sort_values("Total", ascending=False)
+            st.caption("Por archivo, del más lento al más rápido (segundos). Con varios procesos, la "
+                       "lectura de todos los archivos suma más que el tiempo total.")
+            st.dataframe(df, hide_index=True, column_config={
+                c: st.column_config.NumberColumn(format="%.3f") for c in df.columns if c != "Archivo"
+            })
 
-    if archivos and st.button("Procesar y Mostrar Mapa"):
-        with st.spinner("Leyendo coordenadas y fotos..."):
-            puntos = obtener_puntos_geograficos_con_foto(archivos)
-            if puntos:
-                st.session_state.map_points = puntos
+def mostrar_perfil(perfil, crudo, clave="perfil"):
+    """Funciones que más tardaron en la corrida perfilada y descarga del perfil crudo."""
+    import pandas as pd
+    funciones = perfil.funciones()
+    with st.expander("🔬 Perfil de la corrida (cProfile)"):
+        st.caption(f"Las {len(funciones)} funciones con más tiempo propio (sin contar las que llaman). "
+                   "El acumulado incluye todo lo que llaman.")
+        st.dataframe(pd.DataFrame(
+            [tuple(f) for f in funciones], columns=["Función", "Ubicación", "Llamadas", "Propio (s)", "Acumulado (s)"]
+        ), hide_index=True, column_config={
+            "Propio (s)": st.column_config.NumberColumn(format="%.3f"),
+            "Acumulado (s)": st.column_config.NumberColumn(format="%.3f"),
+        })
+        st.download_button("⬇️ Descargar perfil (.prof)", crudo, "perfil.prof", "application/octet-stream", key=clave,
+                           help="Se abre con `snakeviz perfil.prof` o con pstats.")
+
+def mostrar_trabajo(id_trabajo):
+    import pandas as pd
+    trabajo = cola_trabajos().obtener(id_trabajo)
+    if trabajo is None:
+        st.warning(f"El trabajo {id_trabajo} ya no existe.")
+        st.button("Cerrar", on_click=cerrar_trabajo)
+        return
+    activo = not trabajo.finalizado
+
+    # Mientras corre, solo este panel se vuelve a dibujar cada segundo.
+    @st.fragment(run_every=1 if activo else None)
+    def panel():
+        with st.container(border=True):
+            st.subheader(f"Trabajo: {trabajo.titulo}")
+            st.caption(f"{trabajo.id} · enviado {trabajo.creado.replace('T', ' ')}")
+            if not trabajo.finalizado:
+                texto = f"{trabajo.estado.capitalize()}: {trabajo.hechos} de {trabajo.total or '?'} archivos"
+                st.progress(trabajo.hechos / trabajo.total if trabajo.total else 0.0, text=texto)
+                if trabajo.cancelando:
+                    st.caption("Cancelando: terminan los archivos que ya se estaban leyendo.")
+                else:
+                    st.button("Cancelar", key="cancelar_trabajo", on_click=trabajo.cancelar)
+            elif trabajo.estado == TERMINADO:
+                if trabajo.mensaje:
+                    st.error(trabajo.mensaje)
+                else:
+                    st.success("✅ Trabajo terminado.")
+            elif trabajo.estado == CANCELADO:
+                st.warning(f"Trabajo cancelado ({trabajo.hechos} de {trabajo.total} archivos leídos).")
             else:
-                st.error("No se pudieron extraer datos.")
+                st.error(f"El trabajo falló: {trabajo.mensaje}")
+
+            parciales = trabajo.parciales()
+            for p in parciales:
+                if p.error:
+                    st.error(p.error)
+            if parciales:
+                with st.expander(f"Archivos leídos ({len(parciales)})"):
+                    st.dataframe(pd.DataFrame([tuple(p) for p in parciales], columns=["Archivo", "Registros", "Error"]), hide_index=True)
+            if trabajo.finalizado and trabajo.tiempos:
+                medicion = Medicion(trabajo.herramienta)
+                medicion.agregar(trabajo.tiempos)
+                mostrar_tiempos(medicion)
+            if trabajo.finalizado and trabajo.perfil.is_file():
+                mostrar_perfil(Perfil.cargar(trabajo.perfil), trabajo.perfil.read_bytes(), "perfil_trabajo")
+
+            if trabajo.finalizado:
+                artefactos = trabajo.artefactos()
+                for col, artefacto in zip(st.columns(max(1, len(artefactos))), artefactos):
+                    col.download_button(f"⬇️ {artefacto.nombre}", artefacto.ruta.read_bytes(), artefacto.nombre,
+                                        key=f"descargar_{artefacto.nombre}")
+                col1, col2 = st.columns(2)
+                col1.button("Cerrar", on_click=cerrar_trabajo)
+                if col2.button("Borrar trabajo y archivos"):
+                    cola_trabajos().borrar(trabajo.id)
+                    cerrar_trabajo()
+                    st.rerun()
+        if activo and trabajo.finalizado:
+            st.rerun()  # recarga la app entera: deja de consultar y actualiza la lista de trabajos
+
+    panel()
+
+if "trabajo" in st.query_params:
+    mostrar_trabajo(st.query_params["trabajo"])
+
+# La primera vez que se abre la página en este proceso se importa su módulo: queda
+# en las métricas como "arranque" (lo que tardó el script hasta tener la página lista).
+funcion_pagina, carga_pagina = cargar(pagina)
+listo = time.perf_counter() - INICIO
+if carga_pagina:
+    emitir_arranque(pagina.herramienta, listo, carga_pagina)
+st.sidebar.caption(f"Página lista en {listo:.2f} s" + (f" (módulo {carga_pagina:.2f} s)" if carga_pagina else ""))
+
+# Lo que corra la herramienta en este rerun se mide por etapa (tiempos.py); el
+# desglose se muestra al final de la página.
+medicion = Medicion(pagina.herramienta)
+token_medicion = medicion.activar()
+# En segundo plano el perfil lo toma el trabajo (aquí solo se envía y tendría el candado).
+perfil = Perfil() if perfilar and not segundo_plano else None
+if perfil is not None:
+    try:
+        perfil.iniciar()
+    except PerfilOcupado as e:
+        st.warning(f"Esta corrida va sin perfil: {e}")
+        perfil = None
 
-    if st.session_state.map_points:
-        puntos = st.session_state.map_points
-        st.success(f"✅ Se encontraron {len(puntos)} puntos.")
-        
-        avg_lat = sum(p['lat'] for p in puntos) / len(puntos)
-        avg_lon = sum(p['lon'] for p in puntos) / len(puntos)
-        
-        # Mapa base limpio para poner Google Sat
-        m = folium.Map(location=[avg_lat, avg_lon], zoom_start=12, tiles=None)
-        
-        # Capa Satélite
-        folium.TileLayer(
-            tiles='https://mt1.google.com/vt/lyrs=s&x={x}&y={y}&z={z}',
-            attr='Google',
-            name='Google Satellite',
-            overlay=False,
-            control=True
-        ).add_to(m)
-        
-        for p in puntos:
-            # HTML Popup con Foto Base64
-            html = f"<div style='font-family: Arial; width: 200px;'>"
-            html += f"<b>{p['nombre']}</b><br><i style='font-size:12px'>{p['desc']}</i>"
-            
-            if p['foto']:
-                # Convertir bytes a base64
-                b64 = base64.b64encode(p['foto']).decode('utf-8')
-                html += f"<br><img src='data:image/jpeg;base64,{b64}' width='100%' style='margin-top:5px; border-radius:5px;'>"
-            
-            html += "</div>"
-            
-            iframe = folium.IFrame(html, width=220, height=220)
-            popup = folium.Popup(iframe, max_width=220)
-            
-            # Marcador como PUNTO ROJO
-            folium.CircleMarker(
-                location=[p['lat'], p['lon']],
-                radius=6,
-                color='red',
-                fill=True,
-                fill_color='red',
-                fill_opacity=1.0,
-                popup=popup,
-                tooltip=p['nombre']
-            ).add_to(m)
-        
-        st_folium(m, width=900, height=600)
-        # 6. Extractor KMZ/KML a Excel (LLAMADA AL ARCHIVO EXTERNO)
-elif opcion == "Extractor KMZ/KML a Excel":
-    extractor_kmz.mostrar_pagina()
+# st.stop()/st.rerun() dentro de una herramienta también cortan la medición y el perfil.
+try:
+    if pagina.con_fotos:
+        funcion_pagina(workers, proyecto, enviar_trabajo if segundo_plano else None, ajuste_fotos=ajuste_fotos)
+    else:
+        funcion_pagina(workers, proyecto, enviar_trabajo if segundo_plano else None)
+finally:
+    medicion.desactivar(token_medicion)
+    if perfil is not None:
+        perfil.detener()
+if medicion:
+    emitir(medicion)
+    mostrar_tiempos(medicion)
+    if perfil is not None:
+        mostrar_perfil(perfil, perfil.crudo())
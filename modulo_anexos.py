@@ -0,0 +1,83 @@
+"""
+Páginas de los anexos MAP: resumen Word desde DOCX o desde PDF y Excel de actividades.
+"""
+import streamlit as st
+import pandas as pd
+from extraccion import (
+    fitz,
+    procesar_archivo_v12, generar_word_con_formato, procesar_pdf_a_word_map,
+    procesar_word_a_excel, ordenar_por_fecha, dataframe_a_excel,
+)
+from ejecutor import procesar_archivos, aplanar
+
+# 1. Generador Word (MAP - Desde Word)
+def interfaz_word_map(workers=1, proyecto=None, enviar_trabajo=None, ajuste_fotos=None):
+    st.title("Generador Word MAP (Desde DOCX)")
+    st.markdown("Crea la tabla resumen mensual a partir de los anexos diarios en Word.")
+    st.info("Configuración: Franklin Gothic Book 9 | Fotos 8x6 cm | Centrado")
+    archivos = st.file_uploader("Subir Anexos Word (.docx)", accept_multiple_files=True, key="word_up")
+    if (archivos or proyecto) and st.button("Generar Informe Word"):
+        if enviar_trabajo:
+            enviar_trabajo("map-word", archivos)  # corre en segundo plano; no vuelve
+        bar = st.progress(0)
+        resultados = procesar_archivos(procesar_archivo_v12, [(a.name, a.read()) for a in archivos], workers,
+                                       lambda hechos, total: bar.progress(hechos/total), proyecto=proyecto)
+        todas, errores = aplanar(resultados)
+        for e in errores: st.error(e)
+        if todas:
+            ordenar_por_fecha(todas)
+            doc_out = generar_word_con_formato(todas, ajuste_fotos)
+            st.success("✅ Informe Word generado.")
+            st.download_button("Descargar Word", doc_out, "Resumen_MAP.docx")
+        else: st.error("No se encontraron datos.")
+
+# 1.1 Generador Word MAP (Desde PDF) - V8
+def interfaz_pdf_map(workers=1, proyecto=None, enviar_trabajo=None, ajuste_fotos=None):
+    if fitz is None:
+        st.error("⚠️ Falta instalar la librería 'pymupdf'. Agregala a requirements.txt")
+    st.title("Generador Word MAP (Desde PDF)")
+    st.markdown("Crea la tabla resumen mensual extrayendo datos de reportes en PDF.")
+    st.warning("Requiere librería 'pymupdf' instalada.")
+
+    archivos = st.file_uploader("Subir Reportes PDF (.pdf)", accept_multiple_files=True, key="pdf_up")
+
+    if (archivos or proyecto) and st.button("Procesar PDFs y Generar Word"):
+        if enviar_trabajo:
+            enviar_trabajo("map-pdf", archivos)  # corre en segundo plano; no vuelve
+        bar = st.progress(0)
+        resultados = procesar_archivos(procesar_pdf_a_word_map, [(a.name, a.read()) for a in archivos], workers,
+                                       lambda hechos, total: bar.progress(hechos/total), proyecto=proyecto)
+        todas_fichas, errores = aplanar(resultados)
+        for e in errores: st.error(e)
+
+        if todas_fichas:
+            # Ordenar por fecha si es posible
+            ordenar_por_fecha(todas_fichas)
+
+            # Reutilizamos la función de formato que ya existe
+            doc_out = generar_word_con_formato(todas_fichas, ajuste_fotos)
+
+            st.success(f"✅ Se procesaron {len(todas_fichas)} fichas desde PDF.")
+            st.download_button("Descargar Word Resumen", doc_out, "Resumen_MAP_Desde_PDF.docx")
+        else:
+            st.error("No se pudieron extraer datos válidos de los PDFs.")
+
+# 2. Generador Excel (Desde Word)
+def interfaz_excel_word(workers=1, proyecto=None, enviar_trabajo=None):
+    st.title("Generador Excel (Desde Word)")
+    st.markdown("Extrae: Fecha, Descripción de actividad y estratigráfica (celda vecina).")
+    archivos = st.file_uploader("Subir Anexos Word (.docx)", accept_multiple_files=True, key="word_excel_up")
+    if (archivos or proyecto) and st.button("Generar Excel"):
+        if enviar_trabajo:
+            enviar_trabajo("excel-word", archivos)  # corre en segundo plano; no vuelve
+        bar = st.progress(0)
+        resultados = procesar_archivos(procesar_word_a_excel, [(a.name, a.read()) for a in archivos], workers,
+                                       lambda hechos, total: bar.progress(hechos/total), proyecto=proyecto)
+        todos_registros, errores = aplanar(resultados)
+        for e in errores: st.error(e)
+        if todos_registros:
+            df = pd.DataFrame(todos_registros)
+            st.success(f"✅ Se extrajeron {len(df)} filas.")
+            st.dataframe(df)
+            st.download_button("⬇️ Descargar Excel", dataframe_a_excel(df, "Resumen"), "Resumen_Word_Excel.xlsx")
+        else: st.error("No se encontraron datos.")
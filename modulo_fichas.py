@@ -0,0 +1,80 @@
+"""
+Páginas de las Fichas de Hallazgo: Excel y Word de fichas, y KMZ georreferenciado.
+"""
+import streamlit as st
+from extraccion import (
+    leer_fichas_hallazgo, puntos_de_fichas, crear_doc_tabla_horizontal,
+    tabla_hallazgos, dataframe_a_excel,
+)
+from escritor_kml import crear_kmz
+import geodatos
+from ejecutor import procesar_archivos, aplanar
+from fotos import huella_puntos
+from indice_espacial import filtrar
+from area_interes import panel_area
+
+# 3. Generador Fichas (Desde Word)
+def interfaz_fichas(workers=1, proyecto=None, enviar_trabajo=None, ajuste_fotos=None):
+    st.title("Generador de Fichas (Desde DOCX)")
+    st.markdown("Extrae datos y fotos desde las Fichas de Hallazgo originales en Word.")
+    archivos = st.file_uploader("Subir Fichas de Hallazgo (.docx)", accept_multiple_files=True, key="maestro_up")
+    area = panel_area("fichas", titulo="Exportar")
+    if (archivos or proyecto) and st.button("Procesar Archivos"):
+        if enviar_trabajo:
+            enviar_trabajo("fichas", archivos, area=area)  # corre en segundo plano; no vuelve
+        bar = st.progress(0)
+        resultados = procesar_archivos(leer_fichas_hallazgo, [(a.name, a.read()) for a in archivos], workers,
+                                       lambda hechos, total: bar.progress(hechos/total), proyecto=proyecto)
+        fichas, errores = aplanar(resultados)
+        for e in errores: st.error(e)
+        if area is not None:
+            fichas = filtrar(fichas, [f.lon for f in fichas], [f.lat for f in fichas], area)
+            st.caption(f"{len(fichas)} fichas en el área.")
+        if fichas:
+            todos_datos = [f.como_fila() for f in fichas]
+            st.success(f"✅ Se procesaron {len(todos_datos)} fichas.")
+            df_excel = tabla_hallazgos(todos_datos)
+            buf_word = crear_doc_tabla_horizontal(todos_datos, ajuste_fotos)
+            # Misma lectura para el KMZ y el visor de mapa (sin volver a subir ni parsear).
+            puntos = puntos_de_fichas(fichas)
+            col1, col2, col3 = st.columns(3)
+            col1.download_button("⬇️ Descargar Excel", dataframe_a_excel(df_excel, "Hallazgos"), "Base_Datos_Hallazgos.xlsx")
+            col2.download_button("⬇️ Descargar Fichas Word", buf_word.getvalue(), "Fichas_Con_Fotos.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+            if puntos:
+                col3.download_button("⬇️ Descargar KMZ", crear_kmz(puntos), "Hallazgos_Georreferenciados.kmz")
+                st.session_state.map_points = puntos
+                st.session_state.map_huella = huella_puntos(puntos)
+                st.caption(f"{len(puntos)} fichas con coordenadas quedan cargadas en el Visor de Mapa Interactivo.")
+            st.dataframe(df_excel)
+        else: st.error("No se encontraron fichas válidas.")
+
+# 4. Generador KMZ
+def interfaz_kmz(workers=1, proyecto=None, enviar_trabajo=None):
+    st.title("Generador KMZ (Google Earth)")
+    st.markdown("Crea un archivo KMZ a partir de las coordenadas UTM de los documentos Word (huso indicado en la ficha, 18S por defecto).")
+    archivos = st.file_uploader("Subir Fichas de Hallazgo (.docx)", accept_multiple_files=True, key="kmz_up")
+    area = panel_area("kmz", titulo="Exportar")
+    if (archivos or proyecto) and st.button("Generar KMZ"):
+        if enviar_trabajo:
+            enviar_trabajo("kmz", archivos, area=area)  # corre en segundo plano; no vuelve
+        try:
+            bar = st.progress(0)
+            # Las fichas completas y no solo los puntos: las capas QGIS llevan sus atributos.
+            resultados = procesar_archivos(leer_fichas_hallazgo, [(a.name, a.read()) for a in archivos], workers,
+                                           lambda hechos, total: bar.progress(hechos/total), proyecto=proyecto)
+            fichas, _ = aplanar(resultados)
+            if area is not None:
+                fichas = filtrar(fichas, [f.lon for f in fichas], [f.lat for f in fichas], area)
+                st.caption(f"{len(fichas)} fichas en el área.")
+            puntos = puntos_de_fichas(fichas)
+            if puntos:
+                st.success(f"✅ Se generaron {len(puntos)} puntos.")
+                st.download_button("⬇️ Descargar KMZ", crear_kmz(puntos), "Hallazgos_Georreferenciados.kmz")
+                features = geodatos.features_desde_fichas(fichas)
+                col1, col2 = st.columns(2)
+                if geodatos.hay_flatgeobuf():
+                    col1.download_button("⬇️ Descargar FlatGeobuf (QGIS)", geodatos.crear_flatgeobuf(features), "Hallazgos_Georreferenciados.fgb")
+                if geodatos.hay_geoparquet():
+                    col2.download_button("⬇️ Descargar GeoParquet (QGIS)", geodatos.crear_geoparquet(features), "Hallazgos_Georreferenciados.parquet")
+            else: st.error("No se encontraron coordenadas válidas.")
+        except ImportError: st.error("Falta librería 'pyproj'.")
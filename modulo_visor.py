@@ -0,0 +1,134 @@
+"""
+Visor de Mapa Interactivo: los hallazgos de las fichas sobre Google Satélite, con sus fotos.
+"""
+import os
+import base64
+from xml.sax.saxutils import escape
+
+import streamlit as st
+from extraccion import obtener_puntos_geograficos_con_foto
+from fotos import AlmacenMapa, publicar_fotos, miniatura, huella_puntos
+from indice_espacial import IndicePuntos
+from area_interes import panel_area
+from tiempos import etapa, IMAGENES
+
+# Carpeta que Streamlit sirve en /app/static (server.enableStaticServing en .streamlit/config.toml)
+DIRECTORIO_ESTATICOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+def mostrar_pagina(workers=1, proyecto=None, enviar_trabajo=None):
+    st.title("Visor de Mapa Interactivo")
+    st.markdown("Visualiza los hallazgos en Google Satélite con fotos.")
+
+    try:
+        import folium
+        from streamlit_folium import st_folium
+    except ImportError:
+        st.error("⚠️ Faltan las librerías 'folium' y 'streamlit-folium'.")
+        st.stop()
+
+    archivos = st.file_uploader("Subir Fichas de Hallazgo (.docx)", accept_multiple_files=True, key="mapa_up")
+
+    if 'map_points' not in st.session_state:
+        st.session_state.map_points = None
+
+    if (archivos or proyecto) and st.button("Procesar y Mostrar Mapa"):
+        with st.spinner("Leyendo coordenadas y fotos..."):
+            puntos = obtener_puntos_geograficos_con_foto(archivos, workers, proyecto=proyecto)
+            if puntos:
+                st.session_state.map_points = puntos
+                st.session_state.map_huella = huella_puntos(puntos)
+            else:
+                st.error("No se pudieron extraer datos.")
+
+    @st.cache_resource(max_entries=4)
+    def indice_mapa(huella_mapa, _puntos):
+        return IndicePuntos([p['lon'] for p in _puntos], [p['lat'] for p in _puntos])
+
+    # El mapa armado se guarda entre reruns y solo se rehace si cambian los puntos
+    # (la clave es la huella del conjunto de puntos, no los puntos en sí).
+    @st.cache_resource(max_entries=4, show_spinner="Armando mapa...")
+    def construir_mapa(huella_mapa, _puntos, url_mapa):
+        puntos = _puntos
+        avg_lat = sum(p['lat'] for p in puntos) / len(puntos)
+        avg_lon = sum(p['lon'] for p in puntos) / len(puntos)
+
+        # Mapa base limpio para poner Google Sat
+        m = folium.Map(location=[avg_lat, avg_lon], zoom_start=12, tiles=None)
+
+        # Capa Satélite
+        folium.TileLayer(
+            tiles='https://mt1.google.com/vt/lyrs=s&x={x}&y={y}&z={z}',
+            attr='Google',
+            name='Google Satellite',
+            overlay=False,
+            control=True
+        ).add_to(m)
+
+        # Las fotos se publican como estáticos (miniatura + completa) y el popup solo lleva
+        # las URL: la página no crece con las fotos y cada imagen se pide al abrir su popup.
+        if url_mapa:
+            almacen = AlmacenMapa(os.path.join(DIRECTORIO_ESTATICOS, "mapa"))
+            with etapa(IMAGENES):
+                publicadas = publicar_fotos([p['foto'] for p in puntos], almacen)
+
+        # Una sola capa GeoJSON en lugar de un CircleMarker + Popup por punto: el mapa
+        # serializado es un arreglo de features y los popups se arman al abrirse.
+        features = []
+        for i, p in enumerate(puntos):
+            html = f"<div style='font-family: Arial; width: 200px;'>"
+            html += f"<b>{escape(str(p['nombre']))}</b><br><i style='font-size:12px'>{escape(str(p['desc']))}</i>"
+
+            if url_mapa and publicadas[i]:
+                mini, completa = publicadas[i]
+                html += (f"<br><a href='{url_mapa}{completa}' target='_blank' title='Ver foto completa'>"
+                         f"<img src='{url_mapa}{mini}' loading='lazy' width='100%' style='margin-top:5px; border-radius:5px;'></a>")
+            elif p['foto']:
+                # Sin estáticos habilitados: miniatura incrustada (nunca la foto completa).
+                contenido = miniatura(p['foto'])
+                if contenido:
+                    b64 = base64.b64encode(contenido).decode('utf-8')
+                    html += f"<br><img src='data:image/jpeg;base64,{b64}' width='100%' style='margin-top:5px; border-radius:5px;'>"
+
+            html += "</div>"
+            features.append({
+                "type": "Feature",
+                "properties": {"nombre": str(p['nombre']), "popup": html},
+                "geometry": {"type": "Point", "coordinates": [p['lon'], p['lat']]},
+            })
+
+        # Marcadores como PUNTO ROJO
+        folium.GeoJson(
+            {"type": "FeatureCollection", "features": features},
+            name="Hallazgos",
+            marker=folium.CircleMarker(radius=6, color='red', fill=True, fill_color='red', fill_opacity=1.0),
+            popup=folium.GeoJsonPopup(fields=["popup"], labels=False, max_width=220),
+            tooltip=folium.GeoJsonTooltip(fields=["nombre"], labels=False),
+        ).add_to(m)
+        return m
+
+    if st.session_state.map_points:
+        puntos = st.session_state.map_points
+        st.success(f"✅ Se encontraron {len(puntos)} puntos.")
+
+        url_mapa = None
+        if st.get_option("server.enableStaticServing"):
+            base = st.get_option("server.baseUrlPath").strip("/")
+            url_mapa = f"/{base}/app/static/mapa/" if base else "/app/static/mapa/"
+        if st.session_state.get("map_huella") is None:
+            st.session_state.map_huella = huella_puntos(puntos)
+        huella_mapa = st.session_state.map_huella
+
+        # Filtro por área con el índice espacial (uno por conjunto de puntos, como el mapa).
+        area = panel_area("mapa", [p['lon'] for p in puntos], [p['lat'] for p in puntos])
+
+        if area is not None:
+            puntos = [puntos[i] for i in indice_mapa(huella_mapa, puntos).consultar(area)]
+            huella_mapa = f"{huella_mapa}:{area!r}"
+            st.caption(f"{len(puntos)} puntos en el área.")
+
+        if puntos:
+            m = construir_mapa(huella_mapa, puntos, url_mapa)
+            # returned_objects=[]: mover o hacer zoom no dispara un rerun de la app.
+            st_folium(m, width=900, height=600, returned_objects=[])
+        else:
+            st.warning("No hay puntos en el área elegida.")
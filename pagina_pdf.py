@@ -0,0 +1,80 @@
+"""
+Modelo de una página de PDF extraída una sola vez (PyMuPDF).
+
+procesar_pdf_a_word_map pedía a cada página el texto plano y los bloques por
+separado (dos TextPage) y, para cada foto, recorría todos los bloques armando
+fitz.Rect para encontrar la leyenda más cercana. PaginaPDF saca texto y bloques de
+un solo TextPage, deja los bloques ordenados por posición y arma un índice por
+coordenada Y, así la búsqueda de leyendas es O(log n) por imagen y las
+secciones se consultan al modelo sin volver a recorrer la página.
+"""
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+# `texto` ya viene sin espacios al borde.
+BloquePDF = namedtuple("BloquePDF", ["x0", "y0", "x1", "y1", "texto"])
+
+
+class PaginaPDF:
+    """
+    Texto, bloques e imágenes de una página. Los bloques quedan ordenados de arriba
+    hacia abajo y de izquierda a derecha, como los leía el parser.
+    """
+
+    def __init__(self, pagina):
+        self.pagina = pagina
+        tp = pagina.get_textpage(flags=fitz.TEXTFLAGS_BLOCKS)
+        self.texto = pagina.get_text("text", textpage=tp)
+        crudos = pagina.get_text("blocks", textpage=tp)
+        crudos.sort(key=lambda b: (b[1], b[0]))
+        self.bloques = [BloquePDF(b[0], b[1], b[2], b[3], b[4].strip()) for b in crudos]
+
+        # Índice por Y: los bloques ya están ordenados por y0; para y1 se ordena aparte.
+        self._y0 = [b.y0 for b in self.bloques]
+        por_y1 = sorted(range(len(self.bloques)), key=lambda i: self.bloques[i].y1)
+        self._y1 = [self.bloques[i].y1 for i in por_y1]
+        self._orden_y1 = por_y1
+
+        self._imagenes = None
+
+    def contiene(self, *textos):
+        """True si el texto de la página contiene alguno de `textos`."""
+        return any(t in self.texto for t in textos)
+
+    def buscar(self, *textos):
+        """Índice del primer bloque que contiene alguno de `textos`, o None."""
+        for i, b in enumerate(self.bloques):
+            if any(t in b.texto for t in textos):
+                return i
+        return None
+
+    def cerca_de(self, y0, y1, distancia):
+        """
+        Índices (en orden de lectura) de los bloques cuyo borde superior está a menos
+        de `distancia` del borde inferior (y1) del rectángulo, o cuyo borde inferior
+        está a menos de `distancia` de su borde superior (y0).
+        """
+        candidatos = set(range(bisect_left(self._y0, y1 - distancia), bisect_right(self._y0, y1 + distancia)))
+        candidatos.update(self._orden_y1[bisect_left(self._y1, y0 - distancia):bisect_right(self._y1, y0 + distancia)])
+        return [
+            i for i in sorted(candidatos)
+            if min(abs(self.bloques[i].y0 - y1), abs(y0 - self.bloques[i].y1)) < distancia
+        ]
+
+    def imagenes(self):
+        """Lista completa de imágenes de la página (get_images(full=True))."""
+        if self._imagenes is None:
+            self._imagenes = self.pagina.get_images(full=True)
+        return self._imagenes
+
+    def bbox_imagen(self, item):
+        """
+        Rectángulo donde se dibuja la imagen `item` de imagenes() (el primero, si se
+        dibuja varias veces); si no se dibuja, un rectángulo vacío (1, 1, -1, -1).
+        """
+        return self.pagina.get_image_bbox(item)
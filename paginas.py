@@ -0,0 +1,42 @@
+"""
+Páginas de la app: una por herramienta, cada una en su módulo.
+
+main.py solo arma el menú con PAGINAS; el módulo de la página elegida se importa
+la primera vez que se abre (cargar). Así arrancar la app, o volver a correr el
+script en cada clic, no paga pymupdf, python-docx, pandas, folium y el resto de
+lo que usan las herramientas que no se están usando: cada página carga lo suyo
+una sola vez por proceso.
+"""
+import importlib
+import sys
+import time
+from collections import namedtuple
+
+# herramienta: el nombre en las métricas y en procesar_lote.py. con_fotos: la
+# función recibe además `ajuste_fotos` (las que insertan fotos en el Word).
+Pagina = namedtuple("Pagina", ["titulo", "herramienta", "modulo", "funcion", "con_fotos"])
+
+PAGINAS = [
+    Pagina("Generador Word (MAP)", "map-word", "modulo_anexos", "interfaz_word_map", True),
+    Pagina("Generador Word MAP (Desde PDF)", "map-pdf", "modulo_anexos", "interfaz_pdf_map", True),
+    Pagina("Generador Excel (Desde Word)", "excel-word", "modulo_anexos", "interfaz_excel_word", False),
+    Pagina("Generador Excel y GIS (Recolección Superficial)", "recoleccion", "modulo_recoleccion", "ejecutar_interfaz", False),
+    Pagina("Generador Excel (Fichas de Excavación)", "excavacion", "modulo_excavacion", "ejecutar_interfaz", False),
+    Pagina("Generador Fichas (Desde Word)", "fichas", "modulo_fichas", "interfaz_fichas", True),
+    Pagina("Generador KMZ (Georreferenciación)", "kmz", "modulo_fichas", "interfaz_kmz", False),
+    Pagina("Visor de Mapa Interactivo", "mapa", "modulo_visor", "mostrar_pagina", False),
+    Pagina("Extractor KMZ/KML a Excel", "kmz-excel", "extractor_kmz", "mostrar_pagina", False),
+]
+POR_TITULO = {p.titulo: p for p in PAGINAS}
+
+
+def cargar(pagina):
+    """
+    (función de la página, segundos que tardó en importar su módulo). Los
+    segundos son 0 si el módulo ya estaba cargado en este proceso.
+    """
+    cargado = pagina.modulo in sys.modules
+    inicio = time.perf_counter()
+    # import_module y no sys.modules: si otra sesión lo está importando, espera a que termine.
+    modulo = importlib.import_module(pagina.modulo)
+    return getattr(modulo, pagina.funcion), 0.0 if cargado else time.perf_counter() - inicio
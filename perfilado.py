@@ -0,0 +1,106 @@
+"""
+Perfil de una corrida con cProfile, a pedido.
+
+Los tiempos por etapa (tiempos.py) dicen en qué parte se va el tiempo; cuando un
+archivo puntual tarda mucho (un PDF de 90 s en procesar_pdf_a_word_map) hace falta
+ver qué funciones. Perfil envuelve la corrida en cProfile y entrega las funciones
+que más tiempo consumieron y el perfil crudo (.prof, el formato de pstats que abre
+`snakeviz perfil.prof`).
+
+cProfile mide solo el hilo donde se inició: para que entre la lectura de los
+archivos, la corrida perfilada se hace con un solo proceso (workers=1). La
+reducción de fotos, que corre en otros hilos, aparece como la espera en
+reducir_fotos. Mientras hay un perfil en curso, ejecutor.procesar_archivos no
+usa la caché de fichas (se quiere medir la lectura). Hay un solo perfil a la vez
+por proceso (desde Python 3.12 cProfile no admite dos a la vez).
+"""
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import threading
+from collections import namedtuple
+
+FUNCIONES_POR_DEFECTO = 30
+
+# propio: segundos dentro de la función sin contar lo que llama; acumulado: contándolo.
+Funcion = namedtuple("Funcion", ["funcion", "ubicacion", "llamadas", "propio", "acumulado"])
+
+_candado = threading.Lock()
+_hilo = threading.local()
+
+
+class PerfilOcupado(Exception):
+    """Ya hay otra corrida perfilándose en este proceso."""
+
+
+def perfilando():
+    """Hay un Perfil en curso en este hilo."""
+    return getattr(_hilo, "perfil", None) is not None
+
+
+class Perfil:
+    """Un perfil de cProfile. Se usa como `with Perfil() as perfil:` o con iniciar()/detener()."""
+
+    def __init__(self):
+        self._perfil = cProfile.Profile()
+        self._stats = None
+        self._activo = False
+
+    @classmethod
+    def cargar(cls, ruta):
+        """Un perfil ya guardado (.prof)."""
+        perfil = cls()
+        perfil._stats = pstats.Stats(str(ruta))
+        return perfil
+
+    def iniciar(self):
+        if not _candado.acquire(blocking=False):
+            raise PerfilOcupado("Ya hay otra corrida con perfil en curso en la app.")
+        self._activo = True
+        _hilo.perfil = self
+        self._perfil.enable()
+
+    def detener(self):
+        if self._activo:
+            self._perfil.disable()
+            self._activo = False
+            _hilo.perfil = None
+            _candado.release()
+            self._stats = pstats.Stats(self._perfil)
+
+    def __bool__(self):
+        """Hay un perfil terminado para consultar."""
+        return self._stats is not None
+
+    def __enter__(self):
+        self.iniciar()
+        return self
+
+    def __exit__(self, *exc):
+        self.detener()
+
+    def funciones(self, n=FUNCIONES_POR_DEFECTO, orden="propio"):
+        """Las `n` funciones con más tiempo `orden` ("propio" o "acumulado")."""
+        if not self:
+            return []
+        funciones = [
+            Funcion(nombre, f"{os.path.basename(archivo)}:{linea}" if linea else "(interna)", llamadas, propio, acumulado)
+            for (archivo, linea, nombre), (_, llamadas, propio, acumulado, _) in self._stats.stats.items()
+        ]
+        funciones.sort(key=lambda f: getattr(f, orden), reverse=True)
+        return funciones[:n]
+
+    def crudo(self):
+        """El perfil en el formato de pstats (lo mismo que escribe Stats.dump_stats)."""
+        return marshal.dumps(self._stats.stats) if self else b""
+
+    def guardar(self, ruta):
+        self._stats.dump_stats(str(ruta))
+
+    def texto(self, n=FUNCIONES_POR_DEFECTO, orden="tottime"):
+        """Tabla de pstats (print_stats) para los logs."""
+        salida = io.StringIO()
+        pstats.Stats(self._perfil, stream=salida).sort_stats(orden).print_stats(n)
+        return salida.getvalue()
@@ -0,0 +1,223 @@
+"""
+Motor de plantillas para leer fichas PDF a partir de sus líneas de texto.
+
+Cada tipo de ficha (Recolección Superficial, Excavación, y las de otras consultoras)
+se declara como una Plantilla: qué etiquetas tiene, dónde está el valor de cada una
+(línea siguiente, con saltos de columna, o en la misma línea), bloques de cabecera en
+matriz, tablas por nivel, observaciones, respaldos con regex y etiquetas a descartar.
+
+compilar() arma una sola vez una tabla hash de etiquetas y las regex de prefijos,
+marcadores y respaldos; PlantillaCompilada.extraer() recorre las líneas una sola vez,
+sin que el costo crezca con la cantidad de etiquetas. Un formato nuevo se agrega
+declarando su Plantilla, sin escribir otro parser.
+"""
+import re
+from collections import namedtuple
+
+# Etiqueta en una línea propia; el valor está `desplazamiento` líneas más abajo. Si la
+# línea siguiente es `saltar_si_sigue` (o la anterior es `saltar_si_precede`), las dos
+# columnas vienen juntas y el valor está una línea más abajo. Con prefijo=True la
+# etiqueta encabeza la línea y el valor es el resto (o la línea siguiente si no hay).
+# campo=None reconoce la etiqueta sin tomar nada. Gana la última aparición.
+Etiqueta = namedtuple(
+    "Etiqueta", ["campo", "textos", "desplazamiento", "prefijo", "saltar_si_sigue", "saltar_si_precede"],
+    defaults=(1, False, None, None),
+)
+
+# Cabecera en matriz: primero todas las etiquetas y después todos los valores. Solo se
+# usa si la primera aparición de `ancla` está `distancia` líneas después de la de
+# `desde`; cada valor está `desplazamiento` líneas después de su etiqueta.
+Matriz = namedtuple("Matriz", ["campos", "desde", "ancla", "distancia", "desplazamiento"])
+
+# Tabla con una fila por nivel: la línea que contiene el marcador del nivel va seguida
+# de una línea por columna; el campo es f"{columna}{sufijo}". La fila se acepta si al
+# menos `minimo_numeros` columnas (desde la segunda) son números, o si la primera tiene
+# hasta `largo_primera` caracteres. Gana la primera fila válida de cada nivel.
+Tabla = namedtuple("Tabla", ["filas", "columnas", "excluir", "minimo_numeros", "largo_primera"])
+
+# Observaciones por nivel: línea que contiene `disparador` y alguno de los marcadores
+# del nivel; el texto va después de ":" o en la línea siguiente. Gana la última.
+Observacion = namedtuple("Observacion", ["disparador", "campo", "filas", "excluir_siguiente"])
+
+# Respaldo con regex sobre el texto completo, para campos que quedaron vacíos (o con
+# menos de `largo_minimo` caracteres). `quitar` se borra del valor; si el valor contiene
+# algo de `rechazar`, no se usa.
+Respaldo = namedtuple("Respaldo", ["campo", "patron", "grupo", "quitar", "largo_minimo", "rechazar"],
+                      defaults=(1, "", 1, ()))
+
+# `ignorar`: caracteres que se quitan de una línea antes de compararla con las etiquetas.
+# `descartar`: valores que en realidad son etiquetas y se dejan vacíos al final.
+Plantilla = namedtuple(
+    "Plantilla",
+    ["campos", "etiquetas", "matriz", "tabla", "observacion", "respaldos", "descartar", "ignorar"],
+    defaults=((), None, None, None, (), (), ""),
+)
+
+
+_RE_SEPARADOR = re.compile(r"^[:\-\s]+")
+
+
+def _alternativa(textos):
+    """Regex que encuentra cualquiera de los textos (los más largos primero)."""
+    return re.compile("|".join(re.escape(t) for t in sorted(textos, key=len, reverse=True)))
+
+
+class PlantillaCompilada:
+
+    def __init__(self, plantilla):
+        self.plantilla = p = plantilla
+
+        self._exactas = {}
+        prefijos = {}
+        for regla in p.etiquetas:
+            for texto in regla.textos:
+                (prefijos if regla.prefijo else self._exactas)[texto] = regla
+        self._prefijos = prefijos
+        # Los más largos primero, por si un prefijo contiene a otro.
+        self._largos_prefijo = sorted({len(t) for t in prefijos}, reverse=True)
+
+        self._matriz = {}
+        if p.matriz:
+            for campo, textos in p.matriz.campos:
+                for texto in textos:
+                    self._matriz.setdefault(texto, campo)
+
+        self._re_filas = self._re_excluir = None
+        if p.tabla:
+            self._re_filas = _alternativa([m for m, _ in p.tabla.filas])
+            self._re_excluir = _alternativa(p.tabla.excluir)
+
+        self._respaldos = [(r, re.compile(r.patron)) for r in p.respaldos]
+        self._descartar = frozenset(p.descartar)
+        self._campos_minuscula = {c: c.lower() for c in p.campos}
+
+    def es_etiqueta(self, campo, valor):
+        """True si el valor es en realidad una etiqueta (se descarta)."""
+        limpio = valor.lower().strip()
+        return limpio in self._descartar or limpio == self._campos_minuscula[campo]
+
+    def extraer(self, lineas, texto):
+        """
+        Dict con los campos de la plantilla a partir de las líneas (ya sin espacios al
+        borde ni vacías) y del texto completo (para los respaldos con regex).
+        """
+        p = self.plantilla
+        ficha = dict.fromkeys(p.campos, "")
+        minusculas = [l.lower() for l in lineas]
+        normalizadas = minusculas
+        if p.ignorar:
+            for c in p.ignorar:
+                normalizadas = [l.replace(c, "") for l in normalizadas]
+            normalizadas = [l.strip() for l in normalizadas]
+
+        exactas, prefijos, matriz = self._exactas, self._prefijos, self._matriz
+        filas, observacion = self._re_filas, p.observacion
+        primeras = {}
+
+        for i, clave in enumerate(normalizadas):
+            regla = exactas.get(clave)
+            if regla is not None:
+                self._aplicar_etiqueta(regla, i, lineas, normalizadas, ficha)
+            elif prefijos:
+                for largo in self._largos_prefijo:
+                    regla = prefijos.get(clave[:largo])
+                    if regla is not None:
+                        self._aplicar_prefijo(regla, largo, i, lineas, ficha)
+                        break
+
+            if matriz:
+                campo = matriz.get(clave)
+                if campo is not None and campo not in primeras:
+                    primeras[campo] = i
+
+            if filas is not None and filas.search(minusculas[i]):
+                self._aplicar_tabla(i, minusculas[i], lineas, ficha)
+            if observacion is not None and observacion.disparador in minusculas[i]:
+                self._aplicar_observacion(i, minusculas[i], lineas, ficha)
+
+        if p.matriz:
+            self._aplicar_matriz(primeras, lineas, ficha)
+
+        for regla, patron in self._respaldos:
+            valor = ficha[regla.campo]
+            if valor and len(valor) >= regla.largo_minimo and not self.es_etiqueta(regla.campo, valor):
+                continue
+            m = patron.search(texto)
+            if m:
+                candidato = m.group(regla.grupo) or ""
+                if regla.quitar:
+                    candidato = candidato.replace(regla.quitar, "")
+                candidato = candidato.strip()
+                if candidato and not any(r in candidato.lower() for r in regla.rechazar):
+                    ficha[regla.campo] = candidato
+
+        descartar = self._descartar
+        for campo, valor in ficha.items():
+            limpio = valor.lower().strip()
+            if limpio in descartar or limpio == self._campos_minuscula[campo]:
+                ficha[campo] = ""
+        return ficha
+
+    # --- reglas ---
+
+    @staticmethod
+    def _aplicar_etiqueta(regla, i, lineas, normalizadas, ficha):
+        if regla.campo is None or i + regla.desplazamiento >= len(lineas):
+            return
+        salto = regla.desplazamiento
+        if regla.saltar_si_sigue and normalizadas[i + 1] == regla.saltar_si_sigue:
+            salto += 1
+        elif regla.saltar_si_precede and i > 0 and normalizadas[i - 1] == regla.saltar_si_precede:
+            salto += 1
+        if i + salto < len(lineas):
+            ficha[regla.campo] = lineas[i + salto]
+
+    @staticmethod
+    def _aplicar_prefijo(regla, largo, i, lineas, ficha):
+        if regla.campo is None:
+            return
+        valor = _RE_SEPARADOR.sub("", lineas[i][largo:].strip())
+        if valor:
+            ficha[regla.campo] = valor
+        elif i + 1 < len(lineas):
+            ficha[regla.campo] = lineas[i + 1]
+
+    def _aplicar_tabla(self, i, minuscula, lineas, ficha):
+        tabla = self.plantilla.tabla
+        if self._re_excluir.search(minuscula):
+            return
+        # Si la línea tiene más de un marcador, manda el orden de la plantilla.
+        sufijo = next(s for marcador, s in tabla.filas if marcador in minuscula)
+        ultima = i + len(tabla.columnas)
+        if ultima >= len(lineas) or ficha[f"{tabla.columnas[0]}{sufijo}"]:
+            return
+        valores = lineas[i + 1:ultima + 1]
+        numeros = sum(1 for v in valores[1:] if v.isdigit())
+        if numeros >= tabla.minimo_numeros or len(valores[0]) <= tabla.largo_primera:
+            for columna, valor in zip(tabla.columnas, valores):
+                ficha[f"{columna}{sufijo}"] = valor
+
+    def _aplicar_observacion(self, i, minuscula, lineas, ficha):
+        obs = self.plantilla.observacion
+        sufijo = next((s for marcadores, s in obs.filas if any(m in minuscula for m in marcadores)), None)
+        if sufijo is None:
+            return
+        texto = lineas[i].split(":", 1)[1].strip() if ":" in lineas[i] else ""
+        if not texto and i + 1 < len(lineas):
+            siguiente = lineas[i + 1].lower()
+            if not any(e in siguiente for e in obs.excluir_siguiente):
+                texto = lineas[i + 1].strip()
+        ficha[f"{obs.campo}{sufijo}"] = texto
+
+    def _aplicar_matriz(self, primeras, lineas, ficha):
+        matriz = self.plantilla.matriz
+        desde, ancla = primeras.get(matriz.desde), primeras.get(matriz.ancla)
+        if desde is None or ancla is None or ancla - desde != matriz.distancia:
+            return
+        for campo, i in primeras.items():
+            if i + matriz.desplazamiento < len(lineas):
+                ficha[campo] = lineas[i + matriz.desplazamiento].strip()
+
+
+def compilar(plantilla):
+    return PlantillaCompilada(plantilla)
@@ -0,0 +1,345 @@
+"""
+Procesamiento por lotes desde la línea de comandos (sin Streamlit).
+
+Toma una carpeta con DOCX/PDF/KMZ y escribe en la carpeta de salida los mismos
+Excel, Word, KMZ y GeoJSON que genera la app web. Ejemplos:
+
+    python procesar_lote.py map-word anexos/ -o salida/
+    python procesar_lote.py recoleccion fichas_pdf/ -o salida/ --recursivo
+    python procesar_lote.py fichas anexos_marzo/ -o salida/ --proyecto temporada.sqlite
+    python procesar_lote.py kmz fichas/ -o salida/ --radio -70.65,-33.45,500
+    python procesar_lote.py map-pdf reportes/ -o salida/ --metricas tiempos.jsonl
+    python procesar_lote.py map-pdf lento.pdf_carpeta/ -o salida/ --perfil lento.prof
+"""
+import argparse
+import logging
+import sys
+from contextlib import nullcontext
+from pathlib import Path
+
+import pandas as pd
+
+from extraccion import (
+    procesar_archivo_v12, generar_word_con_formato, procesar_pdf_a_word_map,
+    procesar_word_a_excel, leer_fichas_hallazgo, puntos_de_fichas, crear_doc_tabla_horizontal,
+    ordenar_por_fecha, tabla_hallazgos,
+    dataframe_a_excel,
+)
+from escritor_kml import crear_kmz
+import geodatos
+from ejecutor import procesar_archivos, aplanar, WORKERS_POR_DEFECTO
+from fotos import AjusteFotos, AJUSTE_POR_DEFECTO
+from proyecto import Proyecto, PROYECTO_POR_DEFECTO
+from indice_espacial import Rectangulo, Radio, Cuadrante, filtrar
+from tiempos import medir, resumen, METRICAS_POR_DEFECTO
+from perfilado import Perfil
+
+log = logging.getLogger("procesar_lote")
+
+
+def listar_archivos(carpeta, extensiones, recursivo=False):
+    """
+    (nombre, ruta) de los archivos de `carpeta` con alguna de las extensiones, en
+    orden alfabético. El nombre es la ruta relativa a la carpeta ("dia1/Ficha.docx"
+    con subcarpetas): dos archivos con el mismo nombre en subcarpetas distintas no
+    se confunden en la caché ni en el proyecto.
+    """
+    patron = "**/*" if recursivo else "*"
+    carpeta = Path(carpeta)
+    return [
+        (p.relative_to(carpeta).as_posix(), p) for p in sorted(carpeta.glob(patron))
+        if p.is_file() and p.suffix.lower() in extensiones and not p.name.startswith("~$")
+    ]
+
+
+def extraer_lote(archivos, parser, workers=1, usar_cache=True, proyecto=None, trabajo=None):
+    """
+    Aplica `parser(bytes, nombre)` a cada (nombre, ruta) de listar_archivos y junta
+    los resultados en una lista. Con `proyecto`, solo se parsean los archivos nuevos
+    o cambiados y se devuelven los resultados de todo el proyecto. Con `trabajo`
+    (trabajos.Trabajo), el avance y lo leído de cada archivo van al trabajo, que
+    puede cortar el lote si se cancela.
+    """
+    def progreso(hechos, total):
+        log.info("[%d/%d] archivos procesados", hechos, total)
+        if trabajo is not None:
+            trabajo.avance(hechos, total)
+
+    # Se pasan rutas y no bytes: cada trabajador lee su propio archivo.
+    resultados = procesar_archivos(parser, archivos, workers, progreso, usar_cache, proyecto,
+                                   parcial=trabajo.parcial if trabajo is not None else None)
+    if proyecto is not None:
+        log.info("Proyecto %s: %s", proyecto.ruta, proyecto.ultimo_ingreso.texto())
+    valores, errores = aplanar(resultados)
+    for e in errores:
+        log.error("%s", e)
+    return valores
+
+
+def escribir(salida, nombre, datos):
+    ruta = Path(salida) / nombre
+    if hasattr(datos, "getvalue"):
+        datos = datos.getvalue()
+    if isinstance(datos, str):
+        datos = datos.encode("utf-8")
+    ruta.write_bytes(datos)
+    log.info("Escrito %s", ruta)
+
+
+def escribir_kmz(salida, nombre, puntos):
+    # El KMZ se escribe en streaming directo al archivo, sin armarlo en memoria.
+    ruta = Path(salida) / nombre
+    crear_kmz(puntos, ruta)
+    log.info("Escrito %s", ruta)
+
+
+def escribir_excel(salida, nombre, df, hoja, **opciones):
+    # Igual que el KMZ: la planilla va en streaming directo al archivo.
+    ruta = Path(salida) / nombre
+    dataframe_a_excel(df, hoja, destino=ruta, **opciones)
+    log.info("Escrito %s", ruta)
+
+
+def escribir_capas_qgis(salida, base, features):
+    """FlatGeobuf y GeoParquet con índice espacial, si están instaladas sus librerías."""
+    for extension, disponible, crear in (
+        ("fgb", geodatos.hay_flatgeobuf(), geodatos.crear_flatgeobuf),
+        ("parquet", geodatos.hay_geoparquet(), geodatos.crear_geoparquet),
+    ):
+        ruta = Path(salida) / f"{base}.{extension}"
+        if not disponible:
+            log.warning("Se omite %s (falta pyogrio/pyarrow)", ruta.name)
+            continue
+        crear(features, ruta)
+        log.info("Escrito %s", ruta)
+
+
+# --- Herramientas (mismas salidas que la app) ---
+
+def lote_map_word(archivos, salida, workers=1, usar_cache=True, ajuste_fotos=None, proyecto=None, trabajo=None):
+    todas = extraer_lote(archivos, procesar_archivo_v12, workers, usar_cache, proyecto, trabajo)
+    if not todas:
+        return False
+    ordenar_por_fecha(todas)
+    escribir(salida, "Resumen_MAP.docx", generar_word_con_formato(todas, ajuste_fotos))
+    return True
+
+
+def lote_map_pdf(archivos, salida, workers=1, usar_cache=True, ajuste_fotos=None, proyecto=None, trabajo=None):
+    todas = extraer_lote(archivos, procesar_pdf_a_word_map, workers, usar_cache, proyecto, trabajo)
+    if not todas:
+        return False
+    ordenar_por_fecha(todas)
+    escribir(salida, "Resumen_MAP_Desde_PDF.docx", generar_word_con_formato(todas, ajuste_fotos))
+    return True
+
+
+def lote_excel_word(archivos, salida, workers=1, usar_cache=True, proyecto=None, trabajo=None):
+    registros = extraer_lote(archivos, procesar_word_a_excel, workers, usar_cache, proyecto, trabajo)
+    if not registros:
+        return False
+    escribir_excel(salida, "Resumen_Word_Excel.xlsx", pd.DataFrame(registros), "Resumen")
+    return True
+
+
+def lote_fichas(archivos, salida, workers=1, usar_cache=True, ajuste_fotos=None, proyecto=None, area=None, trabajo=None):
+    fichas = extraer_lote(archivos, leer_fichas_hallazgo, workers, usar_cache, proyecto, trabajo)
+    if area is not None:
+        fichas = filtrar(fichas, [f.lon for f in fichas], [f.lat for f in fichas], area)
+    if not fichas:
+        return False
+    datos = [f.como_fila() for f in fichas]
+    escribir_excel(salida, "Base_Datos_Hallazgos.xlsx", tabla_hallazgos(datos), "Hallazgos")
+    escribir(salida, "Fichas_Con_Fotos.docx", crear_doc_tabla_horizontal(datos, ajuste_fotos))
+    return True
+
+
+def lote_kmz(archivos, salida, workers=1, usar_cache=True, proyecto=None, area=None, trabajo=None):
+    # Mismo parser que "fichas": la caché sirve para las dos herramientas.
+    fichas = [f for f in extraer_lote(archivos, leer_fichas_hallazgo, workers, usar_cache, proyecto, trabajo)
+              if f.lat is not None]
+    if area is not None:
+        fichas = filtrar(fichas, [f.lon for f in fichas], [f.lat for f in fichas], area)
+    if not fichas:
+        return False
+    escribir_kmz(salida, "Hallazgos_Georreferenciados.kmz", puntos_de_fichas(fichas))
+    escribir_capas_qgis(salida, "Hallazgos_Georreferenciados", geodatos.features_desde_fichas(fichas))
+    return True
+
+
+def lote_recoleccion(archivos, salida, workers=1, usar_cache=True, proyecto=None, area=None, trabajo=None):
+    from recoleccion import (
+        COLUMNAS_RECOLECCION, procesar_pdf_recoleccion_regex_gis,
+        construir_capas_gis, crear_geojson, coordenadas_fichas,
+    )
+    fichas = extraer_lote(archivos, procesar_pdf_recoleccion_regex_gis, workers, usar_cache, proyecto, trabajo)
+    if area is not None:
+        fichas = filtrar(fichas, *coordenadas_fichas(fichas), area)
+    if not fichas:
+        return False
+    df = pd.DataFrame(fichas)[COLUMNAS_RECOLECCION]
+    escribir_excel(salida, "Base_Datos_Recoleccion_Superficial.xlsx", df, "Hallazgos Previstos")
+    puntos_kml, features_geojson = construir_capas_gis(fichas)
+    if puntos_kml:
+        escribir_kmz(salida, "Geometrias_Recoleccion.kmz", puntos_kml)
+        escribir(salida, "Geometrias_Recoleccion.geojson", crear_geojson(features_geojson))
+        escribir_capas_qgis(salida, "Geometrias_Recoleccion", features_geojson)
+    return True
+
+
+def lote_excavacion(archivos, salida, workers=1, usar_cache=True, proyecto=None, trabajo=None):
+    from excavacion import extraer_datos_excavacion, excel_excavacion
+    fichas = extraer_lote(archivos, extraer_datos_excavacion, workers, usar_cache, proyecto, trabajo)
+    if not fichas:
+        return False
+    ruta = Path(salida) / "Base_Datos_Excavacion.xlsx"
+    excel_excavacion(fichas, ruta)
+    log.info("Escrito %s", ruta)
+    return True
+
+
+def lote_kmz_excel(archivos, salida, workers=1, usar_cache=True, proyecto=None, area=None, trabajo=None):
+    from kml import COLUMNAS_KMZ, FORMATOS_KMZ, extraer_puntos_archivo, coordenadas_puntos
+    puntos = extraer_lote(archivos, extraer_puntos_archivo, workers, usar_cache, proyecto, trabajo)
+    if area is not None:
+        puntos = filtrar(puntos, *coordenadas_puntos(puntos), area)
+    if not puntos:
+        return False
+    df = pd.DataFrame(puntos)[COLUMNAS_KMZ]
+    escribir_excel(salida, "Coordenadas_Extraidas_UTM_19.xlsx", df, "Coordenadas_UTM_19S", formatos=FORMATOS_KMZ)
+    return True
+
+
+# Herramientas que insertan fotos en un Word (aceptan ajuste_fotos).
+CON_FOTOS = {"map-word", "map-pdf", "fichas"}
+# Herramientas con puntos georreferenciados (aceptan un área de interés).
+CON_AREA = {"fichas", "kmz", "recoleccion", "kmz-excel"}
+
+# nombre -> (función, extensiones de entrada, ayuda)
+HERRAMIENTAS = {
+    "map-word": (lote_map_word, {".docx"}, "Resumen MAP en Word desde anexos DOCX"),
+    "map-pdf": (lote_map_pdf, {".pdf"}, "Resumen MAP en Word desde reportes PDF"),
+    "excel-word": (lote_excel_word, {".docx"}, "Excel de actividades desde anexos DOCX"),
+    "fichas": (lote_fichas, {".docx"}, "Excel y Word de Fichas de Hallazgo DOCX"),
+    "kmz": (lote_kmz, {".docx"}, "KMZ georreferenciado desde Fichas de Hallazgo DOCX"),
+    "recoleccion": (lote_recoleccion, {".pdf"}, "Excel, KMZ y GeoJSON de Recolección Superficial PDF"),
+    "excavacion": (lote_excavacion, {".pdf"}, "Excel de Fichas de Excavación PDF"),
+    "kmz-excel": (lote_kmz_excel, {".kmz", ".kml"}, "Excel UTM 19S desde KMZ/KML"),
+}
+
+
+def lote_en_trabajo(trabajo, herramienta, workers=1, perfilar=False, **opciones):
+    """
+    Corre una herramienta como trabajo en segundo plano (trabajos.ColaTrabajos.enviar):
+    lee los archivos de la carpeta de entrada del trabajo y escribe en la de salida.
+    Los tiempos por etapa quedan en el trabajo, aunque se cancele o falle. Con
+    `perfilar`, corre en un solo proceso y deja el perfil en `trabajo.perfil`.
+    """
+    funcion, extensiones, _ = HERRAMIENTAS[herramienta]
+    archivos = listar_archivos(trabajo.entrada, extensiones)
+    perfil = Perfil() if perfilar else None
+    try:
+        with medir(herramienta) as medicion, perfil if perfil is not None else nullcontext():
+            try:
+                return funcion(archivos, trabajo.salida, 1 if perfilar else workers, trabajo=trabajo, **opciones)
+            finally:
+                trabajo.tiempos = medicion.tiempos()
+    finally:
+        if perfil:
+            perfil.guardar(trabajo.perfil)
+
+
+def _numeros(texto, cantidades):
+    try:
+        valores = [float(v) for v in texto.split(",")]
+    except ValueError:
+        valores = []
+    if len(valores) not in cantidades:
+        raise argparse.ArgumentTypeError(f"se esperaban {' o '.join(map(str, cantidades))} números separados por coma")
+    return valores
+
+
+def construir_parser():
+    parser = argparse.ArgumentParser(
+        description="Procesa una carpeta de fichas sin la interfaz web.",
+        epilog="herramientas:\n" + "\n".join(f"  {k:<12} {v[2]}" for k, v in sorted(HERRAMIENTAS.items())),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("herramienta", choices=sorted(HERRAMIENTAS), help="Herramienta a ejecutar.")
+    parser.add_argument("carpeta", help="Carpeta con los archivos de entrada.")
+    parser.add_argument("-o", "--salida", default=".", help="Carpeta donde se escriben los resultados (por defecto la actual).")
+    parser.add_argument("-j", "--workers", type=int, default=WORKERS_POR_DEFECTO,
+                        help=f"Procesos en paralelo (por defecto {WORKERS_POR_DEFECTO}).")
+    parser.add_argument("--sin-cache", action="store_true", help="No usar ni actualizar la caché de fichas ya leídas.")
+    parser.add_argument("-p", "--proyecto", default=PROYECTO_POR_DEFECTO or None,
+                        help="Base SQLite del proyecto: solo se leen los archivos nuevos o cambiados y las "
+                             "salidas incluyen todo lo ingresado antes (por defecto ARQUEOLOGIA_PROYECTO).")
+    parser.add_argument("--dpi", type=int, default=AJUSTE_POR_DEFECTO.dpi,
+                        help=f"Resolución de las fotos en los Word; 0 inserta las originales (por defecto {AJUSTE_POR_DEFECTO.dpi}).")
+    parser.add_argument("--calidad", type=int, default=AJUSTE_POR_DEFECTO.calidad,
+                        help=f"Calidad JPEG de las fotos reducidas, 1-95 (por defecto {AJUSTE_POR_DEFECTO.calidad}).")
+    parser.add_argument("-r", "--recursivo", action="store_true", help="Incluir subcarpetas.")
+    area = parser.add_mutually_exclusive_group()
+    area.add_argument("--bbox", metavar="LON_MIN,LAT_MIN,LON_MAX,LAT_MAX",
+                      type=lambda t: Rectangulo(*_numeros(t, [4])),
+                      help="Solo los puntos dentro del rectángulo (grados WGS84).")
+    area.add_argument("--radio", metavar="LON,LAT,METROS", type=lambda t: Radio(*_numeros(t, [3])),
+                      help="Solo los puntos a menos de METROS del punto dado.")
+    area.add_argument("--cuadrante", metavar="ESTE,NORTE,LADO[,HUSO]",
+                      type=lambda t: Cuadrante(*_numeros(t, [3, 4])),
+                      help="Solo los puntos del cuadrado UTM de LADO metros que contiene ESTE,NORTE "
+                           "(grilla alineada a múltiplos de LADO; huso 18 por defecto).")
+    parser.add_argument("--metricas", metavar="RUTA", default=METRICAS_POR_DEFECTO,
+                        help="Agregar los tiempos por etapa y por archivo como JSON-lines a RUTA ('-' para "
+                             "stderr; por defecto ARQUEOLOGIA_METRICAS).")
+    parser.add_argument("--perfil", metavar="RUTA.prof",
+                        help="Perfilar la corrida con cProfile (en un solo proceso y sin caché), guardar el "
+                             "perfil en RUTA (para snakeviz) y mostrar las funciones que más tardaron.")
+    parser.add_argument("-q", "--silencioso", action="store_true", help="Mostrar solo errores.")
+    return parser
+
+
+def main(argv=None):
+    args = construir_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.ERROR if args.silencioso else logging.INFO,
+        format="%(levelname)s %(message)s",
+    )
+
+    funcion, extensiones, _ = HERRAMIENTAS[args.herramienta]
+    archivos = listar_archivos(args.carpeta, extensiones, args.recursivo)
+    # Con proyecto, una carpeta sin archivos nuevos igual genera las salidas de lo ingresado.
+    if not archivos and not args.proyecto:
+        log.error("No hay archivos %s en %s", "/".join(sorted(extensiones)), args.carpeta)
+        return 1
+
+    Path(args.salida).mkdir(parents=True, exist_ok=True)
+    opciones = {}
+    if args.herramienta in CON_FOTOS:
+        opciones["ajuste_fotos"] = AjusteFotos(max(0, args.dpi), min(95, max(1, args.calidad)))
+    area = args.bbox or args.radio or args.cuadrante
+    if area is not None:
+        if args.herramienta not in CON_AREA:
+            log.error("--bbox/--radio/--cuadrante solo sirven con %s", ", ".join(sorted(CON_AREA)))
+            return 1
+        opciones["area"] = area
+    if args.proyecto:
+        opciones["proyecto"] = Proyecto(args.proyecto)
+    # cProfile mide solo este proceso: con --perfil, los archivos se leen acá.
+    perfil = Perfil() if args.perfil else None
+    workers = 1 if args.perfil else max(1, args.workers)
+    with medir(args.herramienta, args.metricas) as medicion, perfil if perfil is not None else nullcontext():
+        hay_datos = funcion(archivos, args.salida, workers, not args.sin_cache, **opciones)
+    if medicion:
+        log.info("Tiempos (%.2f s): %s", medicion.segundos, resumen(medicion))
+    if perfil:
+        perfil.guardar(args.perfil)
+        log.info("Perfil en %s\n%s", args.perfil, perfil.texto(20))
+    if not hay_datos:
+        log.error("No se encontraron datos válidos.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
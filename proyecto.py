@@ -0,0 +1,302 @@
+"""
+Proyecto: base SQLite local con todo lo leído durante una campaña.
+
+Sin proyecto, cada corrida parte de cero y hay que volver a subir (y parsear) todos
+los anexos y fichas de la temporada. Con un proyecto abierto, cada archivo queda
+registrado por herramienta (parser) y nombre, con el SHA-256 de su contenido y la
+VERSION_PARSER con que se leyó. Al subir un lote solo se parsean los archivos nuevos,
+los que cambiaron y los leídos con una versión anterior del parser; las salidas
+(Excel, Word, KMZ, mapa) se arman con todos los archivos del proyecto.
+
+Tablas:
+
+- archivos: parser, nombre, huella, versión, error de lectura y fecha de ingreso;
+- registros: una fila por elemento que devolvió el parser (ficha MAP, FichaHallazgo,
+  ficha de recolección, fila de excavación, punto de KMZ), como pickle y en orden;
+- fotos: el contenido de cada foto una sola vez (por SHA-256), y referencias_foto
+  qué archivos la usan. El almacén de fotos de fotos.py es una caché que se desaloja:
+  si una foto ya no está ahí, se restaura desde el proyecto al leer los registros.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+
+from cache_fichas import huella, version_parser
+from ejecutor import ResultadoArchivo
+from fotos import FotoDiferida, almacen_por_defecto, fotos_en
+
+# Ruta del proyecto que abren la app y procesar_lote.py si no se indica otra.
+PROYECTO_POR_DEFECTO = os.environ.get("ARQUEOLOGIA_PROYECTO", "")
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS archivos (
+    id INTEGER PRIMARY KEY,
+    parser TEXT NOT NULL,
+    nombre TEXT NOT NULL,
+    huella TEXT NOT NULL,
+    version TEXT NOT NULL,
+    error TEXT,
+    ingresado TEXT NOT NULL,
+    UNIQUE (parser, nombre)
+);
+CREATE INDEX IF NOT EXISTS archivos_huella ON archivos (parser, huella);
+CREATE TABLE IF NOT EXISTS registros (
+    archivo_id INTEGER NOT NULL REFERENCES archivos (id) ON DELETE CASCADE,
+    orden INTEGER NOT NULL,
+    valor BLOB NOT NULL,
+    PRIMARY KEY (archivo_id, orden)
+);
+CREATE TABLE IF NOT EXISTS fotos (
+    clave TEXT PRIMARY KEY,
+    datos BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS referencias_foto (
+    archivo_id INTEGER NOT NULL REFERENCES archivos (id) ON DELETE CASCADE,
+    clave TEXT NOT NULL,
+    PRIMARY KEY (archivo_id, clave)
+);
+CREATE INDEX IF NOT EXISTS referencias_foto_clave ON referencias_foto (clave);
+"""
+
+
+class Ingreso(namedtuple("Ingreso", ["nuevos", "cambiados", "sin_cambios", "repetidos", "renombrados"],
+                         defaults=(0,))):
+    """Cuántos archivos de un lote se parsearon y cuántos ya estaban en el proyecto."""
+    __slots__ = ()
+
+    def texto(self):
+        partes = [f"{self.nuevos} nuevos", f"{self.cambiados} cambiados", f"{self.sin_cambios} sin cambios"]
+        if self.repetidos:
+            partes.append(f"{self.repetidos} repetidos con otro nombre")
+        if self.renombrados:
+            partes.append(f"{self.renombrados} renombrados por tener el mismo nombre que otro del lote")
+        return ", ".join(partes)
+
+
+# Un archivo del proyecto, para listarlo (sin sus registros).
+ArchivoProyecto = namedtuple("ArchivoProyecto", ["parser", "nombre", "huella", "error", "ingresado", "registros"])
+
+
+def clave_parser(parser):
+    """Herramienta a la que pertenece un archivo: el parser sin su versión."""
+    return f"{parser.__module__}.{parser.__qualname__}"
+
+
+def _nombre_libre(nombre, usados):
+    """'Ficha.docx' -> 'Ficha (2).docx' (o (3), ...): el primero que no esté en `usados`."""
+    raiz, extension = os.path.splitext(nombre)
+    n = 2
+    while f"{raiz} ({n}){extension}" in usados:
+        n += 1
+    return f"{raiz} ({n}){extension}"
+
+
+def _elementos(valor):
+    """Lo que aplanar() toma de un resultado: los elementos de una lista, o el valor solo."""
+    if isinstance(valor, list):
+        return valor
+    return [valor] if valor else []
+
+
+def _cambiar_fotos(valor, cambiar):
+    """Copia de un resultado de parser con cada FotoDiferida reemplazada por cambiar(foto)."""
+    if isinstance(valor, FotoDiferida):
+        return cambiar(valor)
+    if isinstance(valor, dict):
+        return {k: _cambiar_fotos(v, cambiar) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_cambiar_fotos(v, cambiar) for v in valor]
+    if isinstance(valor, tuple):
+        elementos = [_cambiar_fotos(v, cambiar) for v in valor]
+        return valor._make(elementos) if hasattr(valor, "_make") else tuple(elementos)
+    return valor
+
+
+class Proyecto:
+    """
+    Base de un proyecto. `ingresar` registra un lote y devuelve los resultados de todo
+    el proyecto para esa herramienta; ejecutor.procesar_archivos(..., proyecto=) lo usa.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = Path(ruta)
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        # La app de Streamlit usa el proyecto desde distintos hilos (uno por rerun y
+        # sesión): una sola conexión, y cada operación con el candado tomado.
+        self._con = sqlite3.connect(str(self.ruta), check_same_thread=False)
+        self._candado = threading.RLock()
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute("PRAGMA foreign_keys=ON")
+        self._con.executescript(_ESQUEMA)
+        self.ultimo_ingreso = None
+
+    def cerrar(self):
+        self._con.close()
+
+    # --- ingreso ---
+
+    def ingresar(self, parser, archivos, procesar):
+        """
+        Registra `archivos` (lista de (nombre, datos), con datos en bytes o como Path)
+        leídos con `parser`. `procesar(pendientes)` parsea solo los nuevos o cambiados y
+        devuelve sus ResultadoArchivo. Un archivo con el mismo contenido que otro ya
+        ingresado con otro nombre no se vuelve a agregar. Si en el lote vienen dos
+        archivos distintos con el mismo nombre (de carpetas distintas), el segundo se
+        ingresa como "nombre (2).ext" en lugar de pisar al primero. Deja el resumen en
+        `ultimo_ingreso` y devuelve los ResultadoArchivo de todo el proyecto.
+        """
+        clave, version = clave_parser(parser), version_parser(parser)
+        conocidos, por_huella = {}, {}
+        with self._candado:
+            for nombre, h, v in self._con.execute(
+                    "SELECT nombre, huella, version FROM archivos WHERE parser = ?", (clave,)):
+                conocidos[nombre] = (h, v)
+                por_huella[h] = nombre
+
+        pendientes, huellas = [], {}
+        en_lote = {}  # nombre -> huella de los archivos de este lote
+        nuevos = cambiados = sin_cambios = repetidos = renombrados = 0
+        for nombre, datos in archivos:
+            h = huella(datos.read_bytes() if isinstance(datos, Path) else datos)
+            if nombre in en_lote:
+                if en_lote[nombre] == h:
+                    repetidos += 1
+                    continue
+                nombre = _nombre_libre(nombre, en_lote)
+                renombrados += 1
+            en_lote[nombre] = h
+            previo = conocidos.get(nombre)
+            if previo == (h, version):
+                sin_cambios += 1
+            elif previo is None and por_huella.get(h, nombre) != nombre:
+                repetidos += 1
+            else:
+                if previo is None:
+                    nuevos += 1
+                else:
+                    cambiados += 1
+                pendientes.append((nombre, datos))
+                huellas[nombre] = h
+                por_huella[h] = nombre
+
+        # El parseo va sin el candado: puede tardar minutos.
+        for r in (procesar(pendientes) if pendientes else []):
+            with self._candado:
+                self._guardar(clave, version, huellas[r.nombre], r)
+        self.ultimo_ingreso = Ingreso(nuevos, cambiados, sin_cambios, repetidos, renombrados)
+        return self.resultados(parser)
+
+    def _guardar(self, clave, version, h, resultado):
+        """Reemplaza lo guardado de un archivo por su nuevo ResultadoArchivo."""
+        elementos = [] if resultado.error else _elementos(resultado.valor)
+        fotos = {f.clave: f for f in fotos_en(elementos)}
+        ahora = datetime.now().isoformat(timespec="seconds")
+        with self._con:
+            fila = self._con.execute(
+                "SELECT id FROM archivos WHERE parser = ? AND nombre = ?", (clave, resultado.nombre)).fetchone()
+            viejas = []
+            if fila:
+                archivo_id = fila[0]
+                viejas = [c for (c,) in self._con.execute(
+                    "SELECT clave FROM referencias_foto WHERE archivo_id = ?", (archivo_id,))]
+                self._con.execute("DELETE FROM registros WHERE archivo_id = ?", (archivo_id,))
+                self._con.execute("DELETE FROM referencias_foto WHERE archivo_id = ?", (archivo_id,))
+                self._con.execute(
+                    "UPDATE archivos SET huella = ?, version = ?, error = ?, ingresado = ? WHERE id = ?",
+                    (h, version, resultado.error, ahora, archivo_id))
+            else:
+                archivo_id = self._con.execute(
+                    "INSERT INTO archivos (parser, nombre, huella, version, error, ingresado) VALUES (?, ?, ?, ?, ?, ?)",
+                    (clave, resultado.nombre, h, version, resultado.error, ahora)).lastrowid
+
+            self._con.executemany(
+                "INSERT INTO registros (archivo_id, orden, valor) VALUES (?, ?, ?)",
+                ((archivo_id, i, pickle.dumps(e, protocol=pickle.HIGHEST_PROTOCOL)) for i, e in enumerate(elementos)))
+            for foto_clave, foto in fotos.items():
+                if not self._tiene_foto(foto_clave):
+                    try:
+                        self._con.execute("INSERT INTO fotos (clave, datos) VALUES (?, ?)", (foto_clave, foto.leer()))
+                    except OSError:
+                        continue  # ya no está en el almacén; se verá como foto faltante
+                self._con.execute(
+                    "INSERT OR IGNORE INTO referencias_foto (archivo_id, clave) VALUES (?, ?)", (archivo_id, foto_clave))
+            self._borrar_fotos_sin_uso(viejas)
+
+    def _tiene_foto(self, clave):
+        return self._con.execute("SELECT 1 FROM fotos WHERE clave = ?", (clave,)).fetchone() is not None
+
+    def _borrar_fotos_sin_uso(self, claves):
+        self._con.executemany(
+            "DELETE FROM fotos WHERE clave = ? AND NOT EXISTS (SELECT 1 FROM referencias_foto WHERE clave = ?)",
+            ((c, c) for c in claves))
+
+    # --- lectura ---
+
+    def resultados(self, parser):
+        """ResultadoArchivo de cada archivo del proyecto leído con `parser`, por nombre."""
+        with self._candado:
+            return self._resultados(clave_parser(parser))
+
+    def _resultados(self, clave):
+        archivos = self._con.execute(
+            "SELECT id, nombre, error FROM archivos WHERE parser = ? ORDER BY nombre", (clave,)).fetchall()
+        elementos = {archivo_id: [] for archivo_id, _, _ in archivos}
+        ilegibles = set()
+        for archivo_id, valor in self._con.execute(
+                "SELECT r.archivo_id, r.valor FROM registros r JOIN archivos a ON a.id = r.archivo_id "
+                "WHERE a.parser = ? ORDER BY r.archivo_id, r.orden", (clave,)):
+            try:
+                elementos[archivo_id].append(pickle.loads(valor))
+            except Exception:
+                # Guardado con una versión del código que ya no se puede leer.
+                ilegibles.add(archivo_id)
+
+        restauradas = {}
+        resultados = []
+        for archivo_id, nombre, error in archivos:
+            if archivo_id in ilegibles:
+                error = f"Error leyendo {nombre} del proyecto: vuelve a subir el archivo."
+                self._con.execute("UPDATE archivos SET version = '' WHERE id = ?", (archivo_id,))
+                self._con.commit()
+            valor = elementos[archivo_id]
+            if not all(f.disponible() for f in fotos_en(valor)):
+                valor = _cambiar_fotos(valor, lambda f: self._restaurar_foto(f, restauradas))
+            resultados.append(ResultadoArchivo(nombre, None if error else valor, error))
+        return resultados
+
+    def _restaurar_foto(self, foto, restauradas):
+        """La foto de vuelta en el almacén de fotos desde el proyecto (si el almacén la desalojó)."""
+        if foto.disponible():
+            return foto
+        if foto.clave not in restauradas:
+            fila = self._con.execute("SELECT datos FROM fotos WHERE clave = ?", (foto.clave,)).fetchone()
+            restauradas[foto.clave] = almacen_por_defecto().guardar(fila[0]) if fila else foto
+        return restauradas[foto.clave]
+
+    # --- administración ---
+
+    def archivos(self):
+        """ArchivoProyecto de todos los archivos, por herramienta y nombre."""
+        with self._candado:
+            return [ArchivoProyecto(*fila) for fila in self._con.execute(
+                "SELECT a.parser, a.nombre, a.huella, a.error, a.ingresado, "
+                "(SELECT COUNT(*) FROM registros r WHERE r.archivo_id = a.id) "
+                "FROM archivos a ORDER BY a.parser, a.nombre")]
+
+    def quitar(self, parser, nombre):
+        """Saca un archivo del proyecto (con sus registros y las fotos que solo usaba él)."""
+        clave = parser if isinstance(parser, str) else clave_parser(parser)
+        with self._candado, self._con:
+            fila = self._con.execute(
+                "SELECT id FROM archivos WHERE parser = ? AND nombre = ?", (clave, nombre)).fetchone()
+            if fila is None:
+                return False
+            viejas = [c for (c,) in self._con.execute(
+                "SELECT clave FROM referencias_foto WHERE archivo_id = ?", (fila[0],))]
+            self._con.execute("DELETE FROM archivos WHERE id = ?", (fila[0],))
+            self._borrar_fotos_sin_uso(viejas)
+        return True
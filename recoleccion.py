@@ -0,0 +1,159 @@
+"""
+Extracción de Fichas de Recolección Superficial (PDF) y armado de capas GIS,
+sin dependencia de Streamlit. La interfaz vive en modulo_recoleccion.py.
+"""
+import json
+import numpy as np
+from coordenadas import HUSO_POR_DEFECTO, detectar_huso, utm_a_wgs84
+from extraccion import ErrorLectura
+from plantillas_pdf import Plantilla, Etiqueta, Respaldo, compilar
+from tiempos import etapa, EXPORTACION
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+# Subir al cambiar lo que devuelven los parsers de este módulo (invalida cache_fichas).
+VERSION_PARSER = 3
+
+COLUMNAS_RECOLECCION = [
+    "Responsable", "Sitio", "Hallazgo Previsto", "Cuadrante",
+    "Dimensión", "Fecha", "UTM Norte", "UTM Este", "Material", "Superficie"
+]
+
+# --- Funciones Auxiliares solo para este módulo ---
+def limpiar_coordenada(texto):
+    texto_limpio = str(texto).replace(".", "").replace(" ", "").strip()
+    texto_limpio = texto_limpio.replace(",", ".")
+    try:
+        return float(texto_limpio)
+    except:
+        return None
+
+ETIQUETAS_DESCARTAR = [
+    "sitio", "responsable", "cuadrante", "dimensión", "dimension", "fecha", "material", "superficie",
+    "coordenadas", "identificación", "procedencia y material cultural",
+]
+
+# Cada etiqueta va en su línea y el valor en la siguiente; "Material" y "Superficie"
+# a veces vienen juntas (las dos etiquetas y después los dos valores).
+PLANTILLA_RECOLECCION = compilar(Plantilla(
+    campos=COLUMNAS_RECOLECCION,
+    etiquetas=[
+        Etiqueta("Responsable", ["responsable"]),
+        Etiqueta("Sitio", ["sitio"]),
+        Etiqueta(None, ["hallazgo previsto"]),  # Se captura con Regex abajo por seguridad
+        Etiqueta("Cuadrante", ["cuadrante"]),
+        Etiqueta("Dimensión", ["dimensión", "dimension"]),
+        Etiqueta("Fecha", ["fecha"]),
+        Etiqueta("Material", ["material"], saltar_si_sigue="superficie"),
+        Etiqueta("Superficie", ["superficie"], saltar_si_precede="material"),
+        Etiqueta("UTM Norte", ["utm norte"], prefijo=True),
+        Etiqueta("UTM Este", ["utm este"], prefijo=True),
+    ],
+    respaldos=[
+        Respaldo("Fecha", r"(\d{2}/\d{2}/\d{4})"),
+        Respaldo("Hallazgo Previsto", r"(HLU_HP_\d+|HP_\d+)", largo_minimo=4),
+    ],
+    descartar=ETIQUETAS_DESCARTAR,
+    ignorar=":",
+))
+
+
+def procesar_pdf_recoleccion_regex_gis(pdf_bytes, nombre_archivo):
+    if fitz is None:
+        raise ErrorLectura("Falta instalar la librería 'pymupdf'.")
+    try:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    except Exception as e:
+        raise ErrorLectura(f"Error abriendo PDF {nombre_archivo}: {e}")
+
+    fichas = []
+
+    for pagina in doc:
+        texto_completo = pagina.get_text("text")
+        # Leemos línea por línea
+        lineas = [l.strip() for l in texto_completo.split('\n') if l.strip()]
+        
+        if len(lineas) < 10:
+            continue
+
+        ficha = PLANTILLA_RECOLECCION.extraer(lineas, texto_completo)
+
+        # Huso UTM impreso en la ficha ("Huso 19", "19 H"...); vacío = huso por defecto
+        ficha["Huso"] = detectar_huso(texto_completo, "")
+
+        # Solo guardar si hay datos clave
+        if ficha["Sitio"] or ficha["Responsable"]:
+            fichas.append(ficha)
+
+    return fichas
+
+# --- Capas GIS (KMZ / GeoJSON) ---
+def coordenadas_fichas(fichas):
+    """
+    (lons, lats) de cada ficha, en WGS84 y en el mismo orden; NaN en las que no tienen
+    coordenadas UTM válidas. Se convierte en el huso de cada ficha (18S si no lo indica),
+    un lote por huso.
+    """
+    lons = np.full(len(fichas), np.nan)
+    lats = np.full(len(fichas), np.nan)
+    indices, estes, nortes, husos = [], [], [], []
+    for i, f in enumerate(fichas):
+        n_val = limpiar_coordenada(f.get("UTM Norte", ""))
+        e_val = limpiar_coordenada(f.get("UTM Este", ""))
+        if n_val and e_val:
+            indices.append(i)
+            estes.append(e_val)
+            nortes.append(n_val)
+            husos.append(f.get("Huso") or HUSO_POR_DEFECTO)
+    if indices:
+        lons[indices], lats[indices] = utm_a_wgs84(estes, nortes, husos)
+    return lons, lats
+
+def construir_capas_gis(fichas):
+    """
+    Convierte las coordenadas UTM de las fichas a WGS84 (ver coordenadas_fichas) y
+    devuelve (puntos_kml, features_geojson).
+    """
+    lons, lats = coordenadas_fichas(fichas)
+    validas = np.flatnonzero(np.isfinite(lons))
+
+    puntos_kml = []
+    features_geojson = []
+    if not len(validas):
+        return puntos_kml, features_geojson
+
+    fichas_validas = [fichas[i] for i in validas]
+    lons, lats = lons[validas], lats[validas]
+    for f, lon, lat in zip(fichas_validas, lons.tolist(), lats.tolist()):
+        nombre = f.get("Hallazgo Previsto", f.get("Sitio", "Sin ID"))
+        desc = f"Material: {f.get('Material', '')} | Superficie: {f.get('Superficie', '')} | Fecha: {f.get('Fecha', '')}"
+
+        puntos_kml.append({"nombre": nombre, "desc": desc, "lat": lat, "lon": lon})
+
+        features_geojson.append({
+            "type": "Feature",
+            "properties": {
+                "ID_Hallazgo": nombre,
+                "Sitio": f.get("Sitio", ""),
+                "Cuadrante": f.get("Cuadrante", ""),
+                "Material": f.get("Material", ""),
+                "Superficie": f.get("Superficie", ""),
+                "Fecha": f.get("Fecha", "")
+            },
+            "geometry": {
+                "type": "Point",
+                "coordinates": [lon, lat]
+            }
+        })
+
+    return puntos_kml, features_geojson
+
+@etapa(EXPORTACION)
+def crear_geojson(features_geojson):
+    geojson_data = {
+        "type": "FeatureCollection",
+        "features": features_geojson
+    }
+    return json.dumps(geojson_data)
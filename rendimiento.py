@@ -0,0 +1,335 @@
+"""
+Mediciones de rendimiento de los extractores y los exportadores.
+
+Sobre un corpus de corpus_sintetico.py (o una carpeta real con las mismas
+subcarpetas), cada caso mide un parser o un exportador y da su rendimiento en
+archivos/s, páginas/s, puntos/s o filas/s, y el pico de memoria (RSS) del proceso:
+
+    python corpus_sintetico.py corpus/ --escala 20
+    python rendimiento.py corpus/                  # mide y compara con rendimiento_base.json
+    python rendimiento.py corpus/ --guardar-base   # deja estas mediciones como la base
+    python rendimiento.py corpus/ --casos map-pdf kmz -n 3
+
+Cada caso corre en un proceso aparte, así el pico de memoria es solo suyo, en un
+solo proceso trabajador, sin la caché de fichas y con un almacén de fotos temporal.
+En los exportadores la lectura previa no se mide: `extra MB` es cuánto subió el pico
+durante la parte medida. Los casos de menos de un segundo se repiten hasta llegar al
+segundo, y cada caso corre en -n procesos (3 por defecto): queda la mejor corrida.
+El caso "arranque" no usa el corpus: mide cuánto tarda la app en levantar en un
+proceso nuevo y mostrar la primera página.
+
+Contra la base, un caso más lento o con más pico de memoria que la tolerancia
+(15 % por defecto) cuenta como regresión y el comando termina con 1. La base depende
+de la máquina: conviene guardarla en la misma donde se compara.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BASE_POR_DEFECTO = Path(__file__).with_name("rendimiento_base.json")
+TOLERANCIA_POR_DEFECTO = 0.15
+# Un caso que tarda menos se repite en el mismo proceso hasta llegar a este tiempo
+# (y se informa el promedio por vuelta): las mediciones muy cortas son puro ruido.
+SEGUNDOS_MINIMOS = 1.0
+
+
+def _pico_mb():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KiB, macOS en bytes.
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _leer(corpus, carpeta, extensiones):
+    rutas = sorted(p for p in (Path(corpus) / carpeta).glob("*") if p.suffix.lower() in extensiones)
+    return [(p.name, p.read_bytes()) for p in rutas]
+
+
+def _paginas(archivos):
+    from extraccion import fitz
+    return sum(fitz.open(stream=datos, filetype="pdf").page_count for _, datos in archivos)
+
+
+def _extraer(parser, archivos):
+    """Valores de aplicar `parser` a cada archivo, juntos como los junta ejecutor.aplanar."""
+    valores = []
+    for nombre, datos in archivos:
+        valor = parser(datos, nombre)
+        if isinstance(valor, list):
+            valores.extend(valor)
+        elif valor:
+            valores.append(valor)
+    return valores
+
+
+# --- Casos: cada uno devuelve (función a medir, {unidad: cantidad}) ---
+# La función a medir no recibe argumentos; lo que arma el caso antes no se mide.
+
+def caso_map_docx(corpus):
+    from extraccion import procesar_archivo_v12
+    archivos = _leer(corpus, "map", {".docx"})
+    return lambda: _extraer(procesar_archivo_v12, archivos), {"archivos": len(archivos)}
+
+
+def caso_map_pdf(corpus):
+    from extraccion import procesar_pdf_a_word_map
+    archivos = _leer(corpus, "map_pdf", {".pdf"})
+    return lambda: _extraer(procesar_pdf_a_word_map, archivos), {"archivos": len(archivos), "páginas": _paginas(archivos)}
+
+
+def caso_fichas_docx(corpus):
+    from extraccion import leer_fichas_hallazgo
+    archivos = _leer(corpus, "fichas", {".docx"})
+    return lambda: _extraer(leer_fichas_hallazgo, archivos), {"archivos": len(archivos)}
+
+
+def caso_recoleccion_pdf(corpus):
+    from recoleccion import procesar_pdf_recoleccion_regex_gis
+    archivos = _leer(corpus, "recoleccion", {".pdf"})
+    return (lambda: _extraer(procesar_pdf_recoleccion_regex_gis, archivos),
+            {"archivos": len(archivos), "páginas": _paginas(archivos)})
+
+
+def caso_excavacion_pdf(corpus):
+    from excavacion import extraer_datos_excavacion
+    archivos = _leer(corpus, "excavacion", {".pdf"})
+    return (lambda: _extraer(extraer_datos_excavacion, archivos),
+            {"archivos": len(archivos), "páginas": _paginas(archivos)})
+
+
+def caso_kmz(corpus):
+    from kml import extraer_puntos_archivo
+    archivos = _leer(corpus, "kmz", {".kmz", ".kml"})
+    puntos = len(_extraer(extraer_puntos_archivo, archivos))
+    return lambda: _extraer(extraer_puntos_archivo, archivos), {"archivos": len(archivos), "puntos": puntos}
+
+
+def caso_kml_tolerante(corpus):
+    # El lector sin streaming, que se usa cuando el XML está mal formado.
+    from kml import extraer_datos_kml
+    kmls = []
+    for _, datos in _leer(corpus, "kmz", {".kmz"}):
+        with zipfile.ZipFile(io.BytesIO(datos)) as z:
+            kmls += [z.read(n) for n in z.namelist() if n.lower().endswith(".kml")]
+    puntos = sum(len(extraer_datos_kml(k)) for k in kmls)
+    return lambda: [extraer_datos_kml(k) for k in kmls], {"puntos": puntos}
+
+
+def caso_word_map(corpus):
+    from extraccion import procesar_archivo_v12, generar_word_con_formato, ordenar_por_fecha
+    from fotos import AJUSTE_POR_DEFECTO
+    fichas = _extraer(procesar_archivo_v12, _leer(corpus, "map", {".docx"}))
+    ordenar_por_fecha(fichas)
+    fotos = sum(len(f["fotos"]) for f in fichas)
+    return lambda: generar_word_con_formato(fichas, AJUSTE_POR_DEFECTO), {"fichas": len(fichas), "fotos": fotos}
+
+
+def caso_word_fichas(corpus):
+    from extraccion import leer_fichas_hallazgo, crear_doc_tabla_horizontal
+    from fotos import AJUSTE_POR_DEFECTO
+    filas = [f.como_fila() for f in _extraer(leer_fichas_hallazgo, _leer(corpus, "fichas", {".docx"}))]
+    return lambda: crear_doc_tabla_horizontal(filas, AJUSTE_POR_DEFECTO), {"fichas": len(filas)}
+
+
+def caso_excel_kmz(corpus):
+    import pandas as pd
+    from extraccion import dataframe_a_excel
+    from kml import COLUMNAS_KMZ, FORMATOS_KMZ, extraer_puntos_archivo
+    df = pd.DataFrame(_extraer(extraer_puntos_archivo, _leer(corpus, "kmz", {".kmz", ".kml"})))[COLUMNAS_KMZ]
+    return lambda: dataframe_a_excel(df, "Coordenadas_UTM_19S", formatos=FORMATOS_KMZ), {"filas": len(df)}
+
+
+def caso_excel_excavacion(corpus):
+    from excavacion import extraer_datos_excavacion, excel_excavacion
+    fichas = _extraer(extraer_datos_excavacion, _leer(corpus, "excavacion", {".pdf"}))
+    return lambda: excel_excavacion(fichas), {"filas": len(fichas)}
+
+
+def caso_kmz_recoleccion(corpus):
+    # Conversión UTM -> WGS84 (pyproj) y escritura del KMZ.
+    from escritor_kml import crear_kmz
+    from recoleccion import procesar_pdf_recoleccion_regex_gis, construir_capas_gis
+    fichas = _extraer(procesar_pdf_recoleccion_regex_gis, _leer(corpus, "recoleccion", {".pdf"}))
+    return lambda: crear_kmz(construir_capas_gis(fichas)[0]), {"puntos": len(fichas)}
+
+
+_ARRANQUE = """
+import sys
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=120).run()
+if app.exception:
+    sys.exit(str(app.exception))
+"""
+
+
+def caso_arranque(corpus):
+    # La app desde cero en un proceso nuevo (Python, streamlit y la primera página),
+    # como al levantar el servidor. Los trabajos van a la carpeta temporal de medir()
+    # y sin proyecto: no se tocan los de verdad.
+    trabajos = Path(os.environ.get("ARQUEOLOGIA_FOTOS") or tempfile.gettempdir()) / "trabajos"
+    entorno = dict(os.environ, ARQUEOLOGIA_TRABAJOS=str(trabajos), ARQUEOLOGIA_PROYECTO="", ARQUEOLOGIA_METRICAS="")
+    app = Path(__file__).with_name("main.py")
+
+    def arrancar():
+        subprocess.run([sys.executable, "-c", _ARRANQUE, str(app)], check=True, capture_output=True,
+                       env=entorno, cwd=app.parent)
+    return arrancar, {"arranques": 1}
+
+
+# nombre -> (caso, tipo)
+CASOS = {
+    "map-docx": (caso_map_docx, "extractor"),
+    "map-pdf": (caso_map_pdf, "extractor"),
+    "fichas-docx": (caso_fichas_docx, "extractor"),
+    "recoleccion-pdf": (caso_recoleccion_pdf, "extractor"),
+    "excavacion-pdf": (caso_excavacion_pdf, "extractor"),
+    "kmz": (caso_kmz, "extractor"),
+    "kml-tolerante": (caso_kml_tolerante, "extractor"),
+    "word-map": (caso_word_map, "exportador"),
+    "word-fichas": (caso_word_fichas, "exportador"),
+    "excel-kmz": (caso_excel_kmz, "exportador"),
+    "excel-excavacion": (caso_excel_excavacion, "exportador"),
+    "kmz-recoleccion": (caso_kmz_recoleccion, "exportador"),
+    "arranque": (caso_arranque, "app"),
+}
+
+
+def medir_caso(nombre, corpus):
+    """Corre un caso en este proceso y devuelve su medición (un dict)."""
+    funcion, cantidades = CASOS[nombre][0](corpus)
+    pico_antes = _pico_mb()
+    vueltas = 0
+    inicio = time.perf_counter()
+    while not vueltas or time.perf_counter() - inicio < SEGUNDOS_MINIMOS:
+        funcion()
+        vueltas += 1
+    segundos = (time.perf_counter() - inicio) / vueltas
+    pico = _pico_mb()
+    return {
+        "segundos": round(segundos, 5),
+        "vueltas": vueltas,
+        "cantidades": cantidades,
+        "pico_mb": pico,
+        "extra_mb": None if pico is None else round(pico - pico_antes, 1),
+    }
+
+
+def medir(nombre, corpus, repeticiones=3):
+    """Mide un caso en procesos aparte; devuelve la mejor de `repeticiones` corridas."""
+    corridas = []
+    with tempfile.TemporaryDirectory(prefix="rendimiento-") as temporal:
+        entorno = dict(os.environ, ARQUEOLOGIA_FOTOS=temporal)
+        for _ in range(repeticiones):
+            proceso = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), str(corpus), "--caso", nombre],
+                capture_output=True, text=True, env=entorno,
+            )
+            if proceso.returncode != 0:
+                raise RuntimeError(f"Falló el caso {nombre}:\n{proceso.stderr.strip()}")
+            corridas.append(json.loads(proceso.stdout.strip().splitlines()[-1]))
+    return min(corridas, key=lambda m: m["segundos"])
+
+
+def tasas(medicion):
+    """{unidad: cantidad por segundo}."""
+    segundos = max(medicion["segundos"], 1e-9)
+    return {unidad: n / segundos for unidad, n in medicion["cantidades"].items()}
+
+
+def comparar(medicion, base, tolerancia):
+    """
+    (texto, es_regresión) de una medición contra la de la base: el cambio de
+    rendimiento en la primera unidad y el del pico de memoria.
+    """
+    unidad = next(iter(medicion["cantidades"]))
+    actual, previa = tasas(medicion)[unidad], tasas(base).get(unidad)
+    if not previa:
+        return "sin base", False
+    cambio = actual / previa - 1
+    partes = [f"{cambio:+.0%} {unidad}/s"]
+    regresion = cambio < -tolerancia
+    if medicion["pico_mb"] and base.get("pico_mb") and medicion["cantidades"] == base["cantidades"]:
+        cambio_pico = medicion["pico_mb"] / base["pico_mb"] - 1
+        partes.append(f"{cambio_pico:+.0%} pico")
+        regresion = regresion or cambio_pico > tolerancia
+    return ", ".join(partes) + ("  REGRESIÓN" if regresion else ""), regresion
+
+
+def _corpus(corpus):
+    return {p.name: sum(1 for _ in p.iterdir()) for p in sorted(Path(corpus).iterdir()) if p.is_dir()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Mide el rendimiento de los extractores y exportadores sobre un corpus.",
+        epilog="casos:\n" + "\n".join(f"  {k:<18} {v[1]}" for k, v in CASOS.items()),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("corpus", help="Carpeta generada con corpus_sintetico.py.")
+    parser.add_argument("--casos", nargs="+", choices=sorted(CASOS), metavar="CASO", help="Solo estos casos.")
+    parser.add_argument("-n", "--repeticiones", type=int, default=3, help="Procesos por caso; queda la mejor corrida (por defecto 3).")
+    parser.add_argument("--base", type=Path, default=BASE_POR_DEFECTO, help=f"Mediciones de referencia (por defecto {BASE_POR_DEFECTO.name}).")
+    parser.add_argument("--guardar-base", action="store_true", help="Guardar estas mediciones como la base.")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_POR_DEFECTO,
+                        help=f"Empeoramiento admitido antes de contar una regresión (por defecto {TOLERANCIA_POR_DEFECTO}).")
+    parser.add_argument("--json", type=Path, help="Escribir también las mediciones en este archivo.")
+    parser.add_argument("--caso", choices=sorted(CASOS), help=argparse.SUPPRESS)  # uso interno: un caso por proceso
+    args = parser.parse_args(argv)
+
+    if args.caso:
+        print(json.dumps(medir_caso(args.caso, args.corpus)))
+        return 0
+
+    base = {}
+    if args.base.exists() and not args.guardar_base:
+        base = json.loads(args.base.read_text(encoding="utf-8"))["casos"]
+
+    mediciones = {}
+    regresiones = 0
+    print(f"{'caso':<18} {'segundos':>9} {'pico MB':>8} {'extra MB':>9}  rendimiento")
+    for nombre in args.casos or CASOS:
+        medicion = mediciones[nombre] = medir(nombre, args.corpus, max(1, args.repeticiones))
+        texto = ", ".join(f"{v:,.1f} {unidad}/s" for unidad, v in tasas(medicion).items())
+        if nombre in base:
+            comparacion, regresion = comparar(medicion, base[nombre], args.tolerancia)
+            texto += f"  [{comparacion}]"
+            regresiones += regresion
+        print(f"{nombre:<18} {medicion['segundos']:>9.4f} {medicion['pico_mb'] or '-':>8} "
+              f"{medicion['extra_mb'] if medicion['extra_mb'] is not None else '-':>9}  {texto}")
+
+    resultado = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "corpus": _corpus(args.corpus),
+        "casos": mediciones,
+    }
+    if args.json:
+        args.json.write_text(json.dumps(resultado, ensure_ascii=False, indent=1), encoding="utf-8")
+    if args.guardar_base:
+        args.base.write_text(json.dumps(resultado, ensure_ascii=False, indent=1) + "\n", encoding="utf-8")
+        print(f"Base guardada en {args.base}")
+    if regresiones:
+        print(f"{regresiones} casos empeoraron más de {args.tolerancia:.0%} respecto de la base.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
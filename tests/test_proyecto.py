@@ -0,0 +1,60 @@
+"""
+Ingreso al proyecto de archivos con el mismo nombre en carpetas distintas.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ejecutor import ResultadoArchivo
+from procesar_lote import listar_archivos, extraer_lote
+from proyecto import Proyecto
+
+
+def leer_lineas(datos, nombre):
+    """Parser de prueba: un registro por línea del archivo."""
+    return [f"{nombre}: {linea}" for linea in datos.decode("utf-8").splitlines()]
+
+
+def _escribir(ruta, texto):
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    ruta.write_text(texto, encoding="utf-8")
+
+
+def test_subcarpetas_con_el_mismo_nombre_no_se_pisan(tmp_path):
+    lote = tmp_path / "lote"
+    _escribir(lote / "dia1" / "Ficha.txt", "uno\ndos\n")
+    _escribir(lote / "dia2" / "Ficha.txt", "tres\n")
+    proyecto = Proyecto(tmp_path / "proyecto.sqlite")
+
+    archivos = listar_archivos(lote, {".txt"}, recursivo=True)
+    assert [nombre for nombre, _ in archivos] == ["dia1/Ficha.txt", "dia2/Ficha.txt"]
+
+    primera = extraer_lote(archivos, leer_lineas, usar_cache=False, proyecto=proyecto)
+    assert proyecto.ultimo_ingreso.nuevos == 2
+    segunda = extraer_lote(archivos, leer_lineas, usar_cache=False, proyecto=proyecto)
+    # La segunda corrida no vuelve a parsear nada y conserva los registros de los dos.
+    assert proyecto.ultimo_ingreso.sin_cambios == 2
+    assert proyecto.ultimo_ingreso.cambiados == 0
+    esperado = ["dia1/Ficha.txt: uno", "dia1/Ficha.txt: dos", "dia2/Ficha.txt: tres"]
+    assert primera == segunda == esperado
+    proyecto.cerrar()
+
+
+def test_mismo_nombre_en_un_lote_se_renombra(tmp_path):
+    proyecto = Proyecto(tmp_path / "proyecto.sqlite")
+
+    def procesar(pendientes):
+        return [ResultadoArchivo(nombre, leer_lineas(datos, nombre), None) for nombre, datos in pendientes]
+
+    lote = [("Ficha.txt", b"uno\n"), ("Ficha.txt", b"dos\n"), ("Ficha.txt", b"uno\n")]
+    resultados = proyecto.ingresar(leer_lineas, lote, procesar)
+    assert proyecto.ultimo_ingreso.renombrados == 1
+    assert proyecto.ultimo_ingreso.repetidos == 1
+    assert {r.nombre: r.valor for r in resultados} == {
+        "Ficha.txt": ["Ficha.txt: uno"], "Ficha (2).txt": ["Ficha (2).txt: dos"],
+    }
+
+    proyecto.ingresar(leer_lineas, lote, procesar)
+    assert proyecto.ultimo_ingreso.sin_cambios == 2
+    proyecto.cerrar()
@@ -0,0 +1,206 @@
+"""
+Tiempos por etapa de cada herramienta, por archivo y en total.
+
+Cuando un lote tarda no se sabe si es abrir los PDF, sacar las fotos, convertir
+coordenadas o escribir el Word/Excel. El código de esas etapas está envuelto en
+`etapa(...)`, que suma cuántas veces corrió y cuánto tardó en la Medicion activa
+(la de la corrida en curso). Sin Medicion activa no mide nada.
+
+Los tiempos son exclusivos: lo que tarda una etapa anidada (p. ej. guardar las
+fotos mientras se lee un PDF) se descuenta de la de afuera, así que las etapas
+de un archivo suman su tiempo total.
+
+- lectura: abrir el archivo, extraer el texto y buscar las etiquetas (el parser);
+- imagenes: extraer, guardar, reducir e insertar fotos;
+- coordenadas: conversiones de pyproj;
+- exportacion: escribir Word, Excel, KMZ, GeoJSON y capas QGIS;
+- cache: leer y guardar en la caché de fichas.
+
+Las etapas de lectura corren en los procesos trabajadores: ejecutor.py mide cada
+archivo allá y trae los tiempos con el ResultadoArchivo. Las de exportación quedan
+sin archivo ("").
+
+Al terminar, cada corrida se agrega como JSON-lines al archivo de
+ARQUEOLOGIA_METRICAS ("-" es stderr; vacío, no se escribe): una línea "corrida"
+con el total por etapa y una línea "archivo" por archivo leído. La app agrega
+además una línea "arranque" cada vez que carga por primera vez una página (ver
+paginas.py).
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+LECTURA, IMAGENES, COORDENADAS, EXPORTACION, CACHE = "lectura", "imagenes", "coordenadas", "exportacion", "cache"
+ETAPAS = (LECTURA, IMAGENES, COORDENADAS, EXPORTACION, CACHE)
+NOMBRES_ETAPAS = {
+    LECTURA: "Lectura", IMAGENES: "Imágenes", COORDENADAS: "Coordenadas",
+    EXPORTACION: "Exportación", CACHE: "Caché",
+}
+
+log = logging.getLogger("tiempos")
+
+METRICAS_POR_DEFECTO = os.environ.get("ARQUEOLOGIA_METRICAS", "")
+
+# Veces que corrió una etapa en un archivo y segundos que sumó.
+Tiempo = namedtuple("Tiempo", ["archivo", "etapa", "cuenta", "segundos"])
+
+_actual = ContextVar("medicion", default=None)
+_candado_metricas = threading.Lock()
+
+
+class Medicion:
+    """Tiempos de una corrida (o de un archivo, en el trabajador). Se usa desde un solo hilo."""
+
+    def __init__(self, herramienta=""):
+        self.herramienta = herramienta
+        self.archivo = ""
+        self.segundos = None
+        self._sumas = {}  # (archivo, etapa) -> [cuenta, segundos]
+        self._pila = []  # segundos de las etapas anidadas en cada etapa abierta
+        self._inicio = time.perf_counter()
+
+    def __bool__(self):
+        return bool(self._sumas)
+
+    def sumar(self, archivo, etapa, cuenta, segundos):
+        suma = self._sumas.setdefault((archivo, etapa), [0, 0.0])
+        suma[0] += cuenta
+        suma[1] += segundos
+
+    def agregar(self, tiempos):
+        """Suma los Tiempo medidos en otro lado (p. ej. los de un archivo en un trabajador)."""
+        for t in tiempos or []:
+            self.sumar(*t)
+
+    def tiempos(self):
+        return [Tiempo(a, e, c, s) for (a, e), (c, s) in self._sumas.items()]
+
+    def por_etapa(self):
+        """{etapa: Tiempo} sumando todos los archivos, en el orden de ETAPAS."""
+        totales = {}
+        for t in self.tiempos():
+            c, s = totales.get(t.etapa, (0, 0.0))
+            totales[t.etapa] = (c + t.cuenta, s + t.segundos)
+        return {e: Tiempo("", e, *totales[e]) for e in ETAPAS if e in totales}
+
+    def por_archivo(self):
+        """{archivo: {etapa: Tiempo}} de los archivos leídos (sin la exportación)."""
+        archivos = {}
+        for t in self.tiempos():
+            if t.archivo:
+                archivos.setdefault(t.archivo, {})[t.etapa] = t
+        return archivos
+
+    def activar(self, archivo=""):
+        """La hace la Medicion activa de este hilo; devuelve el token para desactivar()."""
+        self.archivo = archivo
+        return _actual.set(self)
+
+    def desactivar(self, token):
+        _actual.reset(token)
+        self.segundos = time.perf_counter() - self._inicio
+
+
+@contextmanager
+def etapa(nombre):
+    """Suma el tiempo del bloque a la etapa `nombre` de la Medicion activa (también sirve como decorador)."""
+    medicion = _actual.get()
+    if medicion is None:
+        yield
+        return
+    medicion._pila.append(0.0)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        total = time.perf_counter() - inicio
+        anidadas = medicion._pila.pop()
+        if medicion._pila:
+            medicion._pila[-1] += total
+        medicion.sumar(medicion.archivo, nombre, 1, total - anidadas)
+
+
+@contextmanager
+def medir(herramienta, metricas=None):
+    """
+    Mide una corrida de `herramienta` y, al salir, la escribe en `metricas`
+    (por defecto ARQUEOLOGIA_METRICAS). Entrega la Medicion.
+    """
+    medicion = Medicion(herramienta)
+    token = medicion.activar()
+    try:
+        yield medicion
+    finally:
+        medicion.desactivar(token)
+        emitir(medicion, metricas)
+
+
+def registrar(tiempos):
+    """Suma a la Medicion activa (si hay) los tiempos de un archivo medido aparte."""
+    medicion = _actual.get()
+    if medicion is not None:
+        medicion.agregar(tiempos)
+
+
+def lineas_metricas(medicion):
+    """Los dicts que emitir() escribe, uno por línea."""
+    momento = datetime.now().isoformat(timespec="seconds")
+    por_archivo = medicion.por_archivo()
+    lineas = [{
+        "tipo": "corrida", "momento": momento, "herramienta": medicion.herramienta,
+        "archivos": len(por_archivo), "segundos": round(medicion.segundos or 0.0, 6),
+        "etapas": {e: {"cuenta": t.cuenta, "segundos": round(t.segundos, 6)} for e, t in medicion.por_etapa().items()},
+    }]
+    for archivo, etapas in por_archivo.items():
+        lineas.append({
+            "tipo": "archivo", "momento": momento, "herramienta": medicion.herramienta, "archivo": archivo,
+            "etapas": {e: {"cuenta": t.cuenta, "segundos": round(t.segundos, 6)} for e, t in etapas.items()},
+        })
+    return lineas
+
+
+def emitir(medicion, metricas=None):
+    """Agrega la corrida a `metricas` (ruta, "-" para stderr) como JSON-lines. No hace nada si no midió nada."""
+    if medicion:
+        _escribir(lineas_metricas(medicion), metricas)
+
+
+def emitir_arranque(herramienta, segundos, carga, metricas=None):
+    """
+    Agrega una línea "arranque": la app tardó `segundos` en tener lista la página
+    de `herramienta`, `carga` de ellos importando su módulo por primera vez.
+    """
+    _escribir([{
+        "tipo": "arranque", "momento": datetime.now().isoformat(timespec="seconds"), "herramienta": herramienta,
+        "segundos": round(segundos, 6), "carga": round(carga, 6),
+    }], metricas)
+
+
+def _escribir(lineas, metricas):
+    metricas = METRICAS_POR_DEFECTO if metricas is None else metricas
+    if not metricas:
+        return
+    texto = "".join(json.dumps(l, ensure_ascii=False) + "\n" for l in lineas)
+    # Varias sesiones y trabajos escriben al mismo archivo: una corrida no se mezcla con otra.
+    with _candado_metricas:
+        if metricas == "-":
+            sys.stderr.write(texto)
+            sys.stderr.flush()
+            return
+        try:
+            with open(metricas, "a", encoding="utf-8") as f:
+                f.write(texto)
+        except OSError as e:
+            log.warning("No se pudieron escribir las métricas en %s: %s", metricas, e)
+
+
+def resumen(medicion):
+    """'lectura 3.21 s · imagenes 1.05 s ...' para los logs."""
+    return " · ".join(f"{e} {t.segundos:.2f} s" for e, t in medicion.por_etapa().items())
@@ -0,0 +1,273 @@
+"""
+Cola de trabajos en segundo plano para los lotes largos de la app.
+
+Dentro del `if st.button(...)` de cada herramienta, un lote de 150 reportes deja la
+sesión del navegador ocupada varios minutos, recargar la página pierde todo y no hay
+forma de cancelar. Con la cola, la app copia los archivos subidos a la carpeta del
+trabajo y lo envía: `enviar` devuelve el id enseguida y la herramienta corre en un
+hilo aparte (la misma función de procesar_lote.py que usa la línea de comandos),
+que escribe las salidas en <directorio>/<id>/salida.
+
+El avance (archivos leídos de cuántos), lo leído de cada archivo y sus errores se
+consultan mientras corre; `cancelar` lo detiene en el próximo archivo que termina
+(los que ya estaban en un proceso trabajador terminan, los pendientes no empiezan).
+
+El estado de cada trabajo queda en <id>/trabajo.json, así que las salidas de un
+trabajo terminado se pueden descargar después de recargar la página o de reiniciar
+la app. Los trabajos terminados hace más de ARQUEOLOGIA_TRABAJOS_DIAS se borran.
+"""
+import json
+import logging
+import os
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from tiempos import Tiempo
+
+log = logging.getLogger("trabajos")
+
+DIRECTORIO_TRABAJOS = Path(os.environ.get(
+    "ARQUEOLOGIA_TRABAJOS", Path.home() / ".cache" / "resumen-arqueologia" / "trabajos"
+))
+DIAS_TRABAJOS = int(os.environ.get("ARQUEOLOGIA_TRABAJOS_DIAS", 7))
+# Trabajos que corren a la vez; el resto espera en cola. Cada uno ya reparte sus
+# archivos entre los procesos del ejecutor.
+HILOS_TRABAJOS = int(os.environ.get("ARQUEOLOGIA_TRABAJOS_HILOS", 1))
+
+EN_COLA, PROCESANDO, TERMINADO, CANCELADO, FALLIDO = "en cola", "procesando", "terminado", "cancelado", "fallido"
+FINALES = {TERMINADO, CANCELADO, FALLIDO}
+
+# Cada cuánto (segundos) se guarda trabajo.json mientras avanza.
+_INTERVALO_GUARDADO = 1.0
+
+# Lo leído de un archivo del lote: cuántos elementos devolvió el parser o su error.
+Parcial = namedtuple("Parcial", ["nombre", "elementos", "error"])
+# Un archivo de salida del trabajo.
+Artefacto = namedtuple("Artefacto", ["nombre", "ruta", "tamano"])
+
+
+class TrabajoCancelado(Exception):
+    """La levanta Trabajo.avance/verificar cuando se pidió cancelar el trabajo."""
+
+
+class Trabajo:
+    """
+    Un lote enviado a la cola. La herramienta recibe el trabajo y lo usa como
+    callback de avance (`avance`, `parcial`); la app lee su estado desde otro hilo.
+    """
+
+    def __init__(self, directorio, herramienta, titulo, creado=None):
+        self.directorio = Path(directorio)
+        self.id = self.directorio.name
+        self.herramienta = herramienta
+        self.titulo = titulo
+        self.creado = creado or datetime.now().isoformat(timespec="seconds")
+        self.estado = EN_COLA
+        self.hechos = 0
+        self.total = 0
+        self.mensaje = ""
+        self.terminado = None
+        self.tiempos = []  # tiempos.Tiempo de la corrida, al terminar
+        self._parciales = []
+        self._cancelar = threading.Event()
+        self._candado = threading.Lock()
+        self._guardado = 0.0
+
+    @property
+    def entrada(self):
+        return self.directorio / "entrada"
+
+    @property
+    def salida(self):
+        return self.directorio / "salida"
+
+    @property
+    def perfil(self):
+        """Perfil (cProfile) de un trabajo perfilado; fuera de la salida: no es una salida de la herramienta."""
+        return self.directorio / "perfil.prof"
+
+    @property
+    def finalizado(self):
+        return self.estado in FINALES
+
+    # --- desde la herramienta (hilo del trabajo) ---
+
+    def avance(self, hechos, total):
+        """Callback de progreso de ejecutor.procesar_archivos."""
+        self.hechos, self.total = hechos, total
+        self._guardar_cada_tanto()
+        self.verificar()
+
+    def parcial(self, resultado):
+        """Callback con cada ResultadoArchivo apenas termina."""
+        valor = resultado.valor
+        elementos = len(valor) if isinstance(valor, list) else int(bool(valor))
+        with self._candado:
+            self._parciales.append(Parcial(resultado.nombre, 0 if resultado.error else elementos, resultado.error))
+
+    def verificar(self):
+        if self._cancelar.is_set():
+            raise TrabajoCancelado(self.id)
+
+    # --- desde la app ---
+
+    def cancelar(self):
+        self._cancelar.set()
+
+    @property
+    def cancelando(self):
+        return self._cancelar.is_set() and not self.finalizado
+
+    def parciales(self):
+        with self._candado:
+            return list(self._parciales)
+
+    def artefactos(self):
+        """Archivos escritos en la carpeta de salida hasta ahora."""
+        if not self.salida.is_dir():
+            return []
+        return [Artefacto(r.name, r, r.stat().st_size) for r in sorted(self.salida.iterdir()) if r.is_file()]
+
+    # --- trabajo.json ---
+
+    def _datos(self):
+        return {
+            "herramienta": self.herramienta, "titulo": self.titulo, "creado": self.creado,
+            "estado": self.estado, "hechos": self.hechos, "total": self.total,
+            "mensaje": self.mensaje, "terminado": self.terminado,
+            "parciales": [list(p) for p in self.parciales()],
+            "tiempos": [list(t) for t in self.tiempos],
+        }
+
+    def guardar(self):
+        contenido = json.dumps(self._datos(), ensure_ascii=False).encode("utf-8")
+        fd, tmp = tempfile.mkstemp(dir=self.directorio, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(contenido)
+            os.replace(tmp, self.directorio / "trabajo.json")
+        except OSError:
+            Path(tmp).unlink(missing_ok=True)
+        self._guardado = time.monotonic()
+
+    def _guardar_cada_tanto(self):
+        if time.monotonic() - self._guardado >= _INTERVALO_GUARDADO:
+            self.guardar()
+
+    @classmethod
+    def cargar(cls, directorio):
+        datos = json.loads((Path(directorio) / "trabajo.json").read_text(encoding="utf-8"))
+        trabajo = cls(directorio, datos["herramienta"], datos["titulo"], datos["creado"])
+        trabajo.estado = datos["estado"]
+        trabajo.hechos, trabajo.total = datos["hechos"], datos["total"]
+        trabajo.mensaje, trabajo.terminado = datos["mensaje"], datos["terminado"]
+        trabajo._parciales = [Parcial(*p) for p in datos["parciales"]]
+        trabajo.tiempos = [Tiempo(*t) for t in datos.get("tiempos", [])]
+        return trabajo
+
+
+class ColaTrabajos:
+    """
+    Trabajos de la app, en memoria y en disco. Una sola instancia por proceso
+    (la app la comparte entre sesiones con st.cache_resource).
+    """
+
+    def __init__(self, directorio=DIRECTORIO_TRABAJOS, hilos=HILOS_TRABAJOS, dias=DIAS_TRABAJOS):
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self._trabajos = {}
+        self._candado = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, hilos), thread_name_prefix="trabajo")
+        self._cargar(dias)
+
+    def _cargar(self, dias):
+        """Trabajos de corridas anteriores de la app; borra los vencidos."""
+        limite = (datetime.now() - timedelta(days=dias)).isoformat(timespec="seconds")
+        for carpeta in self.directorio.iterdir():
+            if not carpeta.is_dir():
+                continue
+            try:
+                trabajo = Trabajo.cargar(carpeta)
+            except (OSError, ValueError, KeyError, TypeError):
+                shutil.rmtree(carpeta, ignore_errors=True)  # a medio crear o de otra versión
+                continue
+            if not trabajo.finalizado:
+                # La app se reinició mientras corría: lo que alcanzó a escribir queda.
+                trabajo.estado = FALLIDO
+                trabajo.mensaje = "Se interrumpió porque la app se reinició."
+                trabajo.terminado = datetime.now().isoformat(timespec="seconds")
+                trabajo.guardar()
+            if trabajo.terminado and trabajo.terminado < limite:
+                shutil.rmtree(carpeta, ignore_errors=True)
+                continue
+            self._trabajos[trabajo.id] = trabajo
+
+    def crear(self, herramienta, titulo):
+        """Trabajo nuevo con sus carpetas; copiar los archivos a `entrada` y llamar a enviar()."""
+        id_trabajo = f"{datetime.now():%Y%m%d-%H%M%S}-{secrets.token_hex(3)}"
+        trabajo = Trabajo(self.directorio / id_trabajo, herramienta, titulo)
+        trabajo.entrada.mkdir(parents=True)
+        trabajo.salida.mkdir()
+        trabajo.guardar()
+        with self._candado:
+            self._trabajos[trabajo.id] = trabajo
+        return trabajo
+
+    def enviar(self, trabajo, funcion, *args, **kwargs):
+        """
+        Pone en cola `funcion(trabajo, *args, **kwargs)` y devuelve el id del trabajo.
+        La función devuelve False si no encontró datos; TrabajoCancelado la corta.
+        """
+        self._pool.submit(self._correr, trabajo, funcion, args, kwargs)
+        return trabajo.id
+
+    def _correr(self, trabajo, funcion, args, kwargs):
+        try:
+            trabajo.verificar()
+            trabajo.estado = PROCESANDO
+            trabajo.guardar()
+            if funcion(trabajo, *args, **kwargs) is False:
+                trabajo.mensaje = "No se encontraron datos válidos."
+            trabajo.estado = TERMINADO
+        except TrabajoCancelado:
+            trabajo.estado = CANCELADO
+        except Exception as e:
+            log.exception("Falló el trabajo %s", trabajo.id)
+            trabajo.estado = FALLIDO
+            trabajo.mensaje = f"{type(e).__name__}: {e}"
+        trabajo.terminado = datetime.now().isoformat(timespec="seconds")
+        trabajo.guardar()
+
+    def obtener(self, id_trabajo):
+        with self._candado:
+            return self._trabajos.get(id_trabajo)
+
+    def listar(self):
+        """Todos los trabajos, del más nuevo al más viejo."""
+        with self._candado:
+            return sorted(self._trabajos.values(), key=lambda t: t.id, reverse=True)
+
+    def cancelar(self, id_trabajo):
+        trabajo = self.obtener(id_trabajo)
+        if trabajo is not None and not trabajo.finalizado:
+            trabajo.cancelar()
+
+    def borrar(self, id_trabajo):
+        """Borra un trabajo terminado con sus archivos (uno en curso solo se cancela)."""
+        trabajo = self.obtener(id_trabajo)
+        if trabajo is None:
+            return False
+        if not trabajo.finalizado:
+            trabajo.cancelar()
+            return False
+        with self._candado:
+            self._trabajos.pop(id_trabajo, None)
+        shutil.rmtree(trabajo.directorio, ignore_errors=True)
+        return True